@@ -0,0 +1,96 @@
+"""分析 span_trace 生成的 Playwright 调用追踪
+
+用法:
+  python analyze_traces.py                      # 最近一轮 (traces/ 下最新的文件)
+  python analyze_traces.py traces/round-xxx.jsonl
+  python analyze_traces.py traces --rounds 5    # 最近 5 轮合并统计
+  python analyze_traces.py --top 30 --site 某站点
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+DEFAULT_TRACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")
+
+
+def _trace_files(path, rounds):
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "round-*.jsonl")))
+        return files[-rounds:]
+    return [path] if os.path.exists(path) else []
+
+
+def load_spans(files, site=None):
+    spans = []
+    for file_path in files:
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if site and span.get("site") != site:
+                    continue
+                spans.append(span)
+    return spans
+
+
+def _target(span, width=60):
+    target = span.get("target") or ""
+    return target if len(target) <= width else target[:width - 3] + "..."
+
+
+def report(spans, top=20, rounds=1):
+    print(f"\n=== 最慢的 {top} 次调用 ===")
+    for span in sorted(spans, key=lambda s: s.get("ms", 0), reverse=True)[:top]:
+        flag = " [异常]" if span.get("error") else ""
+        print(f"{span.get('ms', 0):>10.1f} ms  {span.get('site', '-'):<16} {span.get('op', ''):<26} {_target(span)}{flag}")
+
+    by_site = defaultdict(lambda: {"calls": 0, "ms": 0.0, "errors": 0})
+    by_call = defaultdict(lambda: {"calls": 0, "ms": 0.0})
+    for span in spans:
+        site = span.get("site", "-")
+        stats = by_site[site]
+        stats["calls"] += 1
+        stats["ms"] += span.get("ms", 0)
+        stats["errors"] += 1 if span.get("error") else 0
+        call = by_call[(site, span.get("op", ""), span.get("target") or "")]
+        call["calls"] += 1
+        call["ms"] += span.get("ms", 0)
+
+    print(f"\n=== 各站点 CDP 调用次数 ({rounds} 轮) ===")
+    print(f"{'站点':<18}{'调用数':>8}{'每轮':>8}{'总耗时(s)':>11}{'异常':>6}")
+    for site, stats in sorted(by_site.items(), key=lambda item: item[1]["calls"], reverse=True):
+        print(f"{site:<18}{stats['calls']:>8}{stats['calls'] / max(1, rounds):>8.1f}{stats['ms'] / 1000:>11.2f}{stats['errors']:>6}")
+
+    # 同一站点对同一目标反复调用通常意味着循环扫描 (如逐个检查关键字元素)
+    print(f"\n=== 调用次数最多的 {top} 个 (站点, 操作, 目标) ===")
+    for (site, op, target), stats in sorted(by_call.items(), key=lambda item: item[1]["calls"], reverse=True)[:top]:
+        print(f"{stats['calls']:>8} 次 {stats['ms'] / 1000:>8.2f}s  {site:<16} {op:<26} {_target({'target': target})}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析 Playwright 调用追踪 (JSONL)")
+    parser.add_argument("path", nargs="?", default=DEFAULT_TRACE_DIR, help="trace 文件或目录")
+    parser.add_argument("--rounds", type=int, default=1, help="目录模式下合并最近几轮")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--site", help="只统计指定站点")
+    args = parser.parse_args()
+
+    files = _trace_files(args.path, max(1, args.rounds))
+    if not files:
+        print(f"未找到 trace 文件: {args.path} (需在配置中开启 trace_playwright 或设置 MONITOR_TRACE=1)")
+        sys.exit(1)
+    spans = load_spans(files, site=args.site)
+    print(f"读取 {len(files)} 个文件，共 {len(spans)} 次调用: {', '.join(os.path.basename(f) for f in files)}")
+    report(spans, top=args.top, rounds=len(files))
+
+
+if __name__ == "__main__":
+    main()
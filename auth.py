@@ -1,10 +1,14 @@
+import atexit
 import subprocess
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
 import sys
 import platform
+import random
 import time
+import threading
 import uuid
 import base64
 import ctypes
@@ -78,6 +82,16 @@ if getattr(sys, 'frozen', False):
         logger.warning("WARNING: Using localhost in potentially Production environment?")
 DPAPI_PURPOSE = b"zubaobao-license"
 
+# 高频变化、丢失后影响不大的字段：仅这些字段变化时降频落盘，避免每次心跳都重写并加密 license.json
+VOLATILE_STATE_KEYS = ("last_ok_ts",)
+STATE_VOLATILE_FLUSH_SECONDS = int(os.environ.get("LICENSE_STATE_FLUSH_SECONDS", 600))
+
+# 授权接口 HTTP 连接池与重试策略
+HTTP_POOL_SIZE = 4
+HTTP_MAX_RETRIES = int(os.environ.get("LICENSE_HTTP_MAX_RETRIES", 2))
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 4.0
+
 
 class _DataBlob(ctypes.Structure):
     _fields_ = [
@@ -150,13 +164,36 @@ class AuthManager:
     def __init__(self, server_url=None, license_file=None):
         self.server_url = (server_url or DEFAULT_SERVER_URL).strip().rstrip('/')
         self.license_file = license_file or self._get_license_file_path()
-        self.machine_id = self._get_machine_id()
         self.current_code = None
         self.state = {}
+        self._state_lock = threading.RLock()
+        self._state_loaded = False
+        self._state_signature = None
+        self._state_dirty = False
+        self._persisted_digest = None
+        self._last_state_write_ts = 0.0
+        atexit.register(self.flush_state)
+        self._machine_id = None
+        self._machine_id_lock = threading.Lock()
         self.device_private_key = None
         self.device_public_key_pem = None
         self.server_public_key_pem = None
         self.grace_seconds = 86400
+        self.http = self._create_http_session()
+        self._http_stats_lock = threading.Lock()
+        self.http_stats = {}
+
+    @property
+    def machine_id(self):
+        """机器码延迟计算：未缓存时需要执行多条 wmic 命令，不应阻塞模块导入"""
+        if self._machine_id is None:
+            with self._machine_id_lock:
+                if self._machine_id is None:
+                    self._machine_id = self._get_machine_id()
+        return self._machine_id
+
+    def _get_config_snapshot_path(self):
+        return os.path.join(os.path.dirname(os.path.abspath(self.license_file)), 'config_snapshot.json')
 
     def _get_license_file_path(self):
         if getattr(sys, 'frozen', False):
@@ -221,27 +258,75 @@ class AuthManager:
             print(f"获取机器码失败: {e}")
             return "unknown-machine-id"
 
-    def _load_state(self):
-        if os.path.exists(self.license_file):
-            try:
-                with open(self.license_file, 'rb') as f:
-                    raw = f.read()
-                if raw.startswith(b"ENC1:"):
-                    payload = raw[5:]
-                    data_raw = _crypt_unprotect(base64.b64decode(payload))
-                else:
-                    data_raw = raw
-                if data_raw:
-                    data = json.loads(data_raw.decode('utf-8'))
-                    if isinstance(data, dict):
-                        self.state = data
-                        return self.state
-            except Exception:
-                pass
-        self.state = {}
-        return self.state
+    def _state_file_signature(self):
+        try:
+            st = os.stat(self.license_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
 
-    def _save_state(self):
+    def _read_state_file(self):
+        try:
+            with open(self.license_file, 'rb') as f:
+                raw = f.read()
+            if raw.startswith(b"ENC1:"):
+                payload = raw[5:]
+                data_raw = _crypt_unprotect(base64.b64decode(payload))
+            else:
+                data_raw = raw
+            if data_raw:
+                data = json.loads(data_raw.decode('utf-8'))
+                if isinstance(data, dict):
+                    return data
+        except Exception:
+            pass
+        return {}
+
+    def _persistent_digest(self, state):
+        """序列化非易变字段，用于判断是否需要真正落盘"""
+        stable = {k: v for k, v in state.items() if k not in VOLATILE_STATE_KEYS}
+        return json.dumps(stable, sort_keys=True, ensure_ascii=False)
+
+    def _load_state(self):
+        """返回内存中的授权状态，仅当 license.json 的 mtime/size 变化时才重新读取并解密"""
+        with self._state_lock:
+            signature = self._state_file_signature()
+            if self._state_loaded and signature == self._state_signature:
+                return self.state
+            if signature is None:
+                data = {}
+            else:
+                data = self._read_state_file()
+            # 文件被其他进程改写时，保留本进程尚未落盘的易变字段 (如 last_ok_ts)
+            if self._state_dirty:
+                for key in VOLATILE_STATE_KEYS:
+                    if key in self.state and key not in data:
+                        data[key] = self.state[key]
+                    elif key in self.state and key in data:
+                        try:
+                            data[key] = max(int(data[key]), int(self.state[key]))
+                        except Exception:
+                            pass
+            self.state = data
+            self._state_signature = signature
+            self._state_loaded = True
+            self._persisted_digest = self._persistent_digest(data)
+            return self.state
+
+    def _save_state(self, force=False):
+        """合并写入：非易变字段变化时立即落盘，仅易变字段变化时按 STATE_VOLATILE_FLUSH_SECONDS 降频落盘"""
+        with self._state_lock:
+            digest = self._persistent_digest(self.state)
+            now = time.time()
+            if not force and self._state_loaded and digest == self._persisted_digest:
+                if now - self._last_state_write_ts < STATE_VOLATILE_FLUSH_SECONDS:
+                    self._state_dirty = True
+                    return
+            self._write_state_file()
+            self._persisted_digest = digest
+            self._last_state_write_ts = now
+
+    def _write_state_file(self):
         try:
             raw = json.dumps(self.state, ensure_ascii=False).encode('utf-8')
             protected = _crypt_protect(raw)
@@ -252,9 +337,18 @@ class AuthManager:
             else:
                 with open(self.license_file, 'w', encoding='utf-8') as f:
                     json.dump(self.state, f)
+            self._state_signature = self._state_file_signature()
+            self._state_loaded = True
+            self._state_dirty = False
         except Exception as e:
             logger.error(f"保存授权信息失败: {e}")
 
+    def flush_state(self):
+        """将尚未落盘的易变字段写回文件 (进程退出时调用)"""
+        with self._state_lock:
+            if self._state_dirty:
+                self._save_state(force=True)
+
     def _canonical_json(self, data):
         return json.dumps(data, separators=(',', ':'), sort_keys=True)
 
@@ -306,14 +400,98 @@ class AuthManager:
         signature = self.device_private_key.sign(body_bytes)
         return base64.b64encode(signature).decode()
 
-    def _post_signed(self, path, payload):
-        body = self._canonical_json(payload)
-        headers = {
-            "Content-Type": "application/json",
-            "X-Device-Signature": self._sign_body(body.encode())
-        }
+    def _create_http_session(self):
+        """共享 Session：复用 TCP/TLS 连接 (keep-alive)，避免每次请求重新握手"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _backoff_delay(self, attempt):
+        # 指数退避 + 全抖动，避免大量客户端在服务器恢复时同时重试
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+    def _record_http_stat(self, path, elapsed, status_code=None, error=False, retries=0):
+        with self._http_stats_lock:
+            stat = self.http_stats.setdefault(path, {
+                "count": 0, "errors": 0, "retries": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "last_status": None
+            })
+            elapsed_ms = elapsed * 1000
+            stat["count"] += 1
+            stat["retries"] += retries
+            stat["total_ms"] += elapsed_ms
+            stat["max_ms"] = max(stat["max_ms"], elapsed_ms)
+            if error:
+                stat["errors"] += 1
+            stat["last_status"] = status_code
+
+    def get_http_stats(self):
+        """按接口汇总的请求耗时统计 (毫秒)"""
+        with self._http_stats_lock:
+            result = {}
+            for path, stat in self.http_stats.items():
+                item = dict(stat)
+                item["avg_ms"] = round(stat["total_ms"] / stat["count"], 1) if stat["count"] else 0.0
+                item["total_ms"] = round(stat["total_ms"], 1)
+                item["max_ms"] = round(stat["max_ms"], 1)
+                result[path] = item
+            return result
+
+    def log_http_stats(self):
+        for path, stat in sorted(self.get_http_stats().items()):
+            logger.info(
+                f"HTTP {path}: count={stat['count']} avg={stat['avg_ms']}ms max={stat['max_ms']}ms "
+                f"errors={stat['errors']} retries={stat['retries']} last_status={stat['last_status']}"
+            )
+
+    def _request(self, method, path, build_kwargs=None, timeout=10, retries=None, **kwargs):
+        """发送请求，5xx/超时/连接错误时按抖动指数退避重试
+
+        build_kwargs: 可选回调，每次尝试前重新生成请求参数 (签名请求需要刷新 nonce)
+        retries: 最大重试次数，默认 HTTP_MAX_RETRIES
+        """
+        max_retries = HTTP_MAX_RETRIES if retries is None else retries
         url = f"{self.server_url}{path}"
-        return requests.post(url, data=body, headers=headers, timeout=10)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            if build_kwargs:
+                kwargs.update(build_kwargs())
+            try:
+                response = self.http.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt >= max_retries:
+                    self._record_http_stat(path, time.perf_counter() - start, error=True, retries=attempt)
+                    raise
+                logger.warning(f"请求 {path} 失败 ({e.__class__.__name__})，第 {attempt + 1} 次重试")
+            else:
+                if response.status_code < 500 or attempt >= max_retries:
+                    self._record_http_stat(
+                        path, time.perf_counter() - start,
+                        status_code=response.status_code,
+                        error=response.status_code >= 500,
+                        retries=attempt
+                    )
+                    return response
+                logger.warning(f"请求 {path} 返回 {response.status_code}，第 {attempt + 1} 次重试")
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def _post_signed(self, path, payload):
+        def build():
+            # 重试时刷新 ts/nonce 并重新签名，避免被服务器判定为重放
+            if "nonce" in payload:
+                payload["ts"] = int(time.time())
+                payload["nonce"] = uuid.uuid4().hex
+            body = self._canonical_json(payload)
+            headers = {
+                "Content-Type": "application/json",
+                "X-Device-Signature": self._sign_body(body.encode())
+            }
+            return {"data": body, "headers": headers}
+        return self._request("POST", path, build_kwargs=build)
 
     def _load_server_public_key(self):
         if self.server_public_key_pem:
@@ -332,18 +510,27 @@ class AuthManager:
 
         pem = stored_pem or env_pem
 
-        # 强制尝试从服务器获取最新公钥（如果 URL 可达）
+        # 向服务器做条件请求 (ETag)，公钥未变时只返回 304，无需重新传输
         try:
-            url = f"{self.server_url}/api/public-key"
-            response = requests.get(url, timeout=5)  # 短超时
+            headers = {}
+            stored_etag = state.get('server_public_key_etag')
+            if stored_pem and stored_etag:
+                headers["If-None-Match"] = stored_etag
+            # 短超时且不重试：本地已有公钥时不应拖慢启动
+            response = self._request("GET", "/api/public-key", timeout=5, retries=0, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 server_pem = data.get('public_key')
                 if server_pem:
                     pem = server_pem
+                    etag = response.headers.get('ETag')
                     # 更新本地缓存
-                    if server_pem != stored_pem:
+                    if server_pem != stored_pem or etag != stored_etag:
                         state['server_public_key'] = server_pem
+                        if etag:
+                            state['server_public_key_etag'] = etag
+                        else:
+                            state.pop('server_public_key_etag', None)
                         self._save_state()
         except Exception:
             pass
@@ -432,7 +619,6 @@ class AuthManager:
             if not self._is_secure_server_url():
                 return False, "授权服务器地址不安全，请使用 https"
             self._get_or_create_device_keypair()
-            url = f"{self.server_url}/api/activate"
             payload = {
                 "code": code,
                 "machine_id": self.machine_id,
@@ -440,12 +626,7 @@ class AuthManager:
                 "ts": int(time.time()),
                 "nonce": uuid.uuid4().hex
             }
-            body = self._canonical_json(payload)
-            headers = {
-                "Content-Type": "application/json",
-                "X-Device-Signature": self._sign_body(body.encode())
-            }
-            response = requests.post(url, data=body, headers=headers, timeout=10)
+            response = self._post_signed("/api/activate", payload)
             try:
                 data = response.json()
             except json.decoder.JSONDecodeError:
@@ -480,19 +661,13 @@ class AuthManager:
         try:
             if not self._is_secure_server_url():
                 return False, "授权服务器地址不安全，请使用 https"
-            url = f"{self.server_url}/api/heartbeat"
             payload = {
                 "code": self.current_code,
                 "machine_id": self.machine_id,
                 "ts": int(time.time()),
                 "nonce": uuid.uuid4().hex
             }
-            body = self._canonical_json(payload)
-            headers = {
-                "Content-Type": "application/json",
-                "X-Device-Signature": self._sign_body(body.encode())
-            }
-            response = requests.post(url, data=body, headers=headers, timeout=10)
+            response = self._post_signed("/api/heartbeat", payload)
             data = response.json()
             if response.status_code == 200 and data.get("status") == "success":
                 self.state['last_ok_ts'] = int(time.time())
@@ -535,6 +710,7 @@ class AuthManager:
                 }
                 if not self._verify_config_signature(config_payload, config_signature):
                     return False, "配置签名无效"
+                self._save_config_snapshot(config_payload, config_signature, data.get("help_content"))
                 self.state['last_ok_ts'] = int(time.time())
                 if data.get("config_token"):
                     self.state['config_token'] = data.get("config_token")
@@ -546,6 +722,49 @@ class AuthManager:
         except Exception as e:
             return False, f"连接验证服务器失败: {e}"
 
+    def _save_config_snapshot(self, config_payload, config_signature, help_content=None):
+        snapshot = {
+            "payload": config_payload,
+            "signature": config_signature,
+            "help_content": help_content
+        }
+        path = self._get_config_snapshot_path()
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"保存配置快照失败: {e}")
+
+    def load_config_snapshot(self):
+        """读取上次 fetch_config 落盘的签名配置快照 (不访问网络)
+
+        返回值与 fetch_config 成功时的数据结构一致，签名或归属校验失败时返回 (False, 原因)。
+        """
+        if not self.load_license():
+            return False, "未找到授权码"
+        try:
+            with open(self._get_config_snapshot_path(), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception:
+            return False, "无配置快照"
+        payload = snapshot.get("payload") if isinstance(snapshot, dict) else None
+        if not isinstance(payload, dict):
+            return False, "配置快照无效"
+        if payload.get("code") != self.current_code or payload.get("machine_id") != self.machine_id:
+            return False, "配置快照不属于当前授权"
+        if not self._verify_config_signature(payload, snapshot.get("signature")):
+            return False, "配置快照签名无效"
+        return True, {
+            "status": "success",
+            "common_config": payload.get("common_config") or {},
+            "user_config": payload.get("user_config") or {},
+            "help_content": snapshot.get("help_content"),
+            "config_ts": payload.get("ts"),
+            "config_signature": snapshot.get("signature")
+        }
+
     def _ensure_config_token(self, refresh=False):
         state = self._load_state()
         token = state.get('config_token')
@@ -0,0 +1,127 @@
+"""设备公钥解析缓存微基准
+
+对比授权服务器每个签名请求 (心跳 / 配置拉取 / 配置保存) 的验签开销:
+  - 无缓存: 每次 load_pem_public_key 解析 PEM 再验签 (原实现)
+  - 有缓存: 从 device_key_cache 取已解析的公钥再验签
+并分别给出 verify_device_signature 在请求上下文中的整体耗时。
+
+用法:
+  python benchmarks/bench_device_key_cache.py [--devices 1000] [--requests 20000]
+"""
+import argparse
+import base64
+import json
+import os
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "server")
+
+
+def _import_server(work_dir):
+    # 只用于导入 app 模块，数据库放在临时目录，不触碰项目数据
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(work_dir, "auth.db"),
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or secrets.token_urlsafe(32),
+        "ADMIN_PASSWORD": os.environ.get("ADMIN_PASSWORD") or secrets.token_urlsafe(24),
+        "ADMIN_API_KEY": os.environ.get("ADMIN_API_KEY") or secrets.token_urlsafe(24),
+    })
+    sys.path.insert(0, SERVER_DIR)
+    import app as server_app
+    return server_app
+
+
+def _make_devices(n):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    devices = []
+    for i in range(n):
+        private_key = Ed25519PrivateKey.generate()
+        pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        body = json.dumps({"code": "bench", "machine_id": f"m{i}", "ts": int(time.time()),
+                           "nonce": secrets.token_hex(8)}, separators=(',', ':'), sort_keys=True).encode()
+        devices.append((pem, body, private_key.sign(body)))
+    return devices
+
+
+def _measure(fn, devices, requests):
+    """按设备轮询调用 fn，返回每次调用耗时 (微秒) 列表"""
+    samples = []
+    for i in range(requests):
+        pem, body, signature = devices[i % len(devices)]
+        start = time.perf_counter()
+        fn(pem, body, signature)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def _row(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<34}{statistics.mean(samples):>10.1f}{samples[len(samples) // 2]:>10.1f}{p95:>10.1f}"
+          f"{1e6 / statistics.mean(samples):>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备公钥解析缓存微基准")
+    parser.add_argument("--devices", type=int, default=1000, help="不同设备公钥数量")
+    parser.add_argument("--requests", type=int, default=20000, help="每种方式的调用次数")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_key_cache_")
+    server_app = _import_server(work_dir)
+    from cryptography.hazmat.primitives import serialization
+
+    print(f"生成 {args.devices} 个设备密钥...")
+    devices = _make_devices(args.devices)
+    cache = server_app.PublicKeyCache(max(args.devices, server_app.DEVICE_KEY_CACHE_SIZE))
+
+    def parse_and_verify(pem, body, signature):
+        serialization.load_pem_public_key(pem.encode()).verify(signature, body)
+
+    def cached_verify(pem, body, signature):
+        cache.get(pem).verify(signature, body)
+
+    def parse_only(pem, body, signature):
+        serialization.load_pem_public_key(pem.encode())
+
+    def cached_only(pem, body, signature):
+        cache.get(pem)
+
+    flask_app = server_app.app
+
+    def request_verify(pem, body, signature):
+        headers = {"X-Device-Signature": base64.b64encode(signature).decode()}
+        with flask_app.test_request_context("/api/heartbeat", method="POST", data=body, headers=headers):
+            ok, _ = server_app.verify_device_signature(pem)
+        assert ok
+
+    # 预热缓存，测的是稳态 (设备心跳反复使用同一公钥)
+    for pem, _, _ in devices:
+        cache.get(pem)
+
+    print(f"\n{'方式 (每次调用)':<30}{'均值(us)':>10}{'p50(us)':>10}{'p95(us)':>10}{'次/秒':>12}")
+    _row("解析 PEM", _measure(parse_only, devices, args.requests))
+    _row("缓存取公钥", _measure(cached_only, devices, args.requests))
+    _row("解析 + 验签 (原实现)", _measure(parse_and_verify, devices, args.requests))
+    _row("缓存 + 验签", _measure(cached_verify, devices, args.requests))
+
+    server_app.device_key_cache.maxsize = 0
+    server_app.device_key_cache.clear()
+    _row("verify_device_signature 无缓存", _measure(request_verify, devices, args.requests))
+    server_app.device_key_cache.maxsize = max(args.devices, server_app.DEVICE_KEY_CACHE_SIZE)
+    for pem, _, _ in devices:
+        server_app.device_key_cache.get(pem)
+    _row("verify_device_signature 有缓存", _measure(request_verify, devices, args.requests))
+    print(f"\n缓存命中 {server_app.device_key_cache.hits} 次，未命中 {server_app.device_key_cache.misses} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""授权服务器 (server/app.py) 负载基准
+
+模拟大量客户端设备：每台设备有独立的 Ed25519 密钥对，请求体格式、ts/nonce 与
+X-Device-Signature 签名方式与 auth.AuthManager 完全一致；每台设备使用不同的
+X-Forwarded-For 地址，与线上多客户端分布一致 (服务端按 IP 限流)。
+
+流程:
+  1. 在独立子进程中初始化数据库并写入 bench- 前缀的授权码
+  2. 在独立子进程中启动授权服务器 (werkzeug 多线程，或 gunicorn gthread)，
+     通过 SQLAlchemy 事件统计每个接口的 SQL 语句数
+  3. 激活阶段：所有设备调用 /api/activate
+  4. 稳态阶段：按比例混合 /api/heartbeat、/api/config/fetch、/api/config/save
+
+按接口输出吞吐、状态码分布、延迟 p50/p95/p99 与平均每请求 SQL 语句数。
+
+用法:
+  python benchmarks/bench_license_server.py [--devices 2000] [--concurrency 32] [--seconds 30]
+                                            [--database-url postgresql://...] [--server werkzeug|gunicorn]
+默认使用临时 SQLite 文件；指定 --database-url 时会先删除该库中 bench- 前缀的测试数据。
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "server")
+BENCH_PREFIX = "bench-"
+
+sys.path.insert(0, ROOT_DIR)
+from round_metrics import percentile  # noqa: E402
+# 稳态阶段各接口的请求比例 (客户端每 5 分钟心跳，配置拉取/保存较少)
+DEFAULT_MIX = {"heartbeat": 0.7, "config_fetch": 0.2, "config_save": 0.1}
+ENDPOINT_PATHS = {
+    "activate": "/api/activate",
+    "heartbeat": "/api/heartbeat",
+    "config_fetch": "/api/config/fetch",
+    "config_save": "/api/config/save",
+}
+
+
+def _canonical_json(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def _server_env(database_url):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": env.get("SECRET_KEY") or secrets.token_urlsafe(24),
+        "ADMIN_PASSWORD": env.get("ADMIN_PASSWORD") or secrets.token_urlsafe(24),
+        "ADMIN_API_KEY": env.get("ADMIN_API_KEY") or secrets.token_urlsafe(24),
+        "PYTHONPATH": SERVER_DIR + os.pathsep + os.path.dirname(os.path.abspath(__file__)),
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+# --- 子进程: 初始化数据 ---
+
+def seed(licenses, devices_per_license):
+    """删除旧的 bench- 数据并写入新的授权码，输出授权码列表 (JSON)"""
+    from datetime import datetime, timedelta
+
+    import app as server_app
+
+    db = server_app.db
+    with server_app.app.app_context():
+        for model, column in ((server_app.Device, server_app.Device.license_code),
+                              (server_app.ConfigToken, server_app.ConfigToken.license_code),
+                              (server_app.LicenseConfig, server_app.LicenseConfig.license_code),
+                              (server_app.ApiAudit, server_app.ApiAudit.license_code),
+                              (server_app.License, server_app.License.code)):
+            model.query.filter(column.like(BENCH_PREFIX + "%")).delete(synchronize_session=False)
+        db.session.commit()
+        expire = datetime.now() + timedelta(days=365)
+        codes = [f"{BENCH_PREFIX}{uuid.uuid4().hex[:16]}" for _ in range(licenses)]
+        db.session.bulk_save_objects([
+            server_app.License(code=code, max_devices=devices_per_license, expire_date=expire, remark="load test")
+            for code in codes
+        ])
+        db.session.commit()
+    print(json.dumps({"codes": codes}), flush=True)
+
+
+# --- 子进程: 带 SQL 计数的授权服务器 ---
+
+def create_bench_app():
+    """导入 server/app.py 的 app 并挂上 SQL 语句计数 (gunicorn 用 create_bench_app() 作为入口)"""
+    from flask import jsonify, request
+    from sqlalchemy import event
+
+    import app as server_app
+
+    flask_app = server_app.app
+    local = threading.local()
+    lock = threading.Lock()
+    stats = defaultdict(lambda: {"requests": 0, "statements": 0})
+
+    with flask_app.app_context():
+        engine = server_app.db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_statement(conn, cursor, statement, parameters, context, executemany):
+        if getattr(local, "statements", None) is not None:
+            local.statements += 1
+
+    @flask_app.before_request
+    def _start_counting():
+        local.statements = 0
+
+    @flask_app.teardown_request
+    def _finish_counting(exc=None):
+        count = getattr(local, "statements", None)
+        local.statements = None
+        if count is None or request.path.startswith("/__bench"):
+            return
+        with lock:
+            item = stats[request.path]
+            item["requests"] += 1
+            item["statements"] += count
+
+    def bench_stats():
+        with lock:
+            data = {path: dict(item) for path, item in stats.items()}
+            if request.method == "POST":
+                stats.clear()
+        return jsonify(data)
+
+    flask_app.add_url_rule("/__bench/stats", "bench_stats", bench_stats, methods=["GET", "POST"])
+    return flask_app
+
+
+def serve_werkzeug(port):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", port, create_bench_app(), threaded=True)
+    server.serve_forever()
+
+
+# --- 客户端 ---
+
+class SimDevice:
+    def __init__(self, code, index):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+        self.code = code
+        self.machine_id = f"bench-machine-{index:06d}-{uuid.uuid4().hex[:8]}"
+        self.ip = f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+        self.private_key = Ed25519PrivateKey.generate()
+        self.public_pem = self.private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self.config_token = None
+        self.active = False
+        self.lock = threading.Lock()
+
+    def build(self, endpoint):
+        payload = {"code": self.code, "machine_id": self.machine_id,
+                   "ts": int(time.time()), "nonce": uuid.uuid4().hex}
+        if endpoint == "activate":
+            payload["device_public_key"] = self.public_pem
+        elif endpoint == "config_save":
+            payload["config"] = {"sites": [{"name": "bench", "enabled": True, "login_url": "https://example.com"}]}
+            payload["config_token"] = self.config_token
+        body = _canonical_json(payload)
+        headers = {
+            "Content-Type": "application/json",
+            "X-Device-Signature": base64.b64encode(self.private_key.sign(body.encode())).decode(),
+            "X-Forwarded-For": self.ip,
+        }
+        return body, headers
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, seconds):
+        with self.lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            self.statuses[endpoint][status] += 1
+
+
+def _send(session, base_url, device, endpoint, recorder):
+    body, headers = device.build(endpoint)
+    start = time.perf_counter()
+    try:
+        response = session.post(base_url + ENDPOINT_PATHS[endpoint], data=body, headers=headers, timeout=30)
+        status = response.status_code
+    except Exception:
+        recorder.record(endpoint, "error", time.perf_counter() - start)
+        return None
+    recorder.record(endpoint, status, time.perf_counter() - start)
+    if status != 200:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def run_activation(base_url, devices, concurrency, recorder):
+    import requests
+
+    pending = list(devices)
+    pending_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with pending_lock:
+                if not pending:
+                    return
+                device = pending.pop()
+            device.active = _send(session, base_url, device, "activate", recorder) is not None
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def run_steady(base_url, devices, concurrency, seconds, mix, recorder):
+    import requests
+
+    active = [device for device in devices if device.active]
+    if not active:
+        return 0.0
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            device = rng.choice(active)
+            endpoint = rng.choices(endpoints, weights)[0]
+            # 同一设备的请求串行，保存配置前需要先拉取令牌 (与客户端行为一致)
+            if not device.lock.acquire(blocking=False):
+                continue
+            try:
+                if endpoint == "config_save" and not device.config_token:
+                    endpoint = "config_fetch"
+                data = _send(session, base_url, device, endpoint, recorder)
+                if data and data.get("config_token"):
+                    device.config_token = data["config_token"]
+            finally:
+                device.lock.release()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def _fetch_server_stats(base_url, reset=False):
+    import requests
+    try:
+        response = requests.request("POST" if reset else "GET", base_url + "/__bench/stats", timeout=10)
+        return response.json()
+    except Exception:
+        return {}
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def report(title, recorder, duration, server_stats):
+    print(f"\n=== {title} ({duration:.1f}s) ===")
+    print(f"{'接口':<16}{'请求数':>8}{'RPS':>9}{'成功率':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'SQL/请求':>10}  状态码")
+    for endpoint, path in ENDPOINT_PATHS.items():
+        latencies = recorder.latencies.get(endpoint)
+        if not latencies:
+            continue
+        statuses = recorder.statuses[endpoint]
+        ok = statuses.get(200, 0)
+        server = server_stats.get(path) or {}
+        statements = server["statements"] / server["requests"] if server.get("requests") else None
+        ordered = sorted(latencies)
+        status_text = " ".join(f"{k}:{v}" for k, v in sorted(statuses.items(), key=lambda item: str(item[0])))
+        print(f"{endpoint:<16}{len(latencies):>8}{len(latencies) / duration:>9.1f}{ok / len(latencies) * 100:>7.1f}%"
+              f"{percentile(ordered, 50):>10.1f}{percentile(ordered, 95):>10.1f}"
+              f"{percentile(ordered, 99):>10.1f}{_fmt(statements, '>10.1f')}  {status_text}")
+    total = sum(len(v) for v in recorder.latencies.values())
+    if total:
+        all_latencies = [x for values in recorder.latencies.values() for x in values]
+        print(f"{'合计':<16}{total:>8}{total / duration:>9.1f}{'':>8}{statistics.median(all_latencies):>10.1f}")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _start_server(kind, port, env, log_file, threads):
+    if kind == "gunicorn":
+        # 单 worker 多线程，保证 SQL 计数在同一进程内汇总
+        cmd = [sys.executable, "-m", "gunicorn", "-w", "1", "-k", "gthread", "--threads", str(threads),
+               "-b", f"127.0.0.1:{port}", "bench_license_server:create_bench_app()"]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)]
+    return subprocess.Popen(cmd, cwd=SERVER_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="授权服务器负载基准")
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--devices-per-license", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32, help="并发客户端线程数")
+    parser.add_argument("--seconds", type=int, default=30, help="稳态阶段时长")
+    parser.add_argument("--database-url", help="默认使用临时 SQLite 文件")
+    parser.add_argument("--server", default="werkzeug", choices=["werkzeug", "gunicorn"])
+    parser.add_argument("--server-threads", type=int, default=32, help="gunicorn gthread 线程数")
+    parser.add_argument("--mix", default=None, help='稳态请求比例 JSON，如 {"heartbeat":0.8,"config_fetch":0.2}')
+    parser.add_argument("--keep-log", action="store_true", help="保留服务端日志 (默认基准结束后删除)")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_werkzeug(args.port)
+        return
+    if args.seed:
+        seed(args.seed, args.devices_per_license)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_license_")
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'auth.db')}"
+    env = _server_env(database_url)
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    licenses = (args.devices + args.devices_per_license - 1) // args.devices_per_license
+    server = None
+    log_path = os.path.join(work_dir, "server.log")
+    try:
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--seed", str(licenses),
+             "--devices-per-license", str(args.devices_per_license)],
+            cwd=SERVER_DIR, env=env, stderr=subprocess.DEVNULL, text=True
+        )
+        codes = json.loads(output.strip().splitlines()[-1])["codes"]
+
+        print(f"生成 {args.devices} 台设备的密钥...")
+        devices = [SimDevice(codes[i // args.devices_per_license], i) for i in range(args.devices)]
+
+        port = _free_port()
+        with open(log_path, "w", encoding="utf-8") as log_file:
+            server = _start_server(args.server, port, env, log_file, args.server_threads)
+        if not _wait_port(port):
+            raise RuntimeError(f"授权服务器未能启动，日志: {log_path}")
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"授权服务器 ({args.server}) 已启动: {base_url}，数据库: {database_url.split('@')[-1]}")
+
+        # 预热：首次请求时服务端才会生成/加载授权签名密钥，避免计入激活阶段
+        import requests
+        requests.get(base_url + "/api/public-key", timeout=30)
+
+        recorder = Recorder()
+        _fetch_server_stats(base_url, reset=True)
+        duration = run_activation(base_url, devices, args.concurrency, recorder)
+        report(f"激活阶段 {args.devices} 台设备", recorder, duration, _fetch_server_stats(base_url, reset=True))
+
+        recorder = Recorder()
+        duration = run_steady(base_url, devices, args.concurrency, args.seconds, mix, recorder)
+        report(f"稳态阶段 并发 {args.concurrency}", recorder, duration, _fetch_server_stats(base_url, reset=True))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if args.keep_log:
+            print(f"\n服务端日志: {log_path}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""远程查看画面带宽基准
+
+合成一个静止的登录/验证码页面 (仅有闪烁光标与小型加载动画变化)，
+按截屏帧率生成 JPEG 序列，对比逐帧完整 JPEG 与关键帧 + 脏区块增量编码的下行带宽。
+
+用法:
+  python benchmarks/bench_remote_frames.py [--seconds 30] [--fps 10] [--check]
+  --check 时增量编码带宽超过 --max-kbps (默认 50 KB/s) 以退出码 1 结束。
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from frame_codec import FRAME_KEY, TileEncoder  # noqa: E402
+from remote_channel import FRAME_HEADER  # noqa: E402
+
+WIDTH, HEIGHT = 1280, 800
+QUALITY = 60
+
+
+def _base_page():
+    """带表单、按钮、验证码图片区域的静态页面"""
+    image = Image.new("RGB", (WIDTH, HEIGHT), (245, 246, 248))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, WIDTH, 64), fill=(32, 96, 200))
+    draw.rectangle((440, 160, 840, 640), fill=(255, 255, 255), outline=(210, 210, 210))
+    for i, top in enumerate((220, 290)):
+        draw.rectangle((480, top, 800, top + 44), outline=(180, 180, 180))
+        draw.text((492, top + 14), ["账号", "密码"][i], fill=(150, 150, 150))
+    # 验证码图片：噪点纹理，JPEG 压缩成本高
+    for x in range(480, 800, 4):
+        for y in range(360, 520, 4):
+            shade = (x * 7 + y * 13) % 255
+            draw.rectangle((x, y, x + 3, y + 3), fill=(shade, 255 - shade, (shade * 3) % 255))
+    draw.rectangle((480, 540, 800, 584), fill=(32, 96, 200))
+    return image
+
+
+def _frame(base, index, fps):
+    image = base.copy()
+    draw = ImageDraw.Draw(image)
+    # 输入框光标每 0.5 秒闪烁一次
+    if int(index / fps * 2) % 2 == 0:
+        draw.line((500, 228, 500, 256), fill=(0, 0, 0), width=2)
+    # 按钮上的加载动画
+    angle = (index * 30) % 360
+    draw.pieslice((620, 546, 652, 578), angle, angle + 90, fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=QUALITY)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="远程查看画面带宽基准")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--fps", type=int, default=10)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--max-kbps", type=float, default=50.0, help="增量编码带宽阈值 (KB/s)")
+    args = parser.parse_args()
+
+    base = _base_page()
+    total = args.seconds * args.fps
+    frames = [_frame(base, i, args.fps) for i in range(total)]
+
+    encoder = TileEncoder()
+    full_bytes = 0
+    delta_bytes = 0
+    encode_ms = []
+    for i, jpeg in enumerate(frames):
+        full_bytes += FRAME_HEADER.size + len(jpeg)
+        start = time.perf_counter()
+        encoded = encoder.encode(jpeg, now=i / args.fps)
+        encode_ms.append((time.perf_counter() - start) * 1000)
+        if encoded is not None:
+            kind, body = encoded
+            delta_bytes += FRAME_HEADER.size + len(body)
+            if i == 0 and kind != FRAME_KEY:
+                raise RuntimeError("首帧必须是关键帧")
+
+    full_kbps = full_bytes / 1024 / args.seconds
+    delta_kbps = delta_bytes / 1024 / args.seconds
+    print(f"帧数 {total} ({args.seconds}s @ {args.fps}fps, 单帧 JPEG 约 {len(frames[0]) / 1024:.1f} KB)")
+    print(f"完整 JPEG:   {full_kbps:>8.1f} KB/s")
+    print(f"区块增量:    {delta_kbps:>8.1f} KB/s  "
+          f"(关键帧 {encoder.keyframes}, 增量帧 {encoder.delta_frames}, 跳过 {encoder.skipped_frames})")
+    print(f"编码耗时:    中位数 {statistics.median(encode_ms):.1f} ms, 最大 {max(encode_ms):.1f} ms")
+
+    if args.check and delta_kbps > args.max_kbps:
+        print(f"增量编码带宽超过阈值 {args.max_kbps} KB/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""端到端抓取轮次基准 (本地模拟站点)
+
+启动 site_fixtures 中的模拟后台 (Element UI / ewei_shopv2 / Ant Design / 登录页 / 弹窗)，
+在独立子进程中用真实浏览器运行 check_orders (并发) 与 check_orders_serial (串行)，统计:
+  - 每轮墙钟耗时 (第 1 轮为冷启动：新建页面、自动登录；之后为复用页面)
+  - Playwright/CDP 调用次数 (通过 span_trace 计数)
+  - 浏览器进程树内存与 Python 进程内存
+  - 抓取成功站点数与数量是否与模拟站点一致
+
+需要本机已安装 Playwright 浏览器。子进程使用临时目录作为工作目录和 config.json，
+不会读取/修改项目下的配置、浏览器数据与授权文件，也不发送通知。
+
+用法:
+  python benchmarks/bench_rounds.py [--sites 10,50,200] [--modes concurrent,serial] [--rounds 2]
+                                    [--latency-ms 100] [--kinds element,ewei,antd,login,popup]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+RESULT_PREFIX = "BENCH_RESULT:"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _count_lines(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def _memory_mb(pid):
+    """返回 (进程树 RSS MB, 进程数)；未安装 psutil 时返回 (None, None)"""
+    try:
+        import psutil
+    except ImportError:
+        return None, None
+    try:
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return None, None
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1024 / 1024, len(procs)
+
+
+def run_child(mode, sites, rounds, latency_ms, kinds, work_dir):
+    """子进程: 在临时工作目录中运行若干轮抓取，每轮输出一行结果"""
+    os.chdir(work_dir)
+    from site_fixtures import FixtureFarm
+
+    farm = FixtureFarm().start()
+    farm.populate(sites, kinds=kinds, latency_ms=latency_ms)
+    config = farm.config(headless=True, trace_playwright=(mode == "concurrent"), trace_max_files=1000)
+    config_path = os.path.join(work_dir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False)
+
+    import main
+    import span_trace
+
+    # 基准只测抓取本身：配置直接来自模拟站点，不做授权校验，不发送通知
+    main.get_config_path = lambda: config_path
+    main.load_config = lambda: config
+    main._ensure_runtime_authorized = lambda: True
+    main.send_wecom_notification = lambda *args, **kwargs: None
+    main.send_feishu_notification = lambda *args, **kwargs: None
+
+    span_trace.install()
+    span_trace.tracer.configure(os.path.join(work_dir, "traces"), max_files=1000)
+    expected = {farm.site_config(sid)["name"]: site["count"] for sid, site in farm.sites.items()}
+
+    manager = main.BrowserManager()
+    manager.cdp_port = _free_port()
+    manager.standby_port = _free_port()
+    try:
+        manager.start()
+        for round_index in range(rounds):
+            farm_requests = farm.requests
+            if mode == "serial":
+                span_trace.tracer.start_round()
+                start = time.perf_counter()
+                main.check_orders_serial(manager)
+                wall = time.perf_counter() - start
+                results = None
+            else:
+                start = time.perf_counter()
+                results = main.check_orders(manager)
+                wall = time.perf_counter() - start
+            span_trace.tracer.end_round()
+            browser_mb, browser_procs = _memory_mb(manager.supervisor.pid) if manager.supervisor.pid else (None, None)
+            python_mb, _ = _memory_mb(os.getpid())
+            correct = None
+            if results is not None:
+                correct = sum(1 for r in results if not r.get("error") and r.get("count") == expected.get(r.get("name")))
+            print(RESULT_PREFIX + json.dumps({
+                "mode": mode,
+                "sites": sites,
+                "round": round_index + 1,
+                "wall_s": wall,
+                "cdp_calls": _count_lines(span_trace.tracer.path),
+                "http_requests": farm.requests - farm_requests,
+                "browser_mb": browser_mb,
+                "browser_procs": browser_procs,
+                "python_mb": python_mb,
+                "correct": correct,
+            }), flush=True)
+    finally:
+        manager.stop()
+        manager.supervisor.terminate()
+        farm.stop()
+
+
+def run_case(mode, sites, rounds, latency_ms, kinds, timeout, verbose):
+    work_dir = tempfile.mkdtemp(prefix="bench_rounds_")
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--modes", mode, "--sites", str(sites),
+           "--rounds", str(rounds), "--latency-ms", str(latency_ms), "--kinds", ",".join(kinds),
+           "--work-dir", work_dir]
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, PYTHONUNBUFFERED="1")
+    results = []
+    try:
+        proc = subprocess.Popen(cmd, cwd=work_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace")
+        deadline = time.time() + timeout
+        for line in proc.stdout:
+            if line.startswith(RESULT_PREFIX):
+                results.append(json.loads(line[len(RESULT_PREFIX):]))
+            elif verbose:
+                sys.stdout.write("    | " + line)
+            if time.time() > deadline:
+                proc.kill()
+                print(f"  [{mode} x {sites}] 超时 ({timeout}s)，已终止")
+                break
+        proc.wait()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端抓取轮次基准 (本地模拟站点)")
+    parser.add_argument("--sites", default="10,50,200", help="站点数量，逗号分隔")
+    parser.add_argument("--modes", default="concurrent,serial", help="concurrent (check_orders) / serial (check_orders_serial)")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--latency-ms", type=int, default=100, help="模拟站点每个请求的服务端延迟")
+    parser.add_argument("--kinds", default="element,ewei,antd,login,popup", help="模拟站点类型，按顺序轮流分配")
+    parser.add_argument("--timeout", type=int, default=3600, help="单个组合的最长运行时间 (秒)")
+    parser.add_argument("--verbose", action="store_true", help="输出子进程日志")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    if args.child:
+        run_child(args.modes, int(args.sites), args.rounds, args.latency_ms, kinds, args.work_dir)
+        return
+
+    print(f"{'模式':<12}{'站点':>6}{'轮次':>6}{'耗时(s)':>10}{'CDP调用':>9}{'HTTP请求':>9}"
+          f"{'浏览器MB':>10}{'进程':>6}{'PythonMB':>10}{'正确':>6}")
+    for sites in [int(s) for s in args.sites.split(",") if s.strip()]:
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            for r in run_case(mode, sites, args.rounds, args.latency_ms, kinds, args.timeout, args.verbose):
+                print(f"{r['mode']:<12}{r['sites']:>6}{r['round']:>6}{r['wall_s']:>10.1f}{r['cdp_calls']:>9}"
+                      f"{r['http_requests']:>9}{_fmt(r['browser_mb'], '>10.0f')}{_fmt(r['browser_procs'], '>6')}"
+                      f"{_fmt(r['python_mb'], '>10.0f')}{_fmt(r['correct'], '>6')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""监控后端启动耗时回归基准
+
+测量三项与启动路径相关的耗时:
+  1. import auth          模块导入 (不应再同步执行 wmic 获取机器码)
+  2. snapshot_config      从本地签名快照加载授权与配置 (不访问网络)
+  3. boot_serial / boot_graph
+                          真实启动步骤 (Web 服务、load_config、授权校验、BrowserManager.start)
+                          串行执行与按并发启动图执行的总耗时，每轮在独立子进程中冷启动。
+                          授权服务器指向无人监听的端口 (网络请求立即失败)，CDP 探测与
+                          connect_over_cdp 替换为本地桩对象，不需要真实浏览器。
+
+用法:
+  python benchmarks/bench_startup.py [--rounds 5] [--check]
+  --check 时任一项超过阈值则以退出码 1 结束，便于发布前回归检查。
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+
+RESULT_PREFIX = "BENCH_RESULT:"
+# 无服务监听的端口：授权服务器请求立即失败，相当于离线
+OFFLINE_SERVER = "http://127.0.0.1:9"
+BOOT_STEPS = ("web_server", "config", "license", "browser")
+
+
+def _canonical_json(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def _sign(private_key, payload):
+    return base64.b64encode(private_key.sign(_canonical_json(payload).encode())).decode()
+
+
+def bench_import_auth():
+    code = "import time; t = time.perf_counter(); import auth; print(time.perf_counter() - t)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT_DIR, stderr=subprocess.DEVNULL)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def _write_signed_fixture(work_dir, machine_id):
+    """生成服务器密钥，写入签名的 license.json 与 config_snapshot.json"""
+    server_key = Ed25519PrivateKey.generate()
+    public_pem = server_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    license_payload = {
+        "code": "BENCH-CODE",
+        "machine_id": machine_id,
+        "expire_date": "2099-12-31",
+        "max_devices": 1,
+        "issued_at": int(time.time())
+    }
+    state = {
+        "machine_id": machine_id,
+        "server_public_key": public_pem,
+        "license": license_payload,
+        "license_signature": _sign(server_key, license_payload)
+    }
+    license_file = os.path.join(work_dir, "license.json")
+    with open(license_file, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    config_payload = {
+        "code": "BENCH-CODE",
+        "machine_id": machine_id,
+        "ts": int(time.time()),
+        "common_config": {"sites": [{"name": f"site-{i}", "login_url": "http://127.0.0.1/"} for i in range(50)]},
+        "user_config": {"interval": 420}
+    }
+    snapshot = {"payload": config_payload, "signature": _sign(server_key, config_payload), "help_content": ""}
+    with open(os.path.join(work_dir, "config_snapshot.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    return license_file
+
+
+def bench_snapshot_config():
+    from auth import AuthManager
+    with tempfile.TemporaryDirectory() as work_dir:
+        license_file = _write_signed_fixture(work_dir, "bench-machine-id")
+        # 端口 9 无服务监听：公钥重新校验请求会立即失败并回退到本地公钥
+        start = time.perf_counter()
+        manager = AuthManager(server_url="http://127.0.0.1:9", license_file=license_file)
+        code = manager.load_license()
+        ok, _ = manager.load_config_snapshot()
+        elapsed = time.perf_counter() - start
+        if not code or not ok:
+            raise RuntimeError("签名快照校验失败")
+        return elapsed
+
+
+class _StubContext:
+    def add_cookies(self, cookies):
+        pass
+
+    def add_init_script(self, script):
+        pass
+
+
+class _StubBrowser:
+    def __init__(self):
+        self.contexts = [_StubContext()]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _prepare_boot_dir():
+    """临时工作目录：签名授权/配置快照、config.json、全局 Cookie 文件"""
+    work_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    _write_signed_fixture(work_dir, "bench-machine-id")
+    with open(os.path.join(work_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"headless": True, "browser_standby": False, "sites": []}, f)
+    os.makedirs(os.path.join(work_dir, "cookies"))
+    cookies = [{"name": f"c{i}", "value": "x", "domain": "127.0.0.1", "path": "/"} for i in range(50)]
+    with open(os.path.join(work_dir, "cookies", "global_state.json"), "w", encoding="utf-8") as f:
+        json.dump({"cookies": cookies}, f)
+    return work_dir
+
+
+def run_boot_child(mode, work_dir):
+    """子进程: 执行一次真实启动步骤 (serial 串行 / graph 并发启动图)，输出各步骤耗时"""
+    os.chdir(work_dir)
+    import main
+    from auth import AuthManager
+    from playwright.sync_api import BrowserType
+    from startup import BootGraph
+
+    config_path = os.path.join(work_dir, "config.json")
+    main.get_config_path = lambda: config_path
+    main.auth_manager = AuthManager(server_url=OFFLINE_SERVER, license_file=os.path.join(work_dir, "license.json"))
+    main.BrowserManager._probe_devtools = (
+        lambda self, port, timeout=0.5: {"webSocketDebuggerUrl": f"ws://127.0.0.1:{port}/devtools/browser/bench"}
+    )
+    BrowserType.connect_over_cdp = lambda self, endpoint, **kwargs: _StubBrowser()
+    manager = main.BrowserManager()
+    steps = {
+        "web_server": main._start_web_server_background,
+        "config": main.load_config,
+        "license": main.auth_manager.load_license,
+        "browser": manager.start,
+    }
+
+    # 与 main.py 的 __main__ / run_scheduler 相同的编排
+    boot = BootGraph()
+    if mode == "graph":
+        boot.add("license", steps["license"])
+        boot.add("web_server", steps["web_server"])
+        boot.add("config", steps["config"])
+        boot.start()
+        boot.run_inline("browser", steps["browser"])
+        for name in BOOT_STEPS:
+            boot.wait(name)
+    else:
+        for name in BOOT_STEPS:
+            boot.run_inline(name, steps[name])
+    total = time.perf_counter() - boot.origin
+    failed = [name for name in BOOT_STEPS if boot.tasks[name].error is not None]
+    durations = {row["name"]: row["duration"] for row in boot.timings()}
+    print(RESULT_PREFIX + json.dumps({"total": total, "steps": durations, "failed": failed}), flush=True)
+    # Web 服务与 Playwright 驱动线程不会自行退出
+    os._exit(0)
+
+
+def bench_boot(mode):
+    work_dir = _prepare_boot_dir()
+    try:
+        env = dict(os.environ, PYTHONPATH=ROOT_DIR, WEB_SERVER_PORT=str(_free_port()))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--boot-child", mode, "--work-dir", work_dir],
+            cwd=work_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding="utf-8", errors="replace", timeout=120
+        ).stdout
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for line in output.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            if result["failed"]:
+                raise RuntimeError(f"启动步骤失败: {', '.join(result['failed'])}")
+            return result
+    raise RuntimeError("启动子进程未输出结果:\n" + output[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监控后端启动耗时回归基准")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="超过阈值时返回非零退出码")
+    parser.add_argument("--max-import", type=float, default=1.5, help="import auth 阈值 (秒)")
+    parser.add_argument("--max-snapshot", type=float, default=0.5, help="快照加载阈值 (秒)")
+    parser.add_argument("--boot-child", choices=("serial", "graph"), help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.boot_child:
+        run_boot_child(args.boot_child, args.work_dir)
+        return
+
+    thresholds = {
+        "import_auth": args.max_import,
+        "snapshot_config": args.max_snapshot,
+    }
+    benches = {
+        "import_auth": bench_import_auth,
+        "snapshot_config": bench_snapshot_config,
+    }
+
+    failed = False
+
+    def _row(name, samples, threshold):
+        nonlocal failed
+        median = statistics.median(samples)
+        over = threshold is not None and median > threshold
+        failed = failed or over
+        flag = "  <-- 超出阈值" if over else ""
+        limit = f"{threshold:>10.3f}" if threshold is not None else f"{'-':>10}"
+        print(f"{name:<18}{median:>12.3f}{max(samples):>10.3f}{limit}{flag}")
+
+    print(f"{'项目':<18}{'中位数(s)':>12}{'最大(s)':>10}{'阈值(s)':>10}")
+    for name, func in benches.items():
+        _row(name, [func() for _ in range(args.rounds)], thresholds[name])
+
+    boot_results = {mode: [bench_boot(mode) for _ in range(args.rounds)] for mode in ("serial", "graph")}
+    serial_median = statistics.median(r["total"] for r in boot_results["serial"])
+    _row("boot_serial", [r["total"] for r in boot_results["serial"]], None)
+    # 并发启动图不应比串行执行慢 (允许 10% 抖动)
+    _row("boot_graph", [r["total"] for r in boot_results["graph"]], serial_median * 1.1)
+
+    print(f"\n{'启动步骤 (中位数)':<18}{'串行(s)':>12}{'并发(s)':>10}")
+    for step in BOOT_STEPS:
+        serial = statistics.median(r["steps"][step] for r in boot_results["serial"])
+        graph = statistics.median(r["steps"][step] for r in boot_results["graph"])
+        print(f"{step:<18}{serial:>12.3f}{graph:>10.3f}")
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
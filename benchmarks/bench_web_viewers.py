@@ -0,0 +1,225 @@
+"""远程控制 Web 服务并发查看端负载基准
+
+在子进程中启动内嵌 Web 服务 (模拟截屏持续出帧)，由本进程模拟 N 个 WebSocket 查看端
+(接收画面帧并确认) 和若干 HTTP 操作请求，统计:
+  - 每个查看端收到的帧率
+  - /action 请求延迟 p50/p95
+  - 服务进程的线程数、内存、CPU
+  - 优雅关闭耗时，以及查看端是否收到 1001 关闭
+
+用法:
+  python benchmarks/bench_web_viewers.py [--mode threaded|gevent|both] [--viewers 50] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(mode, port, fps):
+    """子进程: 启动 Web 服务与模拟截屏，收到 stdin 的 stop 后优雅关闭"""
+    import queue
+
+    import shared
+    import web_server
+    from bench_remote_frames import _base_page, _frame
+
+    base = _base_page()
+    frames = [_frame(base, i, fps) for i in range(fps * 2)]
+    shared.is_interactive_mode = True
+    shared.current_site_name = "bench"
+
+    def produce():
+        i = 0
+        while shared.is_interactive_mode:
+            shared.set_screenshot(frames[i % len(frames)])
+            i += 1
+            time.sleep(1.0 / fps)
+
+    def drain_actions():
+        while True:
+            try:
+                shared.command_queue.get(timeout=1)
+            except queue.Empty:
+                pass
+
+    threading.Thread(target=produce, daemon=True).start()
+    threading.Thread(target=drain_actions, daemon=True).start()
+    threading.Thread(target=web_server.run_server, kwargs={"host": "127.0.0.1", "port": port, "mode": mode},
+                     daemon=True).start()
+    print(json.dumps({"token": web_server.ACCESS_TOKEN}), flush=True)
+    sys.stdin.readline()
+    start = time.perf_counter()
+    stopped = web_server.stop_server()
+    print(json.dumps({"shutdown_s": time.perf_counter() - start, "stopped": stopped}), flush=True)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+class Viewer(threading.Thread):
+    def __init__(self, url, stop_event):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop_event = stop_event
+        self.frames = 0
+        self.bytes = 0
+        self.close_reason = None
+        self.error = None
+
+    def run(self):
+        import simple_websocket
+        try:
+            ws = simple_websocket.Client.connect(self.url)
+        except Exception as e:
+            self.error = str(e)
+            return
+        last_action = 0.0
+        try:
+            while True:
+                message = ws.receive(timeout=0.5)
+                if isinstance(message, bytes):
+                    self.frames += 1
+                    self.bytes += len(message)
+                    seq = struct.unpack(">BI", message[:5])[1]
+                    ws.send(json.dumps({"type": "ack", "seq": seq}))
+                now = time.time()
+                if not self.stop_event.is_set() and now - last_action > 1.0:
+                    ws.send(json.dumps({"type": "mousemove", "x_pct": 0.5, "y_pct": 0.5}))
+                    last_action = now
+        except simple_websocket.ConnectionClosed as e:
+            self.close_reason = e.reason
+        except Exception as e:
+            self.error = str(e)
+
+
+def _post_actions(base_url, token, stop_event, latencies):
+    import requests
+    session = requests.Session()
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            session.post(f"{base_url}/action", json={"type": "mousemove", "x_pct": 0.1, "y_pct": 0.1},
+                         headers={"X-Access-Token": token}, timeout=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            pass
+        time.sleep(0.2)
+
+
+def run_mode(mode, viewers, seconds, fps, posters):
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    port = _free_port()
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--mode", mode, "--port", str(port), "--fps", str(fps)],
+        cwd=ROOT_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    token = json.loads(child.stdout.readline())["token"]
+    if not _wait_port(port):
+        child.kill()
+        raise RuntimeError("Web 服务未能启动")
+    proc = psutil.Process(child.pid) if psutil else None
+    cpu_before = sum(proc.cpu_times()[:2]) if proc else 0.0
+
+    stop_event = threading.Event()
+    clients = [Viewer(f"ws://127.0.0.1:{port}/ws/control?token={token}", stop_event) for _ in range(viewers)]
+    for client in clients:
+        client.start()
+    latencies = []
+    poster_threads = [threading.Thread(target=_post_actions, args=(f"http://127.0.0.1:{port}", token, stop_event, latencies),
+                                       daemon=True) for _ in range(posters)]
+    for thread in poster_threads:
+        thread.start()
+
+    time.sleep(seconds)
+    stop_event.set()
+    threads = proc.num_threads() if proc else None
+    rss_mb = proc.memory_info().rss / 1024 / 1024 if proc else None
+    cpu = (sum(proc.cpu_times()[:2]) - cpu_before) / seconds * 100 if proc else None
+
+    child.stdin.write("stop\n")
+    child.stdin.flush()
+    shutdown = json.loads(child.stdout.readline())
+    for client in clients:
+        client.join(timeout=5)
+    child.wait(timeout=10)
+
+    fps_list = [client.frames / seconds for client in clients]
+    closed_1001 = sum(1 for client in clients if client.close_reason == 1001)
+    errors = sum(1 for client in clients if client.error)
+    return {
+        "mode": mode,
+        "viewers": viewers,
+        "fps_avg": statistics.mean(fps_list) if fps_list else 0.0,
+        "fps_min": min(fps_list) if fps_list else 0.0,
+        "kbps_avg": statistics.mean(c.bytes for c in clients) / 1024 / seconds if clients else 0.0,
+        "action_p50": statistics.median(latencies) if latencies else None,
+        "action_p95": statistics.quantiles(latencies, n=20)[18] if len(latencies) >= 20 else None,
+        "threads": threads,
+        "rss_mb": rss_mb,
+        "cpu_pct": cpu,
+        "shutdown_s": shutdown["shutdown_s"],
+        "closed_1001": closed_1001,
+        "errors": errors,
+    }
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="远程控制 Web 服务并发查看端负载基准")
+    parser.add_argument("--mode", default="both", choices=["threaded", "gevent", "both"])
+    parser.add_argument("--viewers", type=int, default=50)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=10, help="模拟截屏帧率")
+    parser.add_argument("--posters", type=int, default=4, help="并发发送 /action 的 HTTP 客户端数")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.mode, args.port, args.fps)
+        return
+
+    modes = ["threaded", "gevent"] if args.mode == "both" else [args.mode]
+    print(f"{'模式':<10}{'查看端':>6}{'帧率均值':>9}{'帧率最低':>9}{'KB/s':>8}{'操作p50':>9}{'操作p95':>9}"
+          f"{'线程':>6}{'内存MB':>8}{'CPU%':>7}{'关闭(s)':>8}{'1001':>6}{'错误':>5}")
+    for mode in modes:
+        r = run_mode(mode, args.viewers, args.seconds, args.fps, args.posters)
+        print(f"{r['mode']:<10}{r['viewers']:>6}{r['fps_avg']:>9.1f}{r['fps_min']:>9.1f}{r['kbps_avg']:>8.1f}"
+              f"{_fmt(r['action_p50'], '>9.1f')}{_fmt(r['action_p95'], '>9.1f')}{_fmt(r['threads'], '>6')}"
+              f"{_fmt(r['rss_mb'], '>8.1f')}{_fmt(r['cpu_pct'], '>7.1f')}{r['shutdown_s']:>8.2f}"
+              f"{r['closed_1001']:>6}{r['errors']:>5}")
+
+
+if __name__ == "__main__":
+    main()
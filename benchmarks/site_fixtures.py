@@ -0,0 +1,260 @@
+"""本地模拟后台站点 (用于端到端抓取基准，不访问真实店铺后台)
+
+一个 Flask 服务按路径前缀 /s/<sid>/ 承载任意数量的模拟站点，每个站点模仿一类线上平台:
+  element  Element UI 标签页布局，"待审核(N)" 在 tab 文字中 (无数量选择器，走关键字扫描)
+  ewei     ewei_shopv2 订单列表 (index.php?...&r=order.list.status1)，数量在 label 中
+  antd     Ant Design 单页应用，订单数量由 JSON 接口异步加载
+  login    需要登录的后台：登录页表单，提交后写入会话 Cookie
+  popup    打开订单页时弹出公告对话框 (Element UI dialog)，需先关闭
+
+每个站点的响应延迟与待处理订单数可控 (FixtureFarm.set_count / set_latency)。
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, abort, jsonify, make_response, redirect, request
+from werkzeug.serving import BaseWSGIServer, make_server
+
+KINDS = ("element", "ewei", "antd", "login", "popup")
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 0; }}
+.el-tabs__item, .ant-tabs-tab {{ display: inline-block; padding: 8px 16px; }}
+.el-dialog__wrapper {{ position: fixed; inset: 0; background: rgba(0,0,0,.5); }}
+.el-dialog {{ background: #fff; width: 400px; margin: 120px auto; padding: 20px; }}
+</style></head>
+<body>{body}</body></html>"""
+
+
+def _element_body(site):
+    return f"""
+<div class="el-tabs__header">
+  <div class="el-tabs__item" id="tab-all">全部订单</div>
+  <div class="el-tabs__item is-active" id="tab-pending">待审核({site['count']})</div>
+  <div class="el-tabs__item" id="tab-done">已完成(128)</div>
+</div>
+<table class="el-table">{''.join(f'<tr><td>订单 {i}</td><td>待审核</td></tr>' for i in range(site['count']))}</table>
+"""
+
+
+def _ewei_body(site):
+    return f"""
+<ul class="nav nav-tabs">
+  <li class="order-status-1"><a href="#">待发货 <span class="label label-warning count">{site['count']}</span></a></li>
+  <li class="order-status-3"><a href="#">已完成</a></li>
+</ul>
+<table class="table">{''.join(f'<tr><td>SH2024{i:06d}</td></tr>' for i in range(site['count']))}</table>
+"""
+
+
+def _antd_body(site, prefix):
+    return f"""
+<div id="root"><div class="ant-spin">加载中...</div></div>
+<script>
+fetch('{prefix}api/orders?status=pending').then(r => r.json()).then(data => {{
+  document.getElementById('root').innerHTML =
+    '<div class="ant-tabs-nav"><div class="ant-tabs-tab">全部</div>' +
+    '<div class="ant-tabs-tab ant-tabs-tab-active">待审核(' + data.total + ')</div></div>' +
+    '<span class="ant-badge"><sup class="ant-badge-count">' + data.total + '</sup></span>';
+}});
+</script>
+"""
+
+
+def _popup_body(site):
+    return _element_body(site) + """
+<div class="el-dialog__wrapper" id="notice">
+  <div class="el-dialog"><div class="el-dialog__header">系统公告
+    <button class="el-dialog__headerbtn" aria-label="Close"
+            onclick="document.getElementById('notice').remove()">×</button></div>
+  <div class="el-dialog__body">平台将于今晚维护。</div></div>
+</div>
+"""
+
+
+_LOGIN_BODY = """
+<form method="post" action="{action}">
+  <input id="username" name="username" placeholder="请输入账号" type="text">
+  <input id="password" name="password" type="password">
+  <button id="login-btn" type="submit">登录</button>
+</form>
+"""
+
+
+class FixtureFarm:
+    """在后台线程运行的模拟站点服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.sites: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[BaseWSGIServer] = None
+        self.app = self._build_app()
+
+    # --- 站点管理 ---
+    def add_site(self, sid: str, kind: str, count: int = 0, latency_ms: int = 0) -> Dict[str, Any]:
+        if kind not in KINDS:
+            raise ValueError(f"未知站点类型: {kind}")
+        site = {"sid": sid, "kind": kind, "count": count, "latency_ms": latency_ms}
+        self.sites[sid] = site
+        return site
+
+    def populate(self, n: int, kinds=KINDS, latency_ms: int = 0, max_count: int = 5, seed: int = 0) -> None:
+        rng = random.Random(seed)
+        for i in range(n):
+            self.add_site(f"s{i:03d}", kinds[i % len(kinds)], count=rng.randint(0, max_count), latency_ms=latency_ms)
+
+    def set_count(self, sid: str, count: int) -> None:
+        self.sites[sid]["count"] = count
+
+    def set_latency(self, latency_ms: int, sid: Optional[str] = None) -> None:
+        for site in ([self.sites[sid]] if sid else self.sites.values()):
+            site["latency_ms"] = latency_ms
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def site_config(self, sid: str) -> Dict[str, Any]:
+        """生成该站点在 config.json 中的配置 (与线上站点配置字段一致)"""
+        site = self.sites[sid]
+        prefix = f"{self.base_url}/s/{sid}/"
+        kind = site["kind"]
+        selectors: Dict[str, Any] = {}
+        config: Dict[str, Any] = {"name": f"{kind}-{sid}", "enabled": True, "login_url": prefix + "login",
+                                  "username": "bench", "password": "bench", "selectors": selectors}
+        if kind == "element" or kind == "popup":
+            selectors["order_menu_link"] = prefix + "orders"
+            selectors["pending_tab_selector"] = "#tab-pending"
+        elif kind == "ewei":
+            selectors["order_menu_link"] = prefix + "web/index.php?c=site&a=entry&m=ewei_shopv2&do=web&r=order.list.status1"
+            selectors["pending_count_element"] = ".order-status-1 .count"
+        elif kind == "antd":
+            selectors["order_menu_link"] = prefix + "orders"
+            selectors["pending_count_element"] = ".ant-badge-count"
+        elif kind == "login":
+            selectors.update({
+                "order_menu_link": prefix + "orders",
+                "pending_count_element": "#pending-count",
+                "username_input": "#username",
+                "password_input": "#password",
+                "login_button": "#login-btn",
+            })
+        return config
+
+    def config(self, **extra) -> Dict[str, Any]:
+        data = {"sites": [self.site_config(sid) for sid in self.sites], "webhook_urls": [],
+                "feishu_webhook_urls": [], "alert_webhook_urls": []}
+        data.update(extra)
+        return data
+
+    # --- HTTP ---
+    def _site(self, sid: str) -> Dict[str, Any]:
+        site = self.sites.get(sid)
+        if site is None:
+            abort(404)
+        with self._lock:
+            self.requests += 1
+        if site["latency_ms"]:
+            time.sleep(site["latency_ms"] / 1000.0)
+        return site
+
+    def _build_app(self) -> Flask:
+        app = Flask("site_fixtures")
+
+        @app.route("/s/<sid>/orders")
+        @app.route("/s/<sid>/web/index.php")
+        def orders(sid):
+            site = self._site(sid)
+            kind = site["kind"]
+            prefix = f"/s/{sid}/"
+            if kind == "login" and request.cookies.get(f"session_{sid}") != "ok":
+                return redirect(prefix + "login")
+            if kind == "element":
+                body = _element_body(site)
+            elif kind == "ewei":
+                body = _ewei_body(site)
+            elif kind == "antd":
+                body = _antd_body(site, prefix)
+            elif kind == "popup":
+                body = _popup_body(site)
+            else:
+                body = f'<div class="order-header">待处理订单 <span id="pending-count">{site["count"]}</span></div>'
+            return _PAGE.format(title=f"订单管理 - {sid}", body=body)
+
+        @app.route("/s/<sid>/api/orders")
+        def api_orders(sid):
+            site = self._site(sid)
+            return jsonify({"total": site["count"], "list": [{"id": i, "status": "pending"} for i in range(site["count"])]})
+
+        @app.route("/s/<sid>/login", methods=["GET", "POST"])
+        def login(sid):
+            self._site(sid)
+            prefix = f"/s/{sid}/"
+            if request.method == "POST":
+                response = make_response(redirect(prefix + "orders"))
+                response.set_cookie(f"session_{sid}", "ok", path=prefix, httponly=True)
+                return response
+            if request.cookies.get(f"session_{sid}") == "ok":
+                return redirect(prefix + "orders")
+            return _PAGE.format(title="登录", body=_LOGIN_BODY.format(action=prefix + "login"))
+
+        @app.route("/s/<sid>/logout")
+        def logout(sid):
+            self._site(sid)
+            response = make_response(redirect(f"/s/{sid}/login"))
+            response.delete_cookie(f"session_{sid}", path=f"/s/{sid}/")
+            return response
+
+        return app
+
+    def start(self, quiet: bool = True) -> "FixtureFarm":
+        if quiet:
+            # 数百个站点时逐请求的访问日志会淹没抓取日志
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server(self.host, self.port, self.app, threaded=True)
+        self._server = server
+        self.port = server.server_port
+        threading.Thread(target=server.serve_forever, name="site-fixtures", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def summarize(farm: FixtureFarm) -> List[str]:
+    by_kind: Dict[str, int] = {}
+    for site in farm.sites.values():
+        by_kind[site["kind"]] = by_kind.get(site["kind"], 0) + 1
+    return [f"{kind}: {count}" for kind, count in sorted(by_kind.items())]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="启动本地模拟后台站点，便于手动调试选择器")
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+    farm = FixtureFarm(port=args.port)
+    farm.populate(args.sites, latency_ms=args.latency_ms)
+    farm.start()
+    print(f"模拟站点已启动: {farm.base_url} ({', '.join(summarize(farm))})")
+    for sid in farm.sites:
+        print(f"  {farm.site_config(sid)['selectors']['order_menu_link']}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        farm.stop()
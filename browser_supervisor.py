@@ -0,0 +1,358 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover - 仅在未安装 psutil 时使用 /proc 回退
+    psutil = None
+
+IS_WINDOWS = sys.platform == 'win32'
+DETACHED_PROCESS = 0x00000008
+PROFILE_LOCK_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+
+def _iter_processes() -> Iterable[Dict]:
+    """枚举进程 (pid/ppid/name/cmdline)，优先 psutil，Linux 下回退到 /proc"""
+    if psutil is not None:
+        for proc in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline']):
+            info = proc.info
+            yield {
+                "pid": info.get('pid'),
+                "ppid": info.get('ppid'),
+                "name": info.get('name') or "",
+                "cmdline": info.get('cmdline') or []
+            }
+        return
+    if not os.path.isdir('/proc'):
+        return
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = [p.decode('utf-8', errors='ignore') for p in f.read().split(b'\0') if p]
+            with open(f'/proc/{pid}/stat', 'r') as f:
+                stat = f.read()
+            # stat 格式: pid (comm) state ppid ...，comm 可能包含空格
+            name = stat[stat.index('(') + 1:stat.rindex(')')]
+            ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        except (OSError, ValueError):
+            continue
+        yield {"pid": pid, "ppid": ppid, "name": name, "cmdline": cmdline}
+
+
+def _proc_listening_inodes(port: int) -> Set[str]:
+    inodes = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table, 'r') as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            local, state, inode = parts[1], parts[3], parts[9]
+            # 0A = TCP_LISTEN
+            if state == '0A' and int(local.rsplit(':', 1)[1], 16) == port:
+                inodes.add(inode)
+    return inodes
+
+
+def find_port_listeners(port: int) -> List[int]:
+    """返回在本机监听指定 TCP 端口的进程 PID"""
+    pids: Set[int] = set()
+    if psutil is not None:
+        try:
+            for conn in psutil.net_connections(kind='tcp'):
+                if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+                    pids.add(conn.pid)
+        except (psutil.AccessDenied, OSError):
+            pass
+        return sorted(pids)
+    inodes = _proc_listening_inodes(port)
+    if not inodes:
+        return []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        fd_dir = f'/proc/{entry}/fd'
+        try:
+            for fd in os.listdir(fd_dir):
+                target = os.readlink(os.path.join(fd_dir, fd))
+                if target.startswith('socket:[') and target[8:-1] in inodes:
+                    pids.add(int(entry))
+                    break
+        except OSError:
+            continue
+    return sorted(pids)
+
+
+def _normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def find_profile_users(user_data_dir: str) -> List[int]:
+    """返回命令行中使用指定 --user-data-dir 的浏览器进程 PID (不做子串匹配，避免误伤其他 profile)"""
+    target = _normalize_path(user_data_dir)
+    pids = []
+    for info in _iter_processes():
+        for arg in info["cmdline"]:
+            if arg.startswith('--user-data-dir='):
+                value = arg.split('=', 1)[1].strip('"')
+                if value and _normalize_path(value) == target:
+                    pids.append(info["pid"])
+                break
+    return sorted(pids)
+
+
+def find_profile_lock_owner(user_data_dir: str) -> Optional[int]:
+    """解析 Chrome 在 profile 目录中的 SingletonLock (hostname-pid) 获取持有者 PID
+
+    锁由其他主机写入 (profile 位于共享目录) 时，其中的 PID 与本机进程无关，返回 None。
+    """
+    lock_path = os.path.join(user_data_dir, 'SingletonLock')
+    try:
+        target = os.readlink(lock_path)
+    except (OSError, NotImplementedError, AttributeError):
+        return None
+    hostname, _, pid_str = target.rpartition('-')
+    if hostname != socket.gethostname() or not pid_str.isdigit():
+        return None
+    return int(pid_str)
+
+
+def pid_exists(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if IS_WINDOWS:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _descendants(pid: int) -> List[int]:
+    if psutil is not None:
+        try:
+            return [c.pid for c in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+    children: Dict[int, List[int]] = {}
+    for info in _iter_processes():
+        children.setdefault(info["ppid"], []).append(info["pid"])
+    result, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def kill_process_tree(pid: int, timeout: float = 5.0) -> None:
+    """先温和终止再强制结束进程及其全部子进程"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return
+        procs = root.children(recursive=True) + [root]
+        for p in procs:
+            try:
+                p.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(procs, timeout=timeout)
+        for p in alive:
+            try:
+                p.kill()
+            except psutil.NoSuchProcess:
+                pass
+        psutil.wait_procs(alive, timeout=timeout)
+        return
+    if IS_WINDOWS:
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    targets = _descendants(pid) + [pid]
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        for target in targets:
+            try:
+                os.kill(target, sig)
+            except OSError:
+                pass
+        deadline = time.time() + timeout
+        while time.time() < deadline and any(pid_exists(t) for t in targets):
+            _reap_orphans()
+            time.sleep(0.1)
+        if not any(pid_exists(t) for t in targets):
+            return
+
+
+def _reap_orphans() -> None:
+    """作为容器 PID 1 运行时回收被托管给本进程的孤儿子进程，避免僵尸进程堆积"""
+    if IS_WINDOWS or os.getpid() != 1:
+        return
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+class BrowserSupervisor:
+    """管理一个浏览器进程：记录 PID/进程组，清理端口或 profile 冲突，崩溃后在限定时间内拉起
+
+    Linux 下浏览器运行在独立会话/进程组中，退出时整组回收；
+    Windows 下以 DETACHED_PROCESS 启动，通过进程树结束。两者共用同一套接口。
+    """
+
+    def __init__(self, name: str = "browser") -> None:
+        self.name = name
+        self.proc: Optional[subprocess.Popen] = None
+        self.args: Optional[List[str]] = None
+        self.pgid: Optional[int] = None
+        self.restart_count = 0
+        self.last_restart_ts = 0.0
+        self._stopping = False
+        self._lock = threading.RLock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        self._restart_times: List[float] = []
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.proc.pid if self.proc else None
+
+    def is_alive(self) -> bool:
+        return bool(self.proc and self.proc.poll() is None)
+
+    def spawn(self, args: List[str]) -> subprocess.Popen:
+        """启动浏览器进程 (脚本退出后不随之关闭)"""
+        with self._lock:
+            kwargs: Dict = {}
+            if IS_WINDOWS:
+                kwargs["creationflags"] = DETACHED_PROCESS
+            else:
+                # 独立会话：Ctrl+C 不会传给浏览器，且进程组 ID 即浏览器 PID，便于整组回收
+                kwargs["start_new_session"] = True
+            self.proc = subprocess.Popen(args, **kwargs)
+            self.args = list(args)
+            self.pgid = self.proc.pid if not IS_WINDOWS else None
+            self._stopping = False
+            return self.proc
+
+    def terminate(self, timeout: float = 5.0) -> None:
+        """结束受管浏览器及其所有子进程，并回收退出状态"""
+        with self._lock:
+            self._stopping = True
+            proc, pgid = self.proc, self.pgid
+            if not proc:
+                return
+            if proc.poll() is None:
+                kill_process_tree(proc.pid, timeout=timeout)
+            if pgid and not IS_WINDOWS:
+                # 浏览器主进程已退出时，其残留子进程仍在同一进程组中
+                try:
+                    os.killpg(pgid, signal.SIGKILL)
+                except OSError:
+                    pass
+            try:
+                proc.wait(timeout=timeout)
+            except Exception:
+                pass
+            _reap_orphans()
+
+    def cleanup_conflicts(self, port: int, user_data_dir: str, exclude: Optional[Iterable[int]] = None) -> List[int]:
+        """结束占用 CDP 端口或 profile 目录的残留进程，返回被结束的 PID 列表"""
+        excluded = {os.getpid()}
+        excluded.update(p for p in (exclude or []) if p)
+        targets: List[int] = []
+        for pid in find_port_listeners(port):
+            if pid not in excluded:
+                print(f"发现占用端口 {port} 的进程 (PID: {pid})，正在终止...")
+                targets.append(pid)
+        profile_users = find_profile_users(user_data_dir)
+        for pid in profile_users:
+            if pid not in excluded and pid not in targets:
+                print(f"发现残留浏览器进程 (PID: {pid})，正在终止...")
+                targets.append(pid)
+        for pid in targets:
+            kill_process_tree(pid)
+        # 只结束命令行确实使用该 profile 的进程，不按锁中的 PID 结束进程：
+        # 锁来自其他主机、持有者已退出或 PID 已被无关进程复用时，只移除失效的单例锁，
+        # 避免新实例误判 profile 被占用
+        lock_owner = find_profile_lock_owner(user_data_dir)
+        lock_held = lock_owner is not None and lock_owner in profile_users and pid_exists(lock_owner)
+        if os.path.lexists(os.path.join(user_data_dir, 'SingletonLock')) and not lock_held:
+            for name in PROFILE_LOCK_FILES:
+                try:
+                    os.remove(os.path.join(user_data_dir, name))
+                except OSError:
+                    pass
+        _reap_orphans()
+        return targets
+
+    def start_watchdog(self, interval: float = 1.0, on_restart: Optional[Callable[[], None]] = None,
+                       max_restarts: int = 5, window_seconds: int = 300) -> None:
+        """后台检测浏览器是否崩溃，崩溃后在 interval 秒内重新拉起
+
+        window_seconds 内重启超过 max_restarts 次时停止自动重启，避免崩溃循环。
+        """
+        if self._watchdog and self._watchdog.is_alive():
+            return
+        self._watchdog_stop.clear()
+
+        def _loop():
+            while not self._watchdog_stop.wait(interval):
+                _reap_orphans()
+                with self._lock:
+                    proc = self.proc
+                    if not proc or self._stopping or not self.args or proc.poll() is None:
+                        continue
+                    print(f"[{self.name}] 检测到浏览器进程已退出 (返回码: {proc.returncode})，正在重新启动...")
+                    now = time.time()
+                    self._restart_times = [t for t in self._restart_times if now - t < window_seconds]
+                    if len(self._restart_times) >= max_restarts:
+                        print(f"[{self.name}] {window_seconds} 秒内已重启 {len(self._restart_times)} 次，停止自动重启。")
+                        self._stopping = True
+                        continue
+                    self._restart_times.append(now)
+                    if self.pgid and not IS_WINDOWS:
+                        try:
+                            os.killpg(self.pgid, signal.SIGKILL)
+                        except OSError:
+                            pass
+                    try:
+                        self.spawn(self.args)
+                        self.restart_count += 1
+                        self.last_restart_ts = now
+                    except Exception as e:
+                        print(f"[{self.name}] 重新启动浏览器失败: {e}")
+                        continue
+                if on_restart:
+                    try:
+                        on_restart()
+                    except Exception as e:
+                        print(f"[{self.name}] 浏览器重启回调出错: {e}")
+
+        self._watchdog = threading.Thread(target=_loop, name=f"{self.name}-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop_watchdog(self) -> None:
+        self._watchdog_stop.set()
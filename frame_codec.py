@@ -0,0 +1,127 @@
+import io
+import struct
+import time
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+# 帧类型: 1 = 完整 JPEG 关键帧, 2 = 脏区块增量帧
+FRAME_KEY = 1
+FRAME_DELTA = 2
+
+# 增量帧中每个区块: x, y (uint16) + JPEG 长度 (uint32)
+TILE_HEADER = struct.Struct(">HHI")
+TILE_COUNT = struct.Struct(">H")
+
+TILE_SIZE = 64
+# JPEG 重新编码带来的像素噪声阈值 (任一 RGB 通道的差)，低于该值视为未变化
+DIFF_THRESHOLD = 12
+# 变化区块占比超过该值时直接发送关键帧，区块拆分已不省流量
+KEYFRAME_DIRTY_RATIO = 0.5
+# 持续有画面变化时，最长间隔多久强制发送一次关键帧 (秒)
+KEYFRAME_INTERVAL = 10.0
+TILE_QUALITY = 70
+
+
+class TileEncoder:
+    """将截屏 JPEG 序列编码为关键帧 + 脏区块增量帧
+
+    以本查看端上一次已发送的画面为基准比较，因此每个查看端使用独立实例：
+    发送端因背压丢弃的中间帧不会造成画面错位。基准只更新实际发送的区块，
+    低于阈值的缓慢变化 (渐变、淡入) 会累积，超过阈值后再发送，不会让查看端画面逐渐偏离。
+    按 RGB 各通道分别比较，亮度相同的颜色变化也会被发送。
+    """
+
+    def __init__(self, tile_size: int = TILE_SIZE, quality: int = TILE_QUALITY,
+                 keyframe_interval: float = KEYFRAME_INTERVAL) -> None:
+        self.tile_size = tile_size
+        self.quality = quality
+        self.keyframe_interval = keyframe_interval
+        self._previous: Optional[Image.Image] = None
+        self._last_keyframe_ts = 0.0
+        # Image.point 对 RGB 图像需要每个通道一份查找表
+        self._threshold_table = [0 if i < DIFF_THRESHOLD else 255 for i in range(256)] * 3
+        self.last_dirty_ratio = 0.0
+        self.keyframes = 0
+        self.delta_frames = 0
+        self.skipped_frames = 0
+
+    def reset(self) -> None:
+        """下一帧强制为关键帧 (如查看端重连)"""
+        self._previous = None
+
+    def _dirty_rects(self, image: Image.Image,
+                     previous: Image.Image) -> Tuple[List[Tuple[int, int, int, int]], float]:
+        """返回变化区域 (同一行相邻的脏区块合并为一个矩形) 及脏区块占比"""
+        diff = ImageChops.difference(image, previous).point(self._threshold_table)
+        if diff.getbbox() is None:
+            return [], 0.0
+        width, height = image.size
+        size = self.tile_size
+        rects = []
+        dirty = 0
+        total = 0
+        for top in range(0, height, size):
+            bottom = min(height, top + size)
+            run_start = None
+            for left in range(0, width, size):
+                right = min(width, left + size)
+                total += 1
+                if diff.crop((left, top, right, bottom)).getbbox() is not None:
+                    dirty += 1
+                    if run_start is None:
+                        run_start = left
+                    continue
+                if run_start is not None:
+                    rects.append((run_start, top, left, bottom))
+                    run_start = None
+            if run_start is not None:
+                rects.append((run_start, top, width, bottom))
+        return rects, dirty / total if total else 0.0
+
+    def _encode_tile(self, image: Image.Image, rect: Tuple[int, int, int, int]) -> bytes:
+        buffer = io.BytesIO()
+        image.crop(rect).save(buffer, format="JPEG", quality=self.quality)
+        return buffer.getvalue()
+
+    def encode(self, jpeg: bytes, now: Optional[float] = None) -> Optional[Tuple[int, bytes]]:
+        """返回 (帧类型, 负载)，画面无变化时返回 None 表示跳过该帧"""
+        now = time.time() if now is None else now
+        image: Image.Image = Image.open(io.BytesIO(jpeg))
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        keyframe_due = now - self._last_keyframe_ts >= self.keyframe_interval
+        previous = self._previous
+        rects: List[Tuple[int, int, int, int]]
+        if previous is None or previous.size != image.size:
+            rects, ratio = [], 1.0
+            self.last_dirty_ratio = ratio
+        else:
+            rects, ratio = self._dirty_rects(image, previous)
+            self.last_dirty_ratio = ratio
+            if not rects:
+                self.skipped_frames += 1
+                return None
+
+        if previous is None or keyframe_due or ratio > KEYFRAME_DIRTY_RATIO:
+            self._previous = image
+            self._last_keyframe_ts = now
+            self.keyframes += 1
+            if self.quality < TILE_QUALITY:
+                # 画质已被降级时关键帧同样按当前质量重新编码
+                return FRAME_KEY, self._encode_tile(image, (0, 0) + image.size)
+            return FRAME_KEY, jpeg
+
+        parts = [TILE_COUNT.pack(len(rects))]
+        for rect in rects:
+            tile = image.crop(rect)
+            buffer = io.BytesIO()
+            tile.save(buffer, format="JPEG", quality=self.quality)
+            data = buffer.getvalue()
+            parts.append(TILE_HEADER.pack(rect[0], rect[1], len(data)))
+            parts.append(data)
+            previous.paste(tile, rect[:2])
+        self.delta_frames += 1
+        return FRAME_DELTA, b"".join(parts)
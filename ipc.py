@@ -0,0 +1,261 @@
+"""启动器 (launcher) 与监控进程 (main) 之间的本地 IPC 通道
+
+消息格式: 4 字节大端长度 + UTF-8 JSON 对象，对象必须包含 "type" 字段。
+启动器监听 127.0.0.1 的随机端口，通过环境变量把端口和一次性令牌传给监控进程；
+监控进程连接后先发送 hello 消息校验令牌。
+
+监控进程 -> 启动器 (事件):
+  data_update      {"timestamp": str, "data": [...]}        一轮抓取结果
+  intervention     {"site": str, "timeout": int}            需要人工介入
+  intervention_end {"site": str}                            人工介入结束
+  config_changed   {"reason": str}                          config.json 已被监控进程修改
+启动器 -> 监控进程 (指令):
+  browser          {"action": "show" | "hide"}
+  shutdown         {}                                       优雅退出
+"""
+import json
+import os
+import queue
+import secrets
+import socket
+import struct
+import threading
+from typing import Any, Callable, Dict, Optional
+
+ENV_PORT = "MONITOR_IPC_PORT"
+ENV_TOKEN = "MONITOR_IPC_TOKEN"
+
+LENGTH_PREFIX = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class IpcError(Exception):
+    pass
+
+
+def _close_socket(sock: Optional[socket.socket]) -> None:
+    """先 shutdown 再 close：另一线程阻塞在 recv 时单独 close 不会通知对端"""
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    try:
+        sock.close()
+    except OSError:
+        pass
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(LENGTH_PREFIX.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise IpcError("连接已关闭")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = LENGTH_PREFIX.unpack(_recv_exact(sock, LENGTH_PREFIX.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise IpcError(f"消息过大: {size} 字节")
+    message = json.loads(_recv_exact(sock, size).decode("utf-8"))
+    if not isinstance(message, dict) or not message.get("type"):
+        raise IpcError("消息格式错误")
+    return message
+
+
+class IpcServer:
+    """启动器侧：监听本地端口，接收监控进程的事件并下发指令
+
+    on_message 在读取线程中调用，需要更新 UI 时由调用方自行切换到主线程。
+    同一时间只保留一个监控进程连接，新连接会替换旧连接。
+    """
+
+    def __init__(self, on_message: Handler, on_disconnect: Optional[Callable[[], None]] = None) -> None:
+        self.on_message = on_message
+        self.on_disconnect = on_disconnect
+        self.token = secrets.token_urlsafe(24)
+        self._listener: Optional[socket.socket] = None
+        self._conn: Optional[socket.socket] = None
+        self._conn_lock = threading.Lock()
+        self._closed = threading.Event()
+        self.port = 0
+
+    def start(self) -> int:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(4)
+        self._listener = listener
+        self.port = listener.getsockname()[1]
+        threading.Thread(target=self._accept_loop, args=(listener,), name="ipc-accept", daemon=True).start()
+        return self.port
+
+    def child_env(self) -> Dict[str, str]:
+        """传给监控进程的环境变量"""
+        return {ENV_PORT: str(self.port), ENV_TOKEN: self.token}
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None
+
+    def _accept_loop(self, listener: socket.socket) -> None:
+        while not self._closed.is_set():
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), name="ipc-conn", daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            conn.settimeout(5)
+            hello = recv_message(conn)
+            if hello.get("type") != "hello" or not secrets.compare_digest(str(hello.get("token", "")), self.token):
+                conn.close()
+                return
+            conn.settimeout(None)
+        except Exception:
+            conn.close()
+            return
+        with self._conn_lock:
+            old, self._conn = self._conn, conn
+        _close_socket(old)
+        try:
+            while not self._closed.is_set():
+                message = recv_message(conn)
+                try:
+                    self.on_message(message)
+                except Exception as e:
+                    print(f"处理 IPC 消息失败 ({message.get('type')}): {e}")
+        except (IpcError, OSError, ValueError):
+            pass
+        finally:
+            with self._conn_lock:
+                is_current = self._conn is conn
+                if is_current:
+                    self._conn = None
+            try:
+                conn.close()
+            except OSError:
+                pass
+            if is_current and self.on_disconnect:
+                self.on_disconnect()
+
+    def send(self, message_type: str, **payload: Any) -> bool:
+        """向监控进程发送指令，未连接时返回 False"""
+        with self._conn_lock:
+            conn = self._conn
+            if conn is None:
+                return False
+            try:
+                send_message(conn, dict(payload, type=message_type))
+                return True
+            except OSError:
+                return False
+
+    def close(self) -> None:
+        self._closed.set()
+        listener, self._listener = self._listener, None
+        _close_socket(listener)
+        with self._conn_lock:
+            conn, self._conn = self._conn, None
+        _close_socket(conn)
+
+
+class IpcClient:
+    """监控进程侧：连接启动器，发送事件 (非阻塞，后台线程写出) 并分发收到的指令"""
+
+    def __init__(self, port: int, token: str) -> None:
+        self.port = port
+        self.token = token
+        self._sock: Optional[socket.socket] = None
+        self._outbox: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._handlers: Dict[str, Handler] = {}
+        self.connected = False
+
+    def on(self, message_type: str, handler: Handler) -> None:
+        self._handlers[message_type] = handler
+
+    def connect(self, timeout: float = 3.0) -> bool:
+        try:
+            sock = socket.create_connection(("127.0.0.1", self.port), timeout=timeout)
+            send_message(sock, {"type": "hello", "token": self.token, "pid": os.getpid()})
+            sock.settimeout(None)
+        except OSError as e:
+            print(f"连接启动器 IPC 失败: {e}")
+            return False
+        self._sock = sock
+        self.connected = True
+        threading.Thread(target=self._write_loop, args=(sock,), name="ipc-writer", daemon=True).start()
+        threading.Thread(target=self._read_loop, args=(sock,), name="ipc-reader", daemon=True).start()
+        return True
+
+    def _write_loop(self, sock: socket.socket) -> None:
+        while self.connected:
+            message = self._outbox.get()
+            if message is None:
+                break
+            try:
+                send_message(sock, message)
+            except OSError:
+                self.connected = False
+                break
+
+    def _read_loop(self, sock: socket.socket) -> None:
+        try:
+            while self.connected:
+                message = recv_message(sock)
+                handler = self._handlers.get(message["type"])
+                if handler is None:
+                    continue
+                try:
+                    handler(message)
+                except Exception as e:
+                    print(f"处理启动器指令失败 ({message['type']}): {e}")
+        except (IpcError, OSError, ValueError):
+            pass
+        finally:
+            self.connected = False
+
+    def emit(self, message_type: str, **payload: Any) -> bool:
+        """投递事件，不阻塞调用线程；未连接或积压过多时返回 False"""
+        if not self.connected:
+            return False
+        try:
+            self._outbox.put_nowait(dict(payload, type=message_type))
+            return True
+        except queue.Full:
+            return False
+
+    def close(self) -> None:
+        self.connected = False
+        try:
+            self._outbox.put_nowait(None)
+        except queue.Full:
+            pass
+        sock, self._sock = self._sock, None
+        _close_socket(sock)
+
+
+def connect_from_env() -> Optional[IpcClient]:
+    """监控进程启动时调用：由启动器拉起时返回已连接的客户端，否则返回 None"""
+    port = os.environ.get(ENV_PORT)
+    token = os.environ.get(ENV_TOKEN)
+    if not port or not token:
+        return None
+    try:
+        client = IpcClient(int(port), token)
+    except ValueError:
+        return None
+    return client if client.connect() else None
@@ -6,7 +6,6 @@ import threading
 import os
 import sys
 import time
-from datetime import datetime
 import requests
 import importlib
 from typing import Any
@@ -14,6 +13,8 @@ from PIL import Image, ImageDraw
 import webbrowser
 import re
 from auth import auth_manager
+from ipc import IpcServer
+from log_view import BatchedLogView, DEFAULT_MAX_LINES, create_file_logger
 
 pystray: Any = importlib.import_module("pystray")
 
@@ -117,6 +118,16 @@ class App:
         self.config = ConfigManager.load()
         self.icon = None
         self.order_notify_dialog = None
+        self.intervention_dialogs = {}
+        # 监控表格当前各行的值 (按站点名称)，用于增量更新
+        self._monitor_rows = {}
+
+        # 与监控进程的 IPC 通道：数据更新/人工介入/配置变更等事件走这里，stdout 只用于日志
+        self.ipc = IpcServer(on_message=lambda msg: self.root.after(0, lambda m=msg: self.handle_ipc_message(m)))
+        try:
+            self.ipc.start()
+        except OSError as e:
+            print(f"IPC 通道启动失败: {e}")
         
         # 尝试设置窗口图标
         try:
@@ -663,17 +674,25 @@ class App:
         ctrl_frame.pack(fill=tk.X, pady=(0, 5))
         
         self.show_debug_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(ctrl_frame, text="显示详细调试日志", variable=self.show_debug_var).pack(side=tk.LEFT)
+        ttk.Checkbutton(ctrl_frame, text="显示详细调试日志", variable=self.show_debug_var,
+                        command=lambda: self.log_view.set_show_debug(self.show_debug_var.get())).pack(side=tk.LEFT)
         
         ttk.Button(ctrl_frame, text="清空日志", command=self.clear_log).pack(side=tk.RIGHT)
 
         self.log_text = scrolledtext.ScrolledText(parent, state='disabled', font=('Consolas', 9))
         self.log_text.pack(fill=tk.BOTH, expand=True)
 
+        # 界面最多保留 log_max_lines 行，完整日志写入 logs/monitor.log (轮转)
+        log_dir = os.path.join(os.path.dirname(CONFIG_FILE), 'logs')
+        self.log_view = BatchedLogView(
+            self.root, self.log_text,
+            max_lines=self.config.get('log_max_lines', DEFAULT_MAX_LINES),
+            show_debug=self.show_debug_var.get(),
+            file_logger=create_file_logger(log_dir)
+        )
+
     def clear_log(self):
-        self.log_text.configure(state='normal')
-        self.log_text.delete('1.0', tk.END)
-        self.log_text.configure(state='disabled')
+        self.log_view.clear()
 
     def init_help_tab(self, parent):
         self.help_text_widget = scrolledtext.ScrolledText(parent, font=('微软雅黑', 10), padx=20, pady=20)
@@ -994,80 +1013,45 @@ class App:
     # === 运行控制 ===
 
     def log(self, message):
-        # 检查是否为结构化数据更新
+        """写入日志，可在任意线程调用：界面按批刷新，完整内容写入轮转日志文件"""
+        # 兼容：未建立 IPC 时监控进程仍以 DATA_UPDATE 行输出结构化数据
         if message.startswith("DATA_UPDATE:"):
             try:
-                json_str = message.replace("DATA_UPDATE:", "", 1)
-                data_pkg = json.loads(json_str)
-                self.update_monitor_data(data_pkg)
-                
-                # 在接收到后端数据更新时，也检查一下配置是否有变化（比如后端更新了选择器）
-                # 注意：频繁读取 IO 可能会有性能影响，但考虑到更新频率不高（60秒一次），是可以接受的
-                # 为了防止 UI 闪烁，我们只在数据真正变化时更新 UI
-                try:
-                    new_config = ConfigManager.load()
-                    # 简单比较 sites 的长度或特定字段，这里做全量比较
-                    # 注意：直接比较 dict 可能会因为顺序不同而不等，但 json load 出来的通常顺序一致
-                    # 为避免干扰，我们只在后端更新了 selector 时才需要刷新
-                    # 这里简化逻辑：每次收到数据更新，都静默重新加载一次 config 到内存
-                    # 这样下次点击“编辑站点”时，看到的就是最新的
-                    self.config = new_config
-                    # 不主动调用 refresh_site_list()，以免打断用户当前操作（如正在选行）
-                except:
-                    pass
-                
+                data_pkg = json.loads(message.replace("DATA_UPDATE:", "", 1))
+                self.root.after(0, lambda pkg=data_pkg: self.update_monitor_data(pkg))
                 return
-            except Exception as e:
+            except Exception:
                 pass # 解析失败则照常打印
-        
-        # === 增强功能：检测配置变更通知 ===
-        # 当后端打印 "选择器已写回配置" 时，说明本地 config.json 已被修改
-        # 此时应立即重新加载内存中的配置，以便用户打开编辑窗口时能看到最新数据
-        if "选择器已写回配置" in message:
+        self.log_view.append(message)
+
+    def handle_ipc_message(self, msg):
+        """处理监控进程通过 IPC 发来的事件 (已切换到主线程)"""
+        msg_type = msg.get('type')
+        if msg_type == 'data_update':
+            self.update_monitor_data(msg)
+        elif msg_type == 'intervention':
+            self.show_manual_intervention_dialog(msg.get('site') or "某站点", msg.get('timeout') or 60)
+        elif msg_type == 'intervention_end':
+            dialog = self.intervention_dialogs.pop(msg.get('site'), None)
+            if dialog is not None:
+                try:
+                    dialog.destroy()
+                except Exception:
+                    pass
+        elif msg_type == 'config_changed':
+            # 监控进程修改了 config.json (如写回选择器)，重新加载到内存，编辑站点时即可看到最新数据
             try:
-                # print("检测到配置文件变更，正在刷新 UI 内存配置...")
                 self.config = ConfigManager.load()
-            except:
+            except Exception:
                 pass
 
-        # === 增强功能：检测人工介入请求并通知 ===
-        # 匹配日志中的 ">>> 等待人工手动登录"
-        if ">>> 等待人工手动登录" in message:
-            # 提取站点名称 (假设格式: [站点名] >>> ...)
-            match = re.search(r'\[(.*?)\]', message)
-            site_name = match.group(1) if match else "某站点"
-            # 切换为常驻弹窗提醒 (在主线程执行)
-            self.root.after(0, lambda: self.show_manual_intervention_dialog(site_name))
-        
-        # === 增强功能：日志过滤与时间戳 ===
-        # 1. 添加时间戳
-        timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S] ")
-        
-        # 2. 根据勾选框过滤日志
-        show_log = True
-        # 注意：show_debug_var 可能在初始化阶段尚未创建，要做防守
-        if hasattr(self, 'show_debug_var') and not self.show_debug_var.get():
-            # 未勾选详细日志时，只显示关键信息
-            # 关键信息关键词：抓取完成 (数量), 通知 (发送情况), 等待人工 (重要交互), 错误 (异常)
-            keywords = ["抓取完成", "通知", "指令发送", "等待人工", "错误", "Error", "启动", "停止", "系统"]
-            if not any(k in message for k in keywords):
-                show_log = False
-        
-        if show_log:
-            self.log_text.configure(state='normal')
-            self.log_text.insert(tk.END, f"{timestamp}{message}")
-            self.log_text.see(tk.END)
-            self.log_text.configure(state='disabled')
-
     def update_monitor_data(self, pkg):
-        # 清空旧数据
-        for item in self.monitor_tree.get_children():
-            self.monitor_tree.delete(item)
-        
         timestamp = pkg.get('timestamp', '')
         results = pkg.get('data', [])
         
         has_orders = False
+        # 行以站点名称为 iid，只更新变化的单元格，保留选中行与滚动位置，避免整表重建闪烁
+        seen = []
         
         for res in results:
             name = res['name']
@@ -1083,7 +1067,14 @@ class App:
             
             if count > 0: has_orders = True
             
-            self.monitor_tree.insert('', 'end', values=(name, display_count, timestamp, action_text))
+            self._upsert_monitor_row(name, (name, display_count, timestamp, action_text), len(seen))
+            seen.append(name)
+        
+        # 本轮未出现的站点 (已删除或停用) 从表中移除
+        for name in set(self._monitor_rows) - set(seen):
+            self._monitor_rows.pop(name, None)
+            if self.monitor_tree.exists(name):
+                self.monitor_tree.delete(name)
             
         # 桌面通知 (使用 Tray Icon 通知)
         if has_orders:
@@ -1102,6 +1093,18 @@ class App:
             if self.config.get('desktop_notify', True):
                 self.show_order_notification(results, timestamp)
 
+    def _upsert_monitor_row(self, name, values, index):
+        old_values = self._monitor_rows.get(name)
+        if old_values is None or not self.monitor_tree.exists(name):
+            self.monitor_tree.insert('', index, iid=name, values=values)
+        else:
+            for column, old, new in zip(self.monitor_tree['columns'], old_values, values):
+                if old != new:
+                    self.monitor_tree.set(name, column, new)
+            if self.monitor_tree.index(name) != index:
+                self.monitor_tree.move(name, '', index)
+        self._monitor_rows[name] = values
+
     def show_order_notification(self, results, timestamp):
         items = []
         for res in results:
@@ -1280,6 +1283,9 @@ class App:
             cmd = [sys.executable, "main.py"]
         
         creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+        env = dict(os.environ)
+        if self.ipc.port:
+            env.update(self.ipc.child_env())
         
         try:
             self.process = subprocess.Popen(
@@ -1289,7 +1295,8 @@ class App:
                 universal_newlines=True,
                 encoding='utf-8',
                 errors='replace',
-                creationflags=creationflags
+                creationflags=creationflags,
+                env=env
             )
             threading.Thread(target=self.read_process_output, daemon=True).start()
         except Exception as e:
@@ -1305,8 +1312,8 @@ class App:
         try:
             for line in iter(self.process.stdout.readline, ''):
                 if not line: break
-                # 使用 after 在主线程更新 UI
-                self.root.after(0, lambda l=line: self.log(l))
+                # log 线程安全：只放入待写队列，由界面定时批量刷新，不再每行调度一次主线程
+                self.log(line)
         except Exception as e:
             err = str(e)
             self.root.after(0, lambda m=err: self.log(f"\n[系统] 读取进程输出出错: {m}\n"))
@@ -1317,6 +1324,16 @@ class App:
                 self.root.after(0, lambda: self.btn_start.config(text="启动监控服务"))
                 self.root.after(0, lambda: self.log("\n=== 监控服务已意外停止 ===\n"))
 
+    def stop_process(self, timeout=8):
+        """先通过 IPC 请求监控进程优雅退出 (关闭远程连接与浏览器)，超时再强制终止"""
+        process = self.process
+        if process and process.poll() is None and self.ipc.send("shutdown"):
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        self.kill_process_tree()
+
     def kill_process_tree(self):
         """强制终止进程及其所有子进程"""
         if self.process:
@@ -1336,7 +1353,7 @@ class App:
         if self.process and self.process.poll() is None:
             if messagebox.askyesno("确认", "确定要停止监控服务吗？"):
                 self.is_stopping = True
-                self.kill_process_tree()
+                self.stop_process()
                 self.lbl_status.config(text="状态: 未运行", foreground="red")
                 self.btn_start.config(text="启动监控服务")
                 self.log("\n=== 服务已停止 ===\n")
@@ -1346,7 +1363,7 @@ class App:
     def restart_service(self):
         if self.process:
             self.is_stopping = True
-            self.kill_process_tree()
+            self.stop_process()
             
         def _start():
             self.start_process()
@@ -1358,15 +1375,23 @@ class App:
         if self.process and self.process.poll() is None:
             if confirm and not messagebox.askyesno("退出", "监控服务正在运行，确定要退出吗？\n(退出将停止监控)"):
                 return
-            self.kill_process_tree()
+            self.stop_process()
         
+        self.ipc.close()
         if self.icon:
             self.icon.stop()
         self.root.destroy()
 
-    def show_manual_intervention_dialog(self, site_name):
-        """显示常驻的人工介入提醒弹窗"""
+    def show_manual_intervention_dialog(self, site_name, timeout_seconds=60):
+        """显示常驻的人工介入提醒弹窗 (介入结束事件到达时自动关闭)"""
+        old_dialog = self.intervention_dialogs.pop(site_name, None)
+        if old_dialog is not None:
+            try:
+                old_dialog.destroy()
+            except Exception:
+                pass
         dialog = tk.Toplevel(self.root)
+        self.intervention_dialogs[site_name] = dialog
         dialog.title("⚠️ 需要人工介入")
         width = 380
         height = 180
@@ -1400,7 +1425,7 @@ class App:
         ttk.Label(content_frame, text="检测到登录流程受阻（如验证码），请人工介入处理。\n处理完成后脚本将自动继续。", 
                  font=("微软雅黑", 9), foreground="#666", wraplength=320).pack(fill=tk.X, pady=5)
         
-        countdown_seconds = 60
+        countdown_seconds = timeout_seconds
         countdown_lbl = ttk.Label(content_frame, text=f"窗口将在 {countdown_seconds}s 后自动关闭", 
                                   font=("微软雅黑", 9), foreground="#999")
         countdown_lbl.pack(fill=tk.X, pady=(0, 10))
@@ -1488,6 +1513,9 @@ class App:
         if not self.process or self.process.poll() is not None:
             messagebox.showwarning("提示", "请先启动监控服务")
             return
+        if self.ipc.send("browser", action=action):
+            self.log(f"指令发送成功: {action}\n")
+            return
         def _req():
             try:
                 url = f"http://localhost:5000/api/browser/{action}"
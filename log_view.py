@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import tkinter as tk
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+DEFAULT_MAX_LINES = 5000
+FLUSH_INTERVAL_MS = 100
+# 单次刷新最多写入的行数，防止日志暴涨时一次刷新卡住界面 (剩余的留到下一次)
+MAX_LINES_PER_FLUSH = 500
+
+LEVEL_ERROR = "error"
+LEVEL_INFO = "info"
+LEVEL_DEBUG = "debug"
+
+# 未勾选“显示详细调试日志”时仍显示的关键信息
+_ERROR_KEYWORDS = ("错误", "Error", "失败", "异常", "Traceback")
+_INFO_KEYWORDS = ("抓取完成", "通知", "指令发送", "等待人工", "启动", "停止", "系统", "===")
+
+
+def classify_level(message):
+    if any(k in message for k in _ERROR_KEYWORDS):
+        return LEVEL_ERROR
+    if any(k in message for k in _INFO_KEYWORDS):
+        return LEVEL_INFO
+    return LEVEL_DEBUG
+
+
+def create_file_logger(log_dir, filename="monitor.log", max_bytes=5 * 1024 * 1024, backup_count=5):
+    """完整日志 (含调试信息) 写入按大小轮转的文件，界面只保留最近的部分"""
+    logger = logging.getLogger("MonitorLog")
+    if logger.handlers:
+        return logger
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(log_dir, filename), maxBytes=max_bytes,
+                                      backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+    except OSError:
+        logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+    # 不向根 logger 传递，避免写入 client_debug.log / 控制台
+    logger.propagate = False
+    return logger
+
+
+class BatchedLogView:
+    """有上限、批量刷新的日志视图
+
+    append 可在任意线程调用，只把行放入待写队列；主线程每 FLUSH_INTERVAL_MS
+    批量写入 Text 控件一次，超过 max_lines 时从顶部裁剪。
+    每行带级别 tag，调试日志的显示/隐藏通过 tag 的 elide 属性切换，无需重新插入。
+    """
+
+    def __init__(self, root, text_widget, max_lines=DEFAULT_MAX_LINES, show_debug=False, file_logger=None):
+        self.root = root
+        self.text = text_widget
+        self.max_lines = max(100, int(max_lines))
+        self.file_logger = file_logger
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._line_count = 0
+        self.text.tag_configure(LEVEL_ERROR, foreground="#c0392b")
+        self.set_show_debug(show_debug)
+        self.root.after(FLUSH_INTERVAL_MS, self._flush)
+
+    def set_show_debug(self, show):
+        self.text.tag_configure(LEVEL_DEBUG, elide=not show)
+
+    def append(self, message):
+        if not message:
+            return
+        if not message.endswith("\n"):
+            message += "\n"
+        if self.file_logger is not None:
+            self.file_logger.info(message.rstrip("\n"))
+        timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S] ")
+        with self._lock:
+            self._pending.append((classify_level(message), timestamp + message))
+            # 待写队列同样有上限：界面长时间未刷新时只保留最新的行
+            while len(self._pending) > self.max_lines:
+                self._pending.popleft()
+
+    def _flush(self):
+        try:
+            with self._lock:
+                count = min(len(self._pending), MAX_LINES_PER_FLUSH)
+                batch = [self._pending.popleft() for _ in range(count)]
+            if batch:
+                self._write(batch)
+        finally:
+            self.root.after(FLUSH_INTERVAL_MS, self._flush)
+
+    def _write(self, batch):
+        # 用户正在向上翻看时不自动滚动到底部
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.configure(state='normal')
+        args = []
+        for level, line in batch:
+            args.extend((line, level))
+        self.text.insert(tk.END, *args)
+        self._line_count += sum(line.count("\n") for _, line in batch)
+        excess = self._line_count - self.max_lines
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+            self._line_count -= excess
+        self.text.configure(state='disabled')
+        if at_bottom:
+            self.text.see(tk.END)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        self.text.configure(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.configure(state='disabled')
+        self._line_count = 0
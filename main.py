@@ -4,12 +4,13 @@ import schedule
 import requests
 import os
 import re
+import shutil
 import threading
 import queue
 import random
-import subprocess
 import sys
 import socket
+import urllib.request
 from urllib.parse import urlparse, urljoin
 from typing import Any, cast
 
@@ -46,9 +47,16 @@ elif os.path.exists(os.path.join(os.getcwd(), 'playwright-browsers')):
 
 from playwright.sync_api import sync_playwright
 from datetime import datetime
-from web_server import run_server as start_web_server
+from web_server import run_server as start_web_server, stop_server as stop_web_server
 import shared
 from auth import auth_manager
+from startup import BootGraph
+from ipc import connect_from_env as connect_launcher_ipc
+from browser_supervisor import BrowserSupervisor
+from screencast import ScreencastProducer, screencast_settings
+from remote_input import InputExecutor, clear_pending_actions, latency_stats
+from round_metrics import SiteTimer, format_round_summary, round_metrics
+from span_trace import DEFAULT_MAX_FILES as TRACE_MAX_FILES, bind_site, install as install_tracing, trace_enabled, tracer
 
 # 企业微信机器人的 Webhook 地址
 # 1. 订单通知机器人 (日常战报) - 支持配置多个 Webhook URL (列表格式)
@@ -129,58 +137,126 @@ _last_runtime_auth_ts = 0
 _last_runtime_auth_ok = False
 
 
-def load_config():
-    """读取配置文件"""
-    global _config_cache, _config_cache_ts
-    if _config_cache is not None and time.time() - _config_cache_ts < 120:
-        return _config_cache
-    if not auth_manager.load_license():
-        try:
-            with open(get_config_path(), 'r', encoding='utf-8') as f:
-                local_data = json.load(f)
-            _config_cache = _normalize_config(local_data)
-        except Exception:
-            _config_cache = _normalize_config({})
-        _config_cache_ts = time.time()
-        return _config_cache
-    success, data = auth_manager.fetch_config()
-    if success:
-        payload = data if isinstance(data, dict) else {}
-        common_config = payload.get("common_config") or {}
-        user_config = payload.get("user_config") or {}
+_config_lock = threading.RLock()
+# 同一时间只有一个线程向服务器拉取配置；拉取期间不持有 _config_lock
+_config_fetch_lock = threading.Lock()
+
+# 与 launcher 的 IPC 连接 (单独运行 main.py 时为 None)
+launcher_ipc = None
+# launcher 通过 IPC 请求停止时设置，主循环据此退出并执行清理
+shutdown_requested = threading.Event()
+_config_refreshing = False
+
+
+def _apply_remote_config(payload):
+    """合并服务端下发的通用配置/用户配置与本地配置 (保留本地敏感字段)，并写回 config.json"""
+    common_config = payload.get("common_config") or {}
+    user_config = payload.get("user_config") or {}
+    local_config = _normalize_config({})
+    try:
+        with open(get_config_path(), 'r', encoding='utf-8') as f:
+            local_data = json.load(f)
+        local_config = _normalize_config(local_data)
+    except Exception:
         local_config = _normalize_config({})
+
+    server_has_sites = len(user_config.get('sites', [])) > 0
+    local_has_sites = len(local_config.get('sites', [])) > 0
+    if not server_has_sites and local_has_sites:
+        user_config['sites'] = local_config.get('sites', [])
+
+    merged = _merge_configs(common_config, user_config)
+    if local_config.get('sites'):
+        local_sites_map = {s.get('name'): s for s in local_config['sites'] if s.get('name')}
+        for site in merged.get('sites', []):
+            local_site = local_sites_map.get(site.get('name'))
+            if local_site:
+                sensitive_keys = ["password", "login_password", "pay_password", "pwd", "secret", "passwd", "username", "account", "login_user", "login_username", "mobile", "phone"]
+                for key in sensitive_keys:
+                    if key in local_site and local_site[key]:
+                        site[key] = local_site[key]
+    try:
+        _atomic_write_json(get_config_path(), merged)
+        _emit_launcher_event("config_changed", reason="remote_sync")
+    except Exception:
+        pass
+    return merged
+
+
+def _refresh_config_async():
+    """后台从服务器拉取最新配置，替换启动时使用的本地签名快照"""
+    global _config_refreshing
+
+    def _worker():
+        global _config_cache, _config_cache_ts, _config_refreshing
+        # 与 load_config 共用拉取锁：其他线程正在拉取时跳过，避免较旧的响应覆盖较新的配置
+        if not _config_fetch_lock.acquire(blocking=False):
+            _config_refreshing = False
+            return
         try:
-            with open(get_config_path(), 'r', encoding='utf-8') as f:
-                local_data = json.load(f)
-            local_config = _normalize_config(local_data)
-        except Exception:
-            local_config = _normalize_config({})
-
-        server_has_sites = len(user_config.get('sites', [])) > 0
-        local_has_sites = len(local_config.get('sites', [])) > 0
-        if not server_has_sites and local_has_sites:
-            user_config['sites'] = local_config.get('sites', [])
-
-        merged = _merge_configs(common_config, user_config)
-        if local_config.get('sites'):
-            local_sites_map = {s.get('name'): s for s in local_config['sites'] if s.get('name')}
-            for site in merged.get('sites', []):
-                local_site = local_sites_map.get(site.get('name'))
-                if local_site:
-                    sensitive_keys = ["password", "login_password", "pay_password", "pwd", "secret", "passwd", "username", "account", "login_user", "login_username", "mobile", "phone"]
-                    for key in sensitive_keys:
-                        if key in local_site and local_site[key]:
-                            site[key] = local_site[key]
-        try:
-            _atomic_write_json(get_config_path(), merged)
-        except Exception:
-            pass
-        _config_cache = merged
-        _config_cache_ts = time.time()
-        return _config_cache
-    _config_cache = _normalize_config({})
-    _config_cache_ts = time.time()
-    return _config_cache
+            success, data = auth_manager.fetch_config()
+            if success:
+                merged = _apply_remote_config(data if isinstance(data, dict) else {})
+                with _config_lock:
+                    _config_cache = merged
+                    _config_cache_ts = time.time()
+            else:
+                print(f"后台刷新配置失败，继续使用本地快照: {data}")
+        finally:
+            _config_fetch_lock.release()
+            _config_refreshing = False
+
+    with _config_lock:
+        if _config_refreshing:
+            return
+        _config_refreshing = True
+    threading.Thread(target=_worker, name="config-refresh", daemon=True).start()
+
+
+def load_config():
+    """读取配置文件
+
+    首次调用时优先使用上次落盘的签名配置快照 (无需网络)，并在后台刷新；
+    之后每 120 秒向服务器重新拉取一次。
+    """
+    global _config_cache, _config_cache_ts
+    with _config_lock:
+        if _config_cache is not None and time.time() - _config_cache_ts < 120:
+            return _config_cache
+        if not auth_manager.load_license():
+            try:
+                with open(get_config_path(), 'r', encoding='utf-8') as f:
+                    local_data = json.load(f)
+                _config_cache = _normalize_config(local_data)
+            except Exception:
+                _config_cache = _normalize_config({})
+            _config_cache_ts = time.time()
+            return _config_cache
+        if _config_cache is None:
+            ok, snapshot = auth_manager.load_config_snapshot()
+            if ok:
+                _config_cache = _apply_remote_config(snapshot)
+                _config_cache_ts = time.time()
+                _refresh_config_async()
+                return _config_cache
+        stale = _config_cache
+
+    # 网络请求在锁外进行：其他线程读取配置时不会阻塞在网络 I/O 上。
+    # 已有旧配置时，若其他线程正在拉取则直接返回旧配置；首次加载则等待拉取结果。
+    if not _config_fetch_lock.acquire(blocking=stale is None):
+        return stale
+    try:
+        with _config_lock:
+            if _config_cache is not None and time.time() - _config_cache_ts < 120:
+                return _config_cache
+        success, data = auth_manager.fetch_config()
+        merged = _apply_remote_config(data if isinstance(data, dict) else {}) if success else _normalize_config({})
+        with _config_lock:
+            _config_cache = merged
+            _config_cache_ts = time.time()
+            return _config_cache
+    finally:
+        _config_fetch_lock.release()
 
 
 def _ensure_runtime_authorized():
@@ -201,6 +277,19 @@ def _atomic_write_json(file_path, data):
         json.dump(data, f, indent=2, ensure_ascii=False)
     os.replace(tmp_path, file_path)
 
+def _emit_launcher_event(message_type, **payload):
+    """通过 IPC 向 launcher 发送事件，未由 launcher 拉起时返回 False"""
+    if launcher_ipc is None:
+        return False
+    return launcher_ipc.emit(message_type, **payload)
+
+def _publish_data_update(results):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if not _emit_launcher_event("data_update", timestamp=timestamp, data=results):
+        # 单独运行 (无 IPC 连接) 时仍输出到 stdout，便于人工查看
+        data_update = {"type": "data_update", "timestamp": timestamp, "data": results}
+        print(f"DATA_UPDATE:{json.dumps(data_update, ensure_ascii=False)}")
+
 def _sanitize_selector_value(v):
     if isinstance(v, str):
         s = v.strip()
@@ -259,6 +348,7 @@ def _update_site_selectors_in_config(site_name, selectors_update):
         to_write = sites if is_list_format else config
         _atomic_write_json(config_path, to_write)
         print(f"[{site_name}] 选择器已写回配置: {config_path}")
+        _emit_launcher_event("config_changed", reason="selectors", site=site_name)
         if auth_manager.load_license():
             auth_manager.save_user_config(config if not is_list_format else {"sites": sites})
         return True
@@ -673,6 +763,40 @@ def load_global_cookies(context):
     except Exception as e:
         print(f"恢复全局状态失败: {e}")
 
+def restore_global_local_storage(context):
+    """把 global_state.json 中各站点的 localStorage 写入当前浏览器 (热备切换后使用)
+
+    各站点源的请求被拦截并返回空白页，只写入存储、不加载站点本身。
+    """
+    try:
+        with open('cookies/global_state.json', 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception:
+        return
+    origins = [o for o in state.get('origins') or [] if o.get('origin') and o.get('localStorage')]
+    if not origins:
+        return
+    page = context.new_page()
+    try:
+        page.route("**/*", lambda route: route.fulfill(status=200, content_type="text/html", body="<html></html>"))
+        restored = 0
+        for item in origins:
+            try:
+                page.goto(item['origin'])
+                page.evaluate(
+                    "items => { for (const item of items) localStorage.setItem(item.name, item.value); }",
+                    item['localStorage']
+                )
+                restored += 1
+            except Exception as e:
+                print(f"恢复 {item['origin']} 的 localStorage 失败: {e}")
+        print(f"已恢复 {restored} 个站点的 localStorage")
+    finally:
+        try:
+            page.close()
+        except Exception:
+            pass
+
 def _site_storage_key(site_name):
     return re.sub(r'[^a-zA-Z0-9._-]+', '_', site_name or "site")
 
@@ -771,25 +895,100 @@ import concurrent.futures
 # 配置写入锁，防止并发写入导致配置丢失
 config_write_lock = threading.Lock()
 
+# 介入等待时每次让出给 Playwright 事件循环的时长 (毫秒)
+PUMP_SLICE_MS = 50
+
+
 class InterventionManager:
-    """并发模式下的人工介入窗口管理器"""
+    """并发模式下的人工介入窗口管理器
+
+    enter/exit/pump 须在持有介入页面的线程中调用：远程辅助登录的截屏帧
+    依赖该线程通过 pump 分发 CDP 事件。
+    """
     def __init__(self, manager):
         self.lock = threading.Lock()
         self.manager = manager
+        self.screencast = None
+        self.input_executor = None
 
-    def enter(self, site_name, timeout_seconds=60):
+    def enter(self, site_name, timeout_seconds=60, page=None):
         self.lock.acquire()
+        shared.set_screenshot(None)
+        # 丢弃上一次介入遗留的操作，避免点到新页面上
+        clear_pending_actions()
         shared.is_interactive_mode = True
         shared.current_site_name = site_name
         print(f"[{site_name}] >>> 等待人工手动登录 (限时 {timeout_seconds} 秒)...")
+        _emit_launcher_event("intervention", site=site_name, timeout=timeout_seconds)
         if self.manager:
             self.manager.move_browser_onscreen()
+        if page is not None:
+            self._start_screencast(site_name, page)
+            session = self.screencast.session if self.screencast else None
+            self.input_executor = InputExecutor(page, session=session)
+
+    def _start_screencast(self, site_name, page):
+        try:
+            settings = screencast_settings(load_config())
+        except Exception:
+            settings = screencast_settings({})
+        producer = ScreencastProducer(page, **settings)
+        try:
+            producer.start()
+            self.screencast = producer
+        except Exception as e:
+            print(f"[{site_name}] 启动远程画面推流失败: {e}")
+
+    def track_page(self, page):
+        """介入页面发生替换时，截屏跟随到新页面"""
+        if self.screencast and page is not None:
+            try:
+                self.screencast.retarget(page)
+            except Exception as e:
+                print(f"切换远程画面推流页面失败: {e}")
+        if self.input_executor and page is not None:
+            session = self.screencast.session if self.screencast else None
+            self.input_executor.retarget(page, session=session)
+
+    def pump(self, page, seconds):
+        """等待期间保持分发 Playwright 事件 (截屏帧) 并执行远程操作，代替 time.sleep
+
+        按 PUMP_SLICE_MS 切片等待，每片之间取出排队的远程操作立即执行，
+        操作延迟上限约为一个切片。
+        """
+        if page is None:
+            time.sleep(seconds)
+            return
+        deadline = time.time() + seconds
+        while True:
+            if self.input_executor:
+                self.input_executor.drain()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            try:
+                page.wait_for_timeout(min(PUMP_SLICE_MS, max(1, int(remaining * 1000))))
+            except Exception:
+                time.sleep(max(0, deadline - time.time()))
+                return
 
     def exit(self):
+        if self.input_executor:
+            self.input_executor.close()
+            self.input_executor = None
+            stats = latency_stats.snapshot()
+            if stats:
+                print(f"远程操作延迟统计: {stats}")
+        clear_pending_actions()
+        if self.screencast:
+            self.screencast.stop()
+            self.screencast = None
         if self.manager:
             self.manager.move_browser_offscreen()
         shared.is_interactive_mode = False
+        _emit_launcher_event("intervention_end", site=shared.current_site_name)
         shared.current_site_name = None
+        shared.set_screenshot(None)
         self.lock.release()
 
 def process_site_task(site, cdp_port, intervention_manager):
@@ -800,6 +999,9 @@ def process_site_task(site, cdp_port, intervention_manager):
     context = None
     page = None
     result = None
+    timer = SiteTimer(site['name'])
+    timer.begin("acquire")
+    bind_site(site['name'])
     
     try:
         # 连接到主进程的 Chrome
@@ -962,6 +1164,7 @@ def process_site_task(site, cdp_port, intervention_manager):
             print(f"[{site['name']}] 目标地址: {target_url}")
 
         # 导航逻辑优化 (避免重复加载)
+        timer.begin("navigate")
         should_navigate = True
         try:
             if not _ensure_page_alive():
@@ -1001,6 +1204,7 @@ def process_site_task(site, cdp_port, intervention_manager):
             return {"name": site['name'], "error": "页面已关闭", "count": 0}
 
         # 检查登录状态
+        timer.begin("login_check")
         check_selector = selectors.get('pending_tab_selector')
         if not check_selector:
             check_selector = selectors.get('order_menu_link')
@@ -1108,6 +1312,7 @@ def process_site_task(site, cdp_port, intervention_manager):
 
             if direct_access_attempted:
                 # 尝试跳转登录页
+                timer.begin("navigate")
                 try:
                     page.goto(login_url)
                     page.wait_for_load_state('domcontentloaded')
@@ -1115,6 +1320,7 @@ def process_site_task(site, cdp_port, intervention_manager):
                     pass
             
             # 自动登录
+            timer.begin("auto_login")
             print(f"[{site['name']}] 尝试自动登录...")
             try:
                 if not _ensure_page_alive():
@@ -1171,6 +1377,7 @@ def process_site_task(site, cdp_port, intervention_manager):
                 print(f"[{site['name']}] 自动登录出错: {e}")
 
             # 再次检查
+            timer.begin("login_check")
             if check_selector and not is_url(check_selector):
                 try:
                     is_logged_in = page.is_visible(check_selector)
@@ -1184,7 +1391,8 @@ def process_site_task(site, cdp_port, intervention_manager):
             # 人工介入
             if not is_logged_in:
                 print(f"[{site['name']}] 需要人工介入登录")
-                intervention_manager.enter(site['name'], 90)
+                timer.begin("intervention")
+                intervention_manager.enter(site['name'], 90, page=page)
                 try:
                     try: page.bring_to_front()
                     except: pass
@@ -1195,6 +1403,7 @@ def process_site_task(site, cdp_port, intervention_manager):
                         if not _ensure_page_alive():
                             time.sleep(1)
                             continue
+                        intervention_manager.track_page(page)
                         
                         # 确保页面在最前
                         try: page.bring_to_front()
@@ -1239,7 +1448,7 @@ def process_site_task(site, cdp_port, intervention_manager):
                             if "Target page, context or browser has been closed" in str(e):
                                 continue
                         
-                        time.sleep(1)
+                        intervention_manager.pump(page, 1)
                 finally:
                     intervention_manager.exit()
                 
@@ -1259,10 +1468,13 @@ def process_site_task(site, cdp_port, intervention_manager):
 
             if not _ensure_page_alive():
                 return {"name": site['name'], "error": "页面已关闭", "count": 0}
+            timer.begin("popups")
             handle_popups(page, site_name=site['name'])
+            timer.begin("cookie_save")
             _save_session_storage_payload(page, site, selectors)
             
             # 确保在订单页
+            timer.begin("navigate")
             curr = page.url or ""
             target_link = selectors.get('order_menu_link')
             if target_link and is_url(target_link) and target_link not in curr:
@@ -1284,9 +1496,11 @@ def process_site_task(site, cdp_port, intervention_manager):
                         except: pass
             except: pass
             
+            timer.begin("popups")
             handle_popups(page, site_name=site['name'])
 
             # 用户需求：增加智能等待“待审核”这个文字
+            timer.begin("count")
             try:
                 page.get_by_text("待审核", exact=False).wait_for(timeout=5000)
             except:
@@ -1332,6 +1546,7 @@ def process_site_task(site, cdp_port, intervention_manager):
         print(f"[{site['name']}] 任务异常: {e}")
         return {"name": site['name'], "error": str(e), "count": 0}
     finally:
+        timer.begin("release")
         if context:
             try:
                 is_shared = False
@@ -1347,6 +1562,9 @@ def process_site_task(site, cdp_port, intervention_manager):
             except: pass
 
         if p: p.stop()
+        timer.stop()
+        round_metrics.record_site(timer)
+        bind_site(None)
 
 def check_orders(context_or_manager=None):
     """核心任务：轮询所有后台并抓取数据 (并发版)
@@ -1415,6 +1633,13 @@ def check_orders(context_or_manager=None):
     # 1. 设置一个合理的上限 (如 8)，既能覆盖大多数用户的站点数(通常<10)，又不至于炸机
     # 2. 对于超过上限的，ThreadPoolExecutor 会自动排队，这是正常现象
     max_workers = min(len(active_sites), 8)
+    round_metrics.start_round()
+    if trace_enabled(current_config) and install_tracing():
+        tracer.configure(os.path.join(os.path.dirname(get_config_path()), 'traces'),
+                         current_config.get('trace_max_files', TRACE_MAX_FILES))
+        trace_path = tracer.start_round()
+        if trace_path:
+            print(f"本轮 Playwright 调用追踪写入: {trace_path}")
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_site = {
@@ -1446,6 +1671,7 @@ def check_orders(context_or_manager=None):
             process_window_events(manager)
 
     # 5. 汇总后处理
+    cookie_started = time.perf_counter()
     try:
         if manager.context:
             save_global_cookies(manager.context)
@@ -1453,15 +1679,15 @@ def check_orders(context_or_manager=None):
 
     success_count = len([r for r in results if not r.get('error')])
     print(f"<<< 本轮抓取结束，成功: {success_count}/{len(active_sites)}")
+    summary = round_metrics.finish_round(results, extra={"global_cookie_save": time.perf_counter() - cookie_started})
+    tracer.end_round()
+    for line in format_round_summary(summary):
+        print(line)
     
     # === 发送通知逻辑 ===
     if results:
-        data_update = {
-            "type": "data_update",
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "data": results
-        }
-        print(f"DATA_UPDATE:{json.dumps(data_update, ensure_ascii=False)}")
+        # 结构化结果通过 IPC 发给 launcher
+        _publish_data_update(results)
 
         total_count = sum(r['count'] for r in results if r.get('count') is not None)
         
@@ -1559,6 +1785,7 @@ def check_orders_serial(context_or_manager=None):
 
     if not _ensure_runtime_authorized():
         return
+    intervention_manager = InterventionManager(manager)
     config = load_config()
     sites = config.get('sites', [])
     config_keep_page_alive_all = bool(config.get('keep_page_alive_all'))
@@ -2049,7 +2276,7 @@ def check_orders_serial(context_or_manager=None):
                         print(f"[{site['name']}] 自动登录成功！")
                     else:
                         print(f"[{site['name']}] ⚠️ 自动登录未成功（可能需要验证码）。")
-                        intervention_manager.enter(site['name'], 60)
+                        intervention_manager.enter(site['name'], 60, page=page)
                         try:
                             try: page.bring_to_front()
                             except: pass
@@ -2122,7 +2349,7 @@ def check_orders_serial(context_or_manager=None):
                                     print(f"[{site['name']}] 人工介入成功！已登录。")
                                     break
                                 
-                                time.sleep(0.5)
+                                intervention_manager.pump(page, 0.5)
                             
                             if not is_logged_in:
                                 print(f"[{site['name']}] ❌ 人工介入超时，放弃本次抓取。")
@@ -2664,14 +2891,8 @@ def check_orders_serial(context_or_manager=None):
     
     # 汇总并发送通知
     if results:
-        # 输出结构化数据供 launcher 捕获
-        # 增加时间戳字段
-        data_update = {
-            "type": "data_update",
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "data": results
-        }
-        print(f"DATA_UPDATE:{json.dumps(data_update, ensure_ascii=False)}")
+        # 结构化结果通过 IPC 发给 launcher
+        _publish_data_update(results)
 
         # 计算总订单数
         total_count = sum(r['count'] for r in results if r['count'] is not None)
@@ -2769,6 +2990,13 @@ def check_orders_serial(context_or_manager=None):
     
     print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 本次检查结束，7分钟后继续...")
 
+# 初始化热备 profile 时跳过的缓存、锁文件和崩溃记录 (登录态、localStorage、IndexedDB 均保留)
+PROFILE_SNAPSHOT_IGNORE = shutil.ignore_patterns(
+    'Singleton*', 'DevToolsActivePort', 'lockfile', '*.tmp',
+    'Cache', 'Code Cache', 'GPUCache', 'DawnCache', 'GraphiteDawnCache', 'GrShaderCache', 'ShaderCache',
+    'Crashpad', 'BrowserMetrics*', 'component_crx_cache'
+)
+
 class BrowserManager:
     def __init__(self):
         self.playwright = None
@@ -2789,6 +3017,39 @@ class BrowserManager:
         self.pages = {}  # 存储各站点的持久化页面 {site_name: page}
         self.browser_proc = None # 存储浏览器进程句柄
         self.cdp_port = 9222 # 定义 CDP 端口
+        # 浏览器进程监管：记录 PID/进程组，清理冲突进程，崩溃后自动拉起
+        self.supervisor = BrowserSupervisor("browser")
+        self._attached_restart_count = 0
+
+        # 热备浏览器 (可选)：使用独立的 profile 目录和端口，两套 profile 轮流担任主/热备
+        base_dir = os.path.dirname(self.user_data_dir)
+        self.standby_user_data_dir = os.path.join(base_dir, 'browser_standby')
+        self.standby_port = 9223
+        self.standby_supervisor = BrowserSupervisor("standby")
+        self.standby_endpoint = None
+        self.standby_ready = threading.Event()
+        self._standby_lock = threading.Lock()
+        self._standby_thread = None
+        # 切换后的主浏览器角色需持久化，否则重启程序后主/热备又换回来
+        self.role_file = os.path.join(base_dir, 'browser_role.json')
+        self._load_active_role()
+
+    def _load_active_role(self):
+        try:
+            with open(self.role_file, 'r', encoding='utf-8') as f:
+                active = json.load(f).get('active')
+        except Exception:
+            return
+        if active == os.path.basename(self.standby_user_data_dir):
+            self.user_data_dir, self.standby_user_data_dir = self.standby_user_data_dir, self.user_data_dir
+            self.cdp_port, self.standby_port = self.standby_port, self.cdp_port
+            print(f"上次已切换到热备浏览器，当前主浏览器数据目录: {self.user_data_dir}")
+
+    def _save_active_role(self):
+        try:
+            _atomic_write_json(self.role_file, {"active": os.path.basename(self.user_data_dir)})
+        except Exception as e:
+            print(f"保存浏览器角色失败: {e}")
 
     def _get_browser_executable_path(self):
         """获取浏览器可执行文件路径，优先查找本地便携版"""
@@ -2837,45 +3098,161 @@ class BrowserManager:
         return None
 
     def _kill_zombie_browsers(self):
-        """清理可能残留的、占用 User Data Dir 或端口的浏览器进程"""
+        """清理可能残留的、占用 CDP 端口或 User Data Dir 的浏览器进程 (Linux/Windows 通用)"""
         print("正在检查并清理残留的浏览器进程...")
         try:
-            # 1. 按端口清理 (即使 connect 失败，也可能处于半死状态)
-            cmd_port = 'netstat -ano | findstr :9222'
-            proc = subprocess.Popen(cmd_port, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, _ = proc.communicate()
-            
-            if stdout:
-                lines = stdout.decode('utf-8', errors='ignore').splitlines()
-                for line in lines:
-                    parts = line.strip().split()
-                    if len(parts) >= 5 and 'LISTENING' in line:
-                        pid = parts[-1]
-                        print(f"发现占用端口 9222 的进程 (PID: {pid})，正在终止...")
-                        os.system(f"taskkill /F /PID {pid} >nul 2>&1")
-
-            # 2. 按命令行参数清理 (User Data Dir)
-            # 匹配 browser_data 目录名
-            target_str = "browser_data"
-            
-            # 使用 wmic 查找 PID
-            cmd_wmic = f"wmic process where \"name='chrome.exe' and CommandLine like '%{target_str}%'\" get ProcessId"
-            
-            proc = subprocess.Popen(cmd_wmic, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, _ = proc.communicate()
-            
-            if stdout:
-                lines = stdout.decode('utf-8', errors='ignore').splitlines()
-                for line in lines:
-                    line = line.strip()
-                    if line.isdigit():
-                        pid = line
-                        print(f"发现残留浏览器进程 (PID: {pid})，正在终止...")
-                        os.system(f"taskkill /F /PID {pid} >nul 2>&1")
-                        
+            # 先结束自己启动的主浏览器 (含子进程)，再按端口/profile 查找其他残留进程
+            self.supervisor.terminate()
+            self.supervisor.cleanup_conflicts(
+                self.cdp_port,
+                self.user_data_dir,
+                exclude=[self.standby_supervisor.pid]
+            )
         except Exception as e:
             print(f"清理残留进程失败: {e}")
 
+    def _probe_devtools(self, port, timeout=0.5):
+        """轻量探测 CDP 端口：请求 /json/version，可用时返回其中的数据，否则返回 None"""
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=timeout) as resp:
+                data = json.loads(resp.read().decode('utf-8', errors='ignore'))
+            return data if isinstance(data, dict) else None
+        except Exception:
+            return None
+
+    def _read_devtools_active_port(self, user_data_dir):
+        """读取 Chrome 启动后写入 user-data-dir 的 DevToolsActivePort 文件 (端口 + 浏览器 ws 路径)"""
+        try:
+            with open(os.path.join(user_data_dir, 'DevToolsActivePort'), 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f.read().splitlines() if line.strip()]
+            if len(lines) >= 2 and lines[0].isdigit():
+                return int(lines[0]), lines[1]
+        except Exception:
+            pass
+        return None
+
+    def _wait_for_devtools(self, proc, user_data_dir, port, timeout=15):
+        """等待浏览器 DevTools 就绪，返回可直接连接的 ws 地址
+
+        优先读取 DevToolsActivePort 文件 (Chrome 监听端口后才写入)，
+        再用 /json/version 确认，避免反复调用代价高昂的 connect_over_cdp。
+        """
+        deadline = time.time() + timeout
+        interval = 0.05
+        while time.time() < deadline:
+            if proc is not None and proc.poll() is not None:
+                print(f"[X] 浏览器进程已退出，返回码: {proc.returncode}")
+                raise Exception("浏览器启动失败 (进程意外退出)")
+            active = self._read_devtools_active_port(user_data_dir)
+            if active and active[0] == port:
+                return f"ws://127.0.0.1:{port}{active[1]}"
+            info = self._probe_devtools(port, timeout=0.3)
+            if info and info.get('webSocketDebuggerUrl'):
+                return info['webSocketDebuggerUrl']
+            time.sleep(interval)
+            interval = min(interval * 2, 0.4)
+        raise Exception("浏览器启动超时或连接失败")
+
+    def _build_launch_args(self, executable_path, user_data_dir, port, headless, offscreen=False):
+        args = [
+            executable_path,
+            f"--user-data-dir={user_data_dir}",
+            f"--remote-debugging-port={port}",
+            "--remote-debugging-address=127.0.0.1",
+            "--no-first-run",
+            "--no-default-browser-check",
+            # "--window-size=1920,1080", # 暂时移除分辨率设置，排查崩溃
+            # "--window-position=-2400,-2400", # 暂时移除位置设置，排查崩溃
+            "--disable-infobars",
+            "--disable-blink-features=AutomationControlled",
+            # "--start-maximized", # 不需要最大化
+            # 模拟 UA
+            "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "--ignore-certificate-errors",
+            # 禁用后台网络和 Google 服务，减少报错
+            "--disable-background-networking",
+            "--disable-sync",
+            "--disable-translate",
+            "--disable-client-side-phishing-detection",
+            "--no-service-autorun",
+            # 增加稳定性参数，解决部分环境崩溃问题 (错误码 2147483651 / 0x80000003)
+            "--no-sandbox",
+            "--disable-gpu",
+            "--disable-software-rasterizer",
+            "--disable-dev-shm-usage" # 避免共享内存不足
+        ]
+        if offscreen and not headless:
+            # 备用浏览器在被接管前不应出现在屏幕上
+            args.append("--window-position=-4800,-4800")
+        if headless:
+            args.append("--headless=new")
+        return args
+
+    def _launch_browser_process(self, user_data_dir, port, supervisor, offscreen=False):
+        """通过 supervisor 启动独立浏览器进程 (脚本退出后不关闭)，返回进程句柄"""
+        if not os.path.exists(user_data_dir):
+            os.makedirs(user_data_dir)
+        # 删除上次残留的 DevToolsActivePort，避免误判就绪
+        try:
+            os.remove(os.path.join(user_data_dir, 'DevToolsActivePort'))
+        except OSError:
+            pass
+
+        # 获取 Chromium 可执行文件路径
+        executable_path = self._get_browser_executable_path()
+        print(f"浏览器可执行文件路径: {executable_path}")
+
+        if not executable_path:
+            raise FileNotFoundError("未找到可用的浏览器 (内置或系统)。请确保 playwright-browsers 目录存在或已安装 Chrome。")
+
+        try:
+            headless = bool(load_config().get('headless', False))
+        except:
+            headless = False
+
+        args = self._build_launch_args(executable_path, user_data_dir, port, headless, offscreen=offscreen)
+        print(f"启动命令: {' '.join(args)}")
+
+        # Windows 下使用 DETACHED_PROCESS，Linux 下使用独立会话/进程组 (见 browser_supervisor)
+        return supervisor.spawn(args)
+
+    def _attach_browser(self, endpoint, inject_stealth=True):
+        """对已就绪的浏览器只执行一次 connect_over_cdp，并初始化上下文"""
+        browser = self.playwright.chromium.connect_over_cdp(endpoint)
+        self.browser = browser # 保存引用
+
+        if browser.contexts:
+            self.context = browser.contexts[0]
+        else:
+            self.context = browser.new_context()
+
+        if not inject_stealth:
+            return
+
+        # 注入反爬虫/反检测脚本 (Stealth JS)
+        try:
+            stealth_js = """
+                try {
+                    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+                } catch (e) {}
+                try {
+                    if (!window.chrome) { window.chrome = {}; }
+                    if (!window.chrome.runtime) { window.chrome.runtime = {}; }
+                } catch (e) {}
+                try {
+                    const originalQuery = window.navigator.permissions.query;
+                    window.navigator.permissions.query = (parameters) => (
+                        parameters.name === 'notifications' ?
+                            Promise.resolve({ state: Notification.permission }) :
+                            originalQuery(parameters)
+                    );
+                } catch (e) {}
+            """
+            self.context.add_init_script(stealth_js)
+            print("已注入反检测脚本 (Stealth JS)")
+        except Exception as e:
+            print(f"注入反检测脚本失败: {e}")
+
     def start(self):
         """启动浏览器和上下文"""
         if not self.playwright:
@@ -2886,146 +3263,45 @@ class BrowserManager:
             
         if not self.context:
             try:
-                # 1. 尝试连接已存在的浏览器实例 (CDP)
+                # 1. 先用 /json/version 探测是否已有浏览器实例，可用时才连接 (CDP)
                 print(f"尝试连接已运行的浏览器 (端口 {self.cdp_port})...")
-                try:
-                    # 注意：connect_over_cdp 返回的是 Browser 实例，不是 Context
-                    browser = self.playwright.chromium.connect_over_cdp(f"http://127.0.0.1:{self.cdp_port}")
-                    self.browser = browser # 保存引用
-                    # 获取默认上下文 (通常第一个)
-                    if browser.contexts:
-                        self.context = browser.contexts[0]
-                    else:
-                        # 如果没有上下文，创建一个新的
-                        self.context = browser.new_context()
-                    print("成功连接到现有浏览器！")
-                except Exception as cdp_err:
-                    print(f"连接现有浏览器失败: {cdp_err}")
-                    print("这可能是因为现有浏览器未开启远程调试端口(9222)，或者处于无响应状态。")
+                info = self._probe_devtools(self.cdp_port)
+                attached = False
+                if info and info.get('webSocketDebuggerUrl'):
+                    try:
+                        # 注意：connect_over_cdp 返回的是 Browser 实例，不是 Context
+                        self._attach_browser(info['webSocketDebuggerUrl'], inject_stealth=False)
+                        attached = True
+                        print("成功连接到现有浏览器！")
+                    except Exception as cdp_err:
+                        print(f"连接现有浏览器失败: {cdp_err}")
+                else:
+                    print("未检测到开启远程调试端口的浏览器实例。")
+
+                if not attached:
                     print("准备清理残留进程并启动新实例...")
                     
                     # === 新增：启动前清理残留进程 ===
                     self._kill_zombie_browsers()
+                    # 主浏览器此时已停止，可以安全地复制其 profile 作为热备的初始数据
+                    self._seed_standby_profile()
                     
                     # 2. 启动新的浏览器进程 (独立进程，脚本退出后不关闭)
                     print("正在启动独立浏览器进程...")
-                    
-                    # 获取 Chromium 可执行文件路径
-                    executable_path = self._get_browser_executable_path()
-                    print(f"浏览器可执行文件路径: {executable_path}")
-                    
-                    if not executable_path:
-                        raise FileNotFoundError("未找到可用的浏览器 (内置或系统)。请确保 playwright-browsers 目录存在或已安装 Chrome。")
-                    
-                    try:
-                        headless = bool(load_config().get('headless', False))
-                    except:
-                        headless = False
-
-                    # 构造启动命令
-                    args = [
-                        executable_path,
-                        f"--user-data-dir={self.user_data_dir}",
-                        f"--remote-debugging-port={self.cdp_port}",
-                        "--remote-debugging-address=127.0.0.1",
-                        "--no-first-run",
-                        "--no-default-browser-check",
-                        # "--window-size=1920,1080", # 暂时移除分辨率设置，排查崩溃
-                        # "--window-position=-2400,-2400", # 暂时移除位置设置，排查崩溃
-                        "--disable-infobars",
-                        "--disable-blink-features=AutomationControlled",
-                        # "--start-maximized", # 不需要最大化
-                        # 模拟 UA
-                        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                        "--ignore-certificate-errors",
-                        # 禁用后台网络和 Google 服务，减少报错
-                        "--disable-background-networking",
-                        "--disable-sync",
-                        "--disable-translate",
-                        "--disable-client-side-phishing-detection",
-                        "--no-service-autorun",
-                        # 增加稳定性参数，解决部分环境崩溃问题 (错误码 2147483651 / 0x80000003)
-                        "--no-sandbox",
-                        "--disable-gpu",
-                        "--disable-software-rasterizer",
-                        "--disable-dev-shm-usage" # 避免共享内存不足
-                    ]
-                    
-                    if headless:
-                        args.append("--headless=new")
-                    
-                    print(f"启动命令: {' '.join(args)}")
-                    
-                    # 使用 subprocess.Popen 启动 (detaches from python script)
-                    # 恢复显示控制台窗口 (用户反馈 cmd 窗口没关系)，并移除日志重定向以便查看
-                    # 使用 DETACHED_PROCESS (0x00000008) 替代 CREATE_NEW_CONSOLE
-                    # 注意：这两个标志不能同时使用，否则会报 [WinError 87] 参数错误
-                    # DETACHED_PROCESS 已经隐含了不继承父控制台，且对于 GUI 程序 (Chrome) 不会影响窗口显示
-                    flags = 0
-                    if sys.platform == 'win32':
-                        flags = 0x00000008 # DETACHED_PROCESS
-
-                    proc = subprocess.Popen(args, creationflags=flags)
+                    proc = self._launch_browser_process(self.user_data_dir, self.cdp_port, self.supervisor)
                     self.browser_proc = proc # 保存进程句柄以便后续控制窗口
                     
-                    print("浏览器进程已启动，等待初始化...")
-                    
-                    # 3. 循环尝试连接 (最多 15 秒)
-                    print(f"尝试连接新启动的浏览器 (最多等待 15 秒)...")
-                    browser = None
-                    for i in range(15):
-                        # 检查进程是否意外退出
-                        if proc.poll() is not None:
-                            print(f"[X] 浏览器进程已退出，返回码: {proc.returncode}")
-                            raise Exception("浏览器启动失败 (进程意外退出)")
-
-                        try:
-                            browser = self.playwright.chromium.connect_over_cdp(f"http://127.0.0.1:{self.cdp_port}")
-                            if browser:
-                                print(f"第 {i+1} 次尝试: 连接成功！")
-                                break
-                        except Exception as e:
-                            # 仅打印前几次的错误，避免刷屏，或者只打印点号
-                            if i < 3 or i % 5 == 0:
-                                print(f"第 {i+1} 次尝试连接失败，继续等待...")
-                            time.sleep(1)
-                    
-                    if not browser:
-                        raise Exception("浏览器启动超时或连接失败")
-                        
-                    self.browser = browser # 保存引用
-
-                    if browser.contexts:
-                        self.context = browser.contexts[0]
-                    else:
-                        self.context = browser.new_context()
-
-                    # 注入反爬虫/反检测脚本 (Stealth JS)
-                    try:
-                        stealth_js = """
-                            try {
-                                Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-                            } catch (e) {}
-                            try {
-                                if (!window.chrome) { window.chrome = {}; }
-                                if (!window.chrome.runtime) { window.chrome.runtime = {}; }
-                            } catch (e) {}
-                            try {
-                                const originalQuery = window.navigator.permissions.query;
-                                window.navigator.permissions.query = (parameters) => (
-                                    parameters.name === 'notifications' ?
-                                        Promise.resolve({ state: Notification.permission }) :
-                                        originalQuery(parameters)
-                                );
-                            } catch (e) {}
-                        """
-                        self.context.add_init_script(stealth_js)
-                        print("已注入反检测脚本 (Stealth JS)")
-                    except Exception as e:
-                        print(f"注入反检测脚本失败: {e}")
+                    # 3. 等待 DevTools 就绪后只连接一次
+                    print("浏览器进程已启动，等待 DevTools 就绪 (最多 15 秒)...")
+                    wait_start = time.time()
+                    endpoint = self._wait_for_devtools(proc, self.user_data_dir, self.cdp_port, timeout=15)
+                    print(f"DevTools 已就绪 ({time.time() - wait_start:.2f}s)，正在连接...")
+                    self._attach_browser(endpoint)
+                    self.supervisor.start_watchdog()
 
                     print("浏览器启动并连接成功。")
 
+                self._attached_restart_count = self.supervisor.restart_count
                 load_global_cookies(self.context)
                 try:
                     if not bool(load_config().get('headless', False)):
@@ -3037,6 +3313,126 @@ class BrowserManager:
                 self.stop()
                 raise e
 
+        self.prelaunch_standby()
+
+    def _standby_enabled(self):
+        try:
+            return bool(load_config().get('browser_standby', False))
+        except Exception:
+            return False
+
+    def _seed_standby_profile(self):
+        """热备 profile 尚不存在时，从已停止的主浏览器 profile 复制一份 (跳过缓存与锁文件)
+
+        只在主浏览器进程已结束、热备未运行时调用：运行中的 Chrome 会持续写入 SQLite (Cookies、
+        History) 与 LevelDB (Local Storage、IndexedDB)，此时复制得到的是不一致的数据库。
+        """
+        if os.path.isdir(self.standby_user_data_dir) or not os.path.isdir(self.user_data_dir):
+            return
+        if self.standby_supervisor.is_alive() or not self._standby_enabled():
+            return
+        print("正在从主浏览器 profile 初始化热备 profile...")
+        try:
+            shutil.copytree(self.user_data_dir, self.standby_user_data_dir, ignore=PROFILE_SNAPSHOT_IGNORE)
+        except (shutil.Error, OSError) as e:
+            # 复制不完整的 profile 不可用，删除后热备以空 profile 启动，登录态在切换时迁移
+            print(f"初始化热备 profile 失败: {e}")
+            shutil.rmtree(self.standby_user_data_dir, ignore_errors=True)
+
+    def prelaunch_standby(self):
+        """预启动一个热备浏览器 (独立 profile 与端口)，使 restart() 可以直接切换
+
+        热备浏览器不复制运行中的主浏览器 profile；切换时由 restart() 先从主浏览器导出
+        storage_state (Cookies + localStorage) 到 global_state.json，再写入热备浏览器。
+        IndexedDB 不在 storage_state 中，依赖 IndexedDB 保存登录态的站点切换后需要重新登录。
+        需在配置中开启 browser_standby，会额外占用一个浏览器进程的内存。
+        """
+        if not self._standby_enabled():
+            return
+        with self._standby_lock:
+            if self.standby_supervisor.is_alive():
+                return
+            if self._standby_thread is not None and self._standby_thread.is_alive():
+                return
+            self.standby_endpoint = None
+            ready = threading.Event()
+            self.standby_ready = ready
+            self._standby_thread = threading.Thread(
+                target=self._prepare_standby,
+                args=(self.standby_user_data_dir, self.standby_port, self.standby_supervisor,
+                      self.supervisor.pid, ready),
+                name="browser-standby",
+                daemon=True
+            )
+            self._standby_thread.start()
+
+    def _prepare_standby(self, user_data_dir, port, supervisor, primary_pid, ready):
+        try:
+            print(f"正在预启动热备浏览器 (端口 {port})...")
+            supervisor.cleanup_conflicts(port, user_data_dir, exclude=[primary_pid])
+            proc = self._launch_browser_process(user_data_dir, port, supervisor, offscreen=True)
+            self.standby_endpoint = self._wait_for_devtools(proc, user_data_dir, port, timeout=30)
+            ready.set()
+            print("热备浏览器已就绪。")
+        except Exception as e:
+            print(f"预启动热备浏览器失败: {e}")
+
+    def _export_login_state(self):
+        """切换前从当前浏览器导出登录态 (Cookies + localStorage) 到 global_state.json"""
+        if not self.context:
+            return
+        try:
+            _ = self.context.pages
+        except Exception:
+            # 浏览器已崩溃时沿用上次保存的 global_state.json
+            return
+        save_global_cookies(self.context)
+
+    def _promote_standby(self):
+        """将热备浏览器切换为主浏览器，成功返回 True"""
+        proc = self.standby_supervisor.proc
+        if not self.standby_supervisor.is_alive() or not self.standby_ready.is_set():
+            return False
+        info = self._probe_devtools(self.standby_port)
+        endpoint = (info or {}).get('webSocketDebuggerUrl') or self.standby_endpoint
+        if not endpoint:
+            return False
+
+        old_dir, old_port = self.user_data_dir, self.cdp_port
+        if not self.playwright:
+            self.playwright = sync_playwright().start()
+        try:
+            self._attach_browser(endpoint)
+        except Exception as e:
+            print(f"切换到热备浏览器失败: {e}")
+            return False
+
+        # 角色互换：热备成为主浏览器，原主浏览器目录/端口留给下一个热备
+        old_supervisor = self.supervisor
+        old_supervisor.stop_watchdog()
+        self.browser_proc = proc
+        self.supervisor, self.standby_supervisor = self.standby_supervisor, old_supervisor
+        self.user_data_dir, self.cdp_port = self.standby_user_data_dir, self.standby_port
+        self.standby_user_data_dir, self.standby_port = old_dir, old_port
+        self.standby_endpoint = None
+        self.standby_ready = threading.Event()
+
+        # 原主浏览器连同子进程一起结束，其目录/端口留给下一个热备
+        old_supervisor.terminate()
+        self.supervisor.start_watchdog()
+        self._attached_restart_count = self.supervisor.restart_count
+        self._save_active_role()
+
+        load_global_cookies(self.context)
+        restore_global_local_storage(self.context)
+        try:
+            if not bool(load_config().get('headless', False)):
+                self.move_browser_offscreen()
+        except:
+            pass
+        print(f"已切换到热备浏览器 (端口 {self.cdp_port})。")
+        return True
+
     def stop(self):
         """关闭连接 (不关闭浏览器进程)"""
         self.pages.clear() # 清空页面记录
@@ -3067,16 +3463,40 @@ class BrowserManager:
             self.playwright = None
 
     def restart(self):
-        """重启浏览器"""
+        """重启浏览器 (已预启动热备浏览器时直接切换)"""
         print("正在重启浏览器...")
+        if self.standby_ready.is_set():
+            self._export_login_state()
         self.stop()
-        
+
+        if self._promote_standby():
+            self.prelaunch_standby()
+            return
+
+        # 监管线程刚刚拉起过崩溃的浏览器时，直接重新连接即可
+        if self.supervisor.is_alive() and self.supervisor.restart_count != self._attached_restart_count:
+            self.start()
+            return
+
         # 清理旧进程
         self._kill_zombie_browsers()
 
         time.sleep(2)
         self.start()
 
+    def ensure_attached(self):
+        """监管线程重新拉起浏览器后，在主线程重新建立 CDP 连接"""
+        if self.supervisor.restart_count == self._attached_restart_count:
+            return
+        print("浏览器已被监管线程重新拉起，正在重新连接...")
+        # 先记录代数，连接失败时交给 get_context 按需重试，避免主循环每秒重复尝试
+        self._attached_restart_count = self.supervisor.restart_count
+        self.stop()
+        try:
+            self.start()
+        except Exception as e:
+            print(f"重新连接浏览器失败: {e}")
+
     def get_context(self):
         """获取当前上下文，如果不存在或已关闭则尝试重启"""
         if self.context:
@@ -3315,21 +3735,51 @@ def ensure_single_instance():
         print("请不要重复启动监控脚本。")
         sys.exit(1)
 
-def run_scheduler():
-    """定时任务调度"""
+def _start_web_server_background(timeout=5):
+    """在后台线程启动 Web 服务，并等待端口可连接 (用于启动耗时统计)"""
+    server_thread = threading.Thread(target=start_web_server, daemon=True)
+    server_thread.start()
+    host = os.environ.get('WEB_SERVER_HOST', '127.0.0.1')
+    if host in ('0.0.0.0', '::', ''):
+        host = '127.0.0.1'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, SERVER_PORT), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def run_scheduler(boot=None):
+    """定时任务调度
+
+    启动步骤按并发启动图执行：配置 (本地签名快照)、Web 服务、授权校验在后台线程并行，
+    浏览器在主线程启动 (Playwright 同步 API 绑定线程)，浏览器就绪后立即开始首轮抓取。
+    """
     print("监控脚本已启动 (Ctrl+C 停止)...")
-    
+    boot = boot or BootGraph()
+
     # 启动 Cookie Web 服务 (后台线程)
     print(f"启动 Cookie 更新服务: http://{SERVER_IP}:{SERVER_PORT}")
-    server_thread = threading.Thread(target=start_web_server, daemon=True)
-    server_thread.start()
+    boot.add("web_server", _start_web_server_background)
+    boot.add("config", load_config)
+    boot.start()
 
     # 初始化浏览器
-    try:
-        browser_manager.start()
-    except Exception:
+    browser_task = boot.run_inline("browser", browser_manager.start)
+    if browser_task.error:
         print("初始化浏览器失败，将在首次任务执行时重试。")
 
+    # 授权校验未通过时不执行任何抓取
+    if "license" in boot.tasks:
+        license_task = boot.wait("license")
+        if not license_task.ok or not license_task.result:
+            print("[错误] 未找到有效的授权信息，请从启动器启动本程序！")
+            time.sleep(3)
+            sys.exit(1)
+
     # 定义一个包装函数来处理异常，防止浏览器崩溃导致脚本退出
     def safe_check_orders():
         try:
@@ -3360,6 +3810,8 @@ def run_scheduler():
                     print(f"重启浏览器失败: {restart_error}")
             
     # 立即执行一次
+    boot.mark("first_round")
+    print(boot.report())
     safe_check_orders()
     
     # 1. 每天早上08:00准时触发一次（确保8点收到通知）
@@ -3391,6 +3843,10 @@ def run_scheduler():
                 # 发送通知（可选）
                 break
 
+            if shutdown_requested.is_set():
+                print("收到 launcher 停止指令，正在退出...")
+                break
+
             schedule.run_pending()
             
             # 随机心跳检测 (在等待期间保持活跃)
@@ -3404,6 +3860,9 @@ def run_scheduler():
                 last_heartbeat_time = current_time
                 next_heartbeat_interval = random.randint(30, 90)
             
+            # 浏览器崩溃后由监管线程拉起，这里重新连接
+            browser_manager.ensure_attached()
+
             # 处理浏览器窗口控制队列
             try:
                 while not shared.window_control_queue.empty():
@@ -3419,17 +3878,33 @@ def run_scheduler():
     except KeyboardInterrupt:
         print("\n正在停止...")
     finally:
+        # 先关闭远程控制连接，再关闭浏览器
+        stop_web_server()
         browser_manager.stop()
 
 if __name__ == '__main__':
+    # 确保单实例运行
+    _instance_lock = ensure_single_instance()
+
+    # 由 launcher 拉起时建立 IPC 通道 (事件上报 / 指令接收)
+    # 须在启动图开始前连接，否则启动步骤中上报的事件会因通道未建立而丢失
+    launcher_ipc = connect_launcher_ipc()
+    if launcher_ipc is not None:
+        def _on_browser_command(msg):
+            action = msg.get("action")
+            if action in ("show", "hide"):
+                shared.window_control_queue.put(action)
+
+        launcher_ipc.on("browser", _on_browser_command)
+        launcher_ipc.on("shutdown", lambda msg: shutdown_requested.set())
+
     # === 授权校验 (双重保险) ===
+    # 与浏览器启动等步骤并行执行，首轮抓取前等待其结果
     print("正在检查授权...")
-    license_code = auth_manager.load_license()
-    if not license_code:
-        print("[错误] 未找到有效的授权信息，请从启动器启动本程序！")
-        time.sleep(3)
-        sys.exit(1)
-    
+    boot = BootGraph()
+    boot.add("license", auth_manager.load_license)
+    boot.start()
+
     # 启动后台心跳线程 (每5分钟一次)
     def _auth_heartbeat_loop():
         while True:
@@ -3444,12 +3919,10 @@ if __name__ == '__main__':
                         os._exit(1) # 强制退出整个进程
                 except Exception as e:
                     print(f"心跳检查异常: {e}")
+                auth_manager.log_http_stats()
                 time.sleep(300)
 
     auth_thread = threading.Thread(target=_auth_heartbeat_loop, daemon=True)
     auth_thread.start()
 
-    # 确保单实例运行
-    _instance_lock = ensure_single_instance()
-    
-    run_scheduler()
+    run_scheduler(boot)
@@ -0,0 +1,178 @@
+import json
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import shared
+import web_runtime
+from frame_codec import FRAME_KEY, TileEncoder
+from remote_input import enqueue_action
+from stream_governor import FrameGovernor
+
+# 二进制帧头: 1 字节类型 + 4 字节帧序号 (大端)，类型定义见 frame_codec
+FRAME_HEADER = struct.Struct(">BI")
+
+# 客户端未确认的帧数上限：超过后不再发送，期间产生的旧帧直接丢弃，只发最新帧
+MAX_INFLIGHT_FRAMES = 2
+# 超过该时长仍收不到确认，视为确认丢失，重置计数避免画面卡死
+ACK_TIMEOUT_SECONDS = 5.0
+
+
+class ViewerChannel:
+    """单个远程查看端的 WebSocket 通道：下行推送二进制画面帧，上行接收操作事件
+
+    发送循环运行在 WebSocket 请求线程 (或 greenlet) 中，接收循环由 runtime 另起；
+    交互模式结束或任一方向断开时双方都会退出，并以 1000 正常关闭连接，
+    Web 服务关闭时以 1001 关闭。
+    """
+
+    def __init__(self, ws, site_name: Optional[str] = None,
+                 governor_options: Optional[Dict[str, int]] = None, runtime=None) -> None:
+        self.ws = ws
+        self.runtime = runtime or web_runtime.current
+        self.site_name = site_name
+        self.encoder = TileEncoder()
+        self.governor = FrameGovernor(**(governor_options or {}))
+        self._sent_ts: Dict[int, float] = {}
+        self.closed = self.runtime.event()
+        self._ack_event = self.runtime.event()
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._last_send_ts = 0.0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.sent_bytes = 0
+        self.actions = 0
+
+    def _send_json(self, data: Dict[str, Any]) -> None:
+        self.ws.send(json.dumps(data, ensure_ascii=False))
+
+    def _handle_message(self, message) -> None:
+        if not isinstance(message, str):
+            return
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+        msg_type = data.get("type")
+        if msg_type == "ack":
+            with self._lock:
+                self._inflight = max(0, self._inflight - 1)
+                seq = data.get("seq")
+                sent_ts = self._sent_ts.pop(seq, None) if isinstance(seq, int) else None
+                if sent_ts is not None:
+                    self.governor.on_ack(time.time() - sent_ts)
+            self._ack_event.set()
+            return
+        if not msg_type or not shared.is_interactive_mode:
+            return
+        enqueue_action(data)
+        self.actions += 1
+
+    def _receive_loop(self) -> None:
+        try:
+            while not self.closed.is_set():
+                message = self.ws.receive(timeout=1.0)
+                if message is None:
+                    if not getattr(self.ws, "connected", True):
+                        break
+                    continue
+                self._handle_message(message)
+        except Exception:
+            pass
+        finally:
+            self.closed.set()
+            shared.notify_screenshot_waiters()
+
+    def _can_send(self) -> bool:
+        with self._lock:
+            if self._inflight < MAX_INFLIGHT_FRAMES:
+                return True
+            if time.time() - self._last_send_ts > ACK_TIMEOUT_SECONDS:
+                self._inflight = 0
+                self._sent_ts.clear()
+                return True
+            self.governor.on_backlog()
+            return False
+
+    def _encode_frame(self, seq: int, frame: bytes) -> Optional[bytes]:
+        """编码为关键帧或增量帧，画面无变化时返回 None"""
+        self.encoder.quality = self.governor.quality
+        try:
+            encoded = self.encoder.encode(frame)
+            self.governor.note_change(self.encoder.last_dirty_ratio)
+        except Exception:
+            # 无法解码的帧原样作为关键帧发送，下一帧重新建立比较基准
+            self.encoder.reset()
+            encoded = (FRAME_KEY, frame)
+        if encoded is None:
+            return None
+        kind, body = encoded
+        return FRAME_HEADER.pack(kind, seq & 0xFFFFFFFF) + body
+
+    def run(self) -> None:
+        receiver = self.runtime.spawn(self._receive_loop, name="viewer-recv")
+        last_seq = -1
+        try:
+            self._send_json({"type": "hello", "site": self.site_name})
+            while not self.closed.is_set() and shared.is_interactive_mode and not web_runtime.stopping.is_set():
+                if not self._can_send():
+                    self._ack_event.wait(0.5)
+                    self._ack_event.clear()
+                    continue
+                delay = self.governor.send_delay()
+                if delay > 0:
+                    # 等待期间到达的中间帧被跳过，醒来后只取最新帧；分段等待以便及时响应操作后的提速
+                    self.closed.wait(min(delay, 0.1))
+                    continue
+                seq, frame = self.runtime.wait_for_screenshot(last_seq, timeout=1.0)
+                if seq == last_seq or not frame:
+                    continue
+                if last_seq >= 0 and seq - last_seq > 1:
+                    self.dropped_frames += seq - last_seq - 1
+                last_seq = seq
+                payload = self._encode_frame(seq, frame)
+                if payload is None:
+                    continue
+                with self._lock:
+                    self._inflight += 1
+                    self._last_send_ts = time.time()
+                    self._sent_ts[seq & 0xFFFFFFFF] = self._last_send_ts
+                self.governor.on_sent(len(payload))
+                self.ws.send(payload)
+                self.sent_frames += 1
+                self.sent_bytes += len(payload)
+            if web_runtime.stopping.is_set():
+                self.close(1001, "server shutting down")
+            elif not self.closed.is_set():
+                self._send_json({"type": "end"})
+        except Exception:
+            pass
+        finally:
+            self.close()
+            receiver.join(timeout=2)
+
+    def close(self, reason: int = 1000, message: str = "interactive mode ended") -> None:
+        if self.closed.is_set() and not getattr(self.ws, "connected", False):
+            return
+        self.closed.set()
+        try:
+            self.ws.close(reason=reason, message=message)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "site": self.site_name,
+            "sent_frames": self.sent_frames,
+            "dropped_frames": self.dropped_frames,
+            "sent_bytes": self.sent_bytes,
+            "keyframes": self.encoder.keyframes,
+            "delta_frames": self.encoder.delta_frames,
+            "skipped_frames": self.encoder.skipped_frames,
+            "actions": self.actions,
+            **self.governor.stats(),
+        }
@@ -0,0 +1,275 @@
+import math
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import shared
+from round_metrics import percentile
+
+# 常用按键的 CDP 参数 (windowsVirtualKeyCode 决定表单提交/删除等默认行为)
+KEY_DEFINITIONS = {
+    "Enter": {"code": "Enter", "windowsVirtualKeyCode": 13, "text": "\r"},
+    "Backspace": {"code": "Backspace", "windowsVirtualKeyCode": 8},
+    "Tab": {"code": "Tab", "windowsVirtualKeyCode": 9},
+    "Escape": {"code": "Escape", "windowsVirtualKeyCode": 27},
+    "Delete": {"code": "Delete", "windowsVirtualKeyCode": 46},
+    "ArrowLeft": {"code": "ArrowLeft", "windowsVirtualKeyCode": 37},
+    "ArrowRight": {"code": "ArrowRight", "windowsVirtualKeyCode": 39},
+    "ArrowUp": {"code": "ArrowUp", "windowsVirtualKeyCode": 38},
+    "ArrowDown": {"code": "ArrowDown", "windowsVirtualKeyCode": 40},
+}
+
+# 连续出现时只保留最后一个的事件类型 (拖动过程中的移动事件)
+COALESCE_TYPES = ("mousemove",)
+
+
+class LatencyStats:
+    """记录远程操作从入队到执行完成的耗时，按操作类型统计"""
+
+    def __init__(self, maxlen: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._maxlen = maxlen
+
+    def record(self, action_type: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(action_type, deque(maxlen=self._maxlen))
+            samples.append(seconds * 1000)
+            self._counts[action_type] = self._counts.get(action_type, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for action_type, samples in self._samples.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                result[action_type] = {
+                    "count": self._counts.get(action_type, 0),
+                    "avg_ms": round(sum(ordered) / len(ordered), 1),
+                    "p50_ms": round(percentile(ordered, 50), 1),
+                    "p95_ms": round(percentile(ordered, 95), 1),
+                    "max_ms": round(ordered[-1], 1),
+                }
+            return result
+
+
+# 全局统计，供 web_server 暴露
+latency_stats = LatencyStats()
+
+
+def enqueue_action(data: Dict[str, Any]) -> None:
+    """Web 端收到的操作加上入队时间后放入 shared.command_queue"""
+    item = dict(data)
+    item["_enqueued_at"] = time.perf_counter()
+    shared.command_queue.put(item)
+    shared.mark_remote_activity()
+
+
+def clear_pending_actions() -> None:
+    while True:
+        try:
+            shared.command_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def coalesce_actions(actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """合并连续的同类移动事件，只保留最新位置 (保留首个事件的入队时间用于统计)"""
+    result: List[Dict[str, Any]] = []
+    for action in actions:
+        if result and action.get("type") in COALESCE_TYPES and result[-1].get("type") == action.get("type"):
+            merged = dict(action)
+            merged["_enqueued_at"] = result[-1].get("_enqueued_at", action.get("_enqueued_at"))
+            result[-1] = merged
+        else:
+            result.append(action)
+    return result
+
+
+def _ease_in_out(t: float) -> float:
+    return 0.5 - math.cos(math.pi * t) / 2
+
+
+def build_drag_path(start, end, steps=None):
+    """生成滑块拖动轨迹：先加速后减速，带少量纵向抖动，末端轻微回拉，模拟人手"""
+    (x0, y0), (x1, y1) = start, end
+    distance = math.hypot(x1 - x0, y1 - y0)
+    if steps is None:
+        steps = max(8, min(40, int(distance / 8)))
+    points = []
+    overshoot = min(6.0, distance * 0.03)
+    direction = 1 if x1 >= x0 else -1
+    for i in range(1, steps + 1):
+        t = _ease_in_out(i / steps)
+        x = x0 + (x1 - x0) * t
+        y = y0 + (y1 - y0) * t
+        if i < steps:
+            y += random.uniform(-1.0, 1.0)
+        points.append((x, y))
+    if overshoot >= 1:
+        points.insert(-1, (x1 + direction * overshoot, y1))
+    return points
+
+
+class InputExecutor:
+    """在持有介入页面的线程中消费 shared.command_queue，转换为 CDP Input.* 调用"""
+
+    def __init__(self, page, session=None, stats: Optional[LatencyStats] = None) -> None:
+        self.page = page
+        self.session = session
+        self.stats = stats or latency_stats
+        self._owns_session = False
+        self._mouse_down = False
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = self.page.context.new_cdp_session(self.page)
+            self._owns_session = True
+        return self.session
+
+    def retarget(self, page, session=None) -> None:
+        if page is self.page and session is self.session:
+            return
+        self.close()
+        self.page = page
+        self.session = session
+
+    def close(self) -> None:
+        if self._owns_session and self.session is not None:
+            try:
+                self.session.detach()
+            except Exception:
+                pass
+        self.session = None
+        self._owns_session = False
+
+    def _viewport(self):
+        meta = shared.get_screenshot_meta()
+        width = meta.get("deviceWidth")
+        height = meta.get("deviceHeight")
+        offset_top = meta.get("offsetTop") or 0
+        if width and height:
+            return float(width), float(height), float(offset_top)
+        size = None
+        try:
+            size = self.page.viewport_size
+        except Exception:
+            size = None
+        if not size:
+            try:
+                size = self.page.evaluate("() => ({width: window.innerWidth, height: window.innerHeight})")
+            except Exception:
+                size = None
+        if size:
+            return float(size["width"]), float(size["height"]), 0.0
+        return 1280.0, 800.0, 0.0
+
+    def _to_point(self, x_pct, y_pct):
+        width, height, offset_top = self._viewport()
+        x = max(0.0, min(1.0, float(x_pct or 0))) * width
+        y = max(0.0, min(1.0, float(y_pct or 0))) * height - offset_top
+        return x, max(0.0, y)
+
+    def _mouse(self, event_type, x, y, click_count=1):
+        params = {"type": event_type, "x": x, "y": y, "button": "left", "pointerType": "mouse"}
+        if event_type in ("mousePressed", "mouseReleased"):
+            params["clickCount"] = click_count
+        if event_type == "mouseMoved" and self._mouse_down:
+            params["buttons"] = 1
+        self._get_session().send("Input.dispatchMouseEvent", params)
+
+    def _key(self, key):
+        definition = KEY_DEFINITIONS.get(key, {})
+        params = {"key": key, "code": definition.get("code", key)}
+        if "windowsVirtualKeyCode" in definition:
+            params["windowsVirtualKeyCode"] = definition["windowsVirtualKeyCode"]
+            params["nativeVirtualKeyCode"] = definition["windowsVirtualKeyCode"]
+        down = dict(params, type="keyDown")
+        if definition.get("text"):
+            down["text"] = definition["text"]
+        elif len(key) == 1:
+            down["text"] = key
+        session = self._get_session()
+        session.send("Input.dispatchKeyEvent", down)
+        session.send("Input.dispatchKeyEvent", dict(params, type="keyUp"))
+
+    def _drag(self, action):
+        start = self._to_point(action.get("start_x_pct"), action.get("start_y_pct"))
+        end = self._to_point(action.get("end_x_pct"), action.get("end_y_pct"))
+        self._mouse("mouseMoved", *start)
+        self._mouse("mousePressed", *start)
+        self._mouse_down = True
+        try:
+            path = build_drag_path(start, end)
+            # 总时长 300~700ms，与拖动距离相关
+            step_delay = min(0.7, max(0.3, math.hypot(end[0] - start[0], end[1] - start[1]) / 600)) / len(path)
+            for x, y in path:
+                self._mouse("mouseMoved", x, y)
+                time.sleep(step_delay)
+        finally:
+            self._mouse("mouseReleased", *end)
+            self._mouse_down = False
+
+    def execute(self, action: Dict[str, Any]) -> None:
+        action_type = action.get("type")
+        if action_type == "click":
+            x, y = self._to_point(action.get("x_pct"), action.get("y_pct"))
+            self._mouse("mouseMoved", x, y)
+            self._mouse("mousePressed", x, y)
+            self._mouse("mouseReleased", x, y)
+        elif action_type == "drag":
+            self._drag(action)
+        elif action_type == "mousedown":
+            x, y = self._to_point(action.get("x_pct"), action.get("y_pct"))
+            self._mouse("mouseMoved", x, y)
+            self._mouse("mousePressed", x, y)
+            self._mouse_down = True
+        elif action_type == "mousemove":
+            x, y = self._to_point(action.get("x_pct"), action.get("y_pct"))
+            self._mouse("mouseMoved", x, y)
+        elif action_type == "mouseup":
+            x, y = self._to_point(action.get("x_pct"), action.get("y_pct"))
+            self._mouse("mouseReleased", x, y)
+            self._mouse_down = False
+        elif action_type == "type":
+            text = action.get("text") or ""
+            if text:
+                self._get_session().send("Input.insertText", {"text": text})
+        elif action_type == "press":
+            key = action.get("key")
+            if key:
+                self._key(key)
+        elif action_type == "refresh":
+            self.page.reload(wait_until='domcontentloaded')
+        else:
+            print(f"忽略未知的远程操作: {action_type}")
+            return
+        enqueued_at = action.get("_enqueued_at")
+        if enqueued_at is not None:
+            self.stats.record(action_type, time.perf_counter() - enqueued_at)
+
+    def drain(self, max_actions: int = 50) -> int:
+        """取出当前排队的全部操作，合并后依次执行，返回执行数量"""
+        actions: List[Dict[str, Any]] = []
+        while len(actions) < max_actions:
+            try:
+                actions.append(shared.command_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not actions:
+            return 0
+        executed = 0
+        for action in coalesce_actions(actions):
+            if not isinstance(action, dict):
+                continue
+            try:
+                self.execute(action)
+                executed += 1
+            except Exception as e:
+                print(f"执行远程操作失败 ({action.get('type')}): {e}")
+        return executed
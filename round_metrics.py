@@ -0,0 +1,199 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# 站点任务的计时步骤 (按执行顺序)
+STEPS = (
+    "acquire",       # 连接浏览器、复用/创建页面
+    "navigate",      # 打开目标地址、刷新、跳转订单页
+    "login_check",   # 过期提示与登录状态判定
+    "auto_login",    # 自动填表登录
+    "intervention",  # 等待人工介入 (单独统计，避免拉高自动登录耗时)
+    "popups",        # 关闭弹窗
+    "count",         # 等待并提取待处理数量
+    "cookie_save",   # 保存 sessionStorage / Cookie
+    "release",       # 断开浏览器连接、停止 Playwright
+)
+
+# 分位数统计使用最近多少轮的数据
+DEFAULT_WINDOW = 20
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """已排序样本的百分位数 (线性插值)"""
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(k)
+    high = math.ceil(k)
+    if low == high:
+        return ordered[int(k)]
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class SiteTimer:
+    """分段计时：begin 结束上一步骤并开始新步骤，同一步骤多次出现时累加"""
+
+    def __init__(self, site_name: str, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.site_name = site_name
+        self._clock = clock
+        self.started_at = clock()
+        self.durations: Dict[str, float] = {}
+        self._step: Optional[str] = None
+        self._step_started = self.started_at
+        self.total = 0.0
+
+    def begin(self, step: Optional[str]) -> None:
+        now = self._clock()
+        if self._step is not None:
+            self.durations[self._step] = self.durations.get(self._step, 0.0) + now - self._step_started
+        self._step = step
+        self._step_started = now
+
+    def stop(self) -> None:
+        self.begin(None)
+        self.total = self._clock() - self.started_at
+
+
+class RoundMetrics:
+    """汇总每轮各站点、各步骤耗时，保留最近 window 轮用于 p50/p95，并输出 Prometheus 文本"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self._current: List[SiteTimer] = []
+        self._round_started = 0.0
+        # (站点, 步骤) -> 最近 window 轮的耗时；步骤 "total" 为站点任务总耗时
+        self._samples: Dict[tuple, Deque[float]] = {}
+        self._sums: Dict[tuple, float] = {}
+        self._counts: Dict[tuple, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._round_samples: Deque[float] = deque(maxlen=window)
+        self._round_sum = 0.0
+        self._round_count = 0
+        self.last_round: Optional[Dict[str, Any]] = None
+
+    def start_round(self) -> None:
+        with self._lock:
+            self._current = []
+            self._round_started = time.perf_counter()
+
+    def record_site(self, timer: SiteTimer) -> None:
+        """站点任务结束时调用 (任意线程)"""
+        with self._lock:
+            self._current.append(timer)
+
+    def _add_sample(self, key: tuple, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+        self._sums[key] = self._sums.get(key, 0.0) + seconds
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def finish_round(self, results: Optional[List[Dict[str, Any]]] = None,
+                     extra: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """结束本轮并返回摘要；results 用于统计失败站点，extra 为轮级别的额外耗时 (如全局 Cookie 保存)"""
+        # 没有站点名的失败结果无法归属到站点，不计入失败次数
+        failed = {r['name'] for r in (results or []) if isinstance(r, dict) and r.get('error') and r.get('name')}
+        with self._lock:
+            duration = time.perf_counter() - self._round_started
+            timers, self._current = self._current, []
+            for timer in timers:
+                for step, seconds in timer.durations.items():
+                    self._add_sample((timer.site_name, step), seconds)
+                self._add_sample((timer.site_name, "total"), timer.total)
+            for name in failed:
+                self._errors[name] = self._errors.get(name, 0) + 1
+            self._round_samples.append(duration)
+            self._round_sum += duration
+            self._round_count += 1
+
+            sites = {}
+            for timer in sorted(timers, key=lambda t: t.total, reverse=True):
+                window = sorted(self._samples.get((timer.site_name, "total"), ()))
+                sites[timer.site_name] = {
+                    "total": timer.total,
+                    "steps": dict(timer.durations),
+                    "p50": percentile(window, 50),
+                    "p95": percentile(window, 95),
+                    "error": timer.site_name in failed,
+                }
+            steps = {}
+            for step in STEPS:
+                values = sorted(t.durations[step] for t in timers if step in t.durations)
+                if values:
+                    steps[step] = {"p50": percentile(values, 50), "p95": percentile(values, 95),
+                                   "max": values[-1], "sites": len(values)}
+            self.last_round = {
+                "finished_at": time.time(),
+                "duration": duration,
+                "sites": sites,
+                "steps": steps,
+                "failed": len(failed),
+                "extra": dict(extra or {}),
+            }
+            return self.last_round
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# HELP monitor_site_step_seconds 站点任务各步骤耗时 (分位数基于最近若干轮)")
+            lines.append("# TYPE monitor_site_step_seconds summary")
+            for (site, step), samples in sorted(self._samples.items()):
+                labels = f'site="{_escape(site)}",step="{_escape(step)}"'
+                ordered = sorted(samples)
+                for q in (0.5, 0.95):
+                    lines.append(f'monitor_site_step_seconds{{{labels},quantile="{q}"}} {percentile(ordered, q * 100):.6f}')
+                lines.append(f"monitor_site_step_seconds_sum{{{labels}}} {self._sums[(site, step)]:.6f}")
+                lines.append(f"monitor_site_step_seconds_count{{{labels}}} {self._counts[(site, step)]}")
+
+            lines.append("# HELP monitor_round_seconds 每轮抓取总耗时")
+            lines.append("# TYPE monitor_round_seconds summary")
+            ordered = sorted(self._round_samples)
+            for q in (0.5, 0.95):
+                lines.append(f'monitor_round_seconds{{quantile="{q}"}} {percentile(ordered, q * 100):.6f}')
+            lines.append(f"monitor_round_seconds_sum {self._round_sum:.6f}")
+            lines.append(f"monitor_round_seconds_count {self._round_count}")
+
+            lines.append("# HELP monitor_site_errors_total 站点抓取失败次数")
+            lines.append("# TYPE monitor_site_errors_total counter")
+            for site, count in sorted(self._errors.items()):
+                lines.append(f'monitor_site_errors_total{{site="{_escape(site)}"}} {count}')
+
+            last = self.last_round
+            if last is not None:
+                lines.append("# HELP monitor_last_round_timestamp_seconds 最近一轮结束时间")
+                lines.append("# TYPE monitor_last_round_timestamp_seconds gauge")
+                lines.append(f"monitor_last_round_timestamp_seconds {last['finished_at']:.3f}")
+                lines.append("# HELP monitor_last_round_failed_sites 最近一轮失败站点数")
+                lines.append("# TYPE monitor_last_round_failed_sites gauge")
+                lines.append(f"monitor_last_round_failed_sites {last['failed']}")
+                if last["extra"]:
+                    lines.append("# HELP monitor_last_round_step_seconds 最近一轮的轮级别步骤耗时")
+                    lines.append("# TYPE monitor_last_round_step_seconds gauge")
+                    for step, seconds in sorted(last["extra"].items()):
+                        lines.append(f'monitor_last_round_step_seconds{{step="{_escape(step)}"}} {seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_round_summary(summary: Dict[str, Any], slowest: int = 10) -> List[str]:
+    """本轮耗时摘要：最慢的站点 (附最近若干轮 p50/p95) 与各步骤跨站点 p50/p95"""
+    lines = [f"=== 本轮耗时 {summary['duration']:.1f}s，站点 {len(summary['sites'])} 个，失败 {summary['failed']} 个 ==="]
+    for name, site in list(summary["sites"].items())[:slowest]:
+        top = sorted(site["steps"].items(), key=lambda item: item[1], reverse=True)[:3]
+        detail = ", ".join(f"{step} {seconds:.1f}s" for step, seconds in top)
+        flag = " [失败]" if site["error"] else ""
+        lines.append(f"  [{name}] {site['total']:.1f}s (p50 {site['p50']:.1f}s / p95 {site['p95']:.1f}s){flag} - {detail}")
+    for step, stats in summary["steps"].items():
+        lines.append(f"  步骤 {step}: p50 {stats['p50']:.2f}s / p95 {stats['p95']:.2f}s / 最大 {stats['max']:.2f}s ({stats['sites']} 站点)")
+    for step, seconds in summary["extra"].items():
+        lines.append(f"  {step}: {seconds:.2f}s")
+    return lines
+
+
+# 全局统计，供 web_server 暴露
+round_metrics = RoundMetrics()
@@ -0,0 +1,97 @@
+import base64
+
+import shared
+
+DEFAULT_QUALITY = 60
+DEFAULT_MAX_WIDTH = 1280
+DEFAULT_MAX_HEIGHT = 800
+
+
+def screencast_settings(config):
+    """从配置读取截屏编码参数，手机流量下可调低 quality / 尺寸"""
+    config = config if isinstance(config, dict) else {}
+
+    def _int(key, default, low, high):
+        try:
+            value = int(config.get(key, default))
+        except (TypeError, ValueError):
+            value = default
+        return max(low, min(high, value))
+
+    return {
+        "quality": _int('remote_screencast_quality', DEFAULT_QUALITY, 10, 100),
+        "max_width": _int('remote_screencast_max_width', DEFAULT_MAX_WIDTH, 320, 3840),
+        "max_height": _int('remote_screencast_max_height', DEFAULT_MAX_HEIGHT, 240, 2160),
+    }
+
+
+class ScreencastProducer:
+    """通过 CDP Page.startScreencast 持续获取介入页面的画面，写入 shared 的单帧缓冲区
+
+    Playwright 同步 API 绑定线程：必须在持有该页面的线程中 start/stop，
+    且该线程需要不断调用 Playwright 方法 (如 page.wait_for_timeout) 才能分发帧事件。
+    """
+
+    def __init__(self, page, quality=DEFAULT_QUALITY, max_width=DEFAULT_MAX_WIDTH, max_height=DEFAULT_MAX_HEIGHT):
+        self.page = page
+        self.quality = quality
+        self.max_width = max_width
+        self.max_height = max_height
+        self.session = None
+        self.frame_count = 0
+        self._last_data = None
+
+    def start(self):
+        if self.session is not None:
+            return
+        session = self.page.context.new_cdp_session(self.page)
+        session.on("Page.screencastFrame", self._on_frame)
+        session.send("Page.startScreencast", {
+            "format": "jpeg",
+            "quality": self.quality,
+            "maxWidth": self.max_width,
+            "maxHeight": self.max_height,
+            "everyNthFrame": 1
+        })
+        self.session = session
+
+    def _on_frame(self, params):
+        session = self.session
+        # 先确认帧，浏览器收到 ack 后才会继续推送下一帧
+        try:
+            if session is not None:
+                session.send("Page.screencastFrameAck", {"sessionId": params.get("sessionId")})
+        except Exception:
+            pass
+        try:
+            data = base64.b64decode(params.get("data") or "")
+        except Exception:
+            return
+        # 与上一帧字节完全相同 (如光标闪烁恢复原状) 时不再推送
+        if not data or data == self._last_data:
+            return
+        self._last_data = data
+        self.frame_count += 1
+        shared.set_screenshot(data, params.get("metadata") or {})
+
+    def stop(self):
+        session, self.session = self.session, None
+        if session is None:
+            return
+        try:
+            session.send("Page.stopScreencast")
+        except Exception:
+            pass
+        try:
+            session.detach()
+        except Exception:
+            pass
+
+    def retarget(self, page):
+        """介入期间页面被替换 (如登录后跳转到新标签页) 时切换截屏目标"""
+        if page is None or page is self.page:
+            return
+        self.stop()
+        self.page = page
+        self._last_data = None
+        self.start()
@@ -1,25 +1,40 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import text
-from collections import defaultdict, deque
-from typing import Any, DefaultDict, Deque, Dict, Tuple
+from sqlalchemy import text, bindparam, or_, func, select
+from typing import Any, Dict, Tuple
 import logging
 import os
 import sys
 import uuid
 import time
 import hmac
+import hashlib
 import secrets
 import json
 import base64
+import csv
+import io
+import threading
+from collections import OrderedDict, defaultdict
 from functools import wraps
 from dotenv import load_dotenv
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives import serialization
 from cryptography.exceptions import InvalidSignature
 
+try:
+    from limit_store import create_limit_store
+    from presence import HeartbeatRecorder
+    from audit_log import AuditWriter
+    from background import PeriodicTask
+except ImportError:
+    from server.limit_store import create_limit_store
+    from server.presence import HeartbeatRecorder
+    from server.audit_log import AuditWriter
+    from server.background import PeriodicTask
+
 # 加载 .env 文件中的环境变量
 load_dotenv(override=True)
 
@@ -83,6 +98,18 @@ ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
 LICENSE_PRIVATE_KEY = os.environ.get('LICENSE_PRIVATE_KEY')
 LICENSE_PUBLIC_KEY = os.environ.get('LICENSE_PUBLIC_KEY')
 ALLOW_DEVICE_KEY_RESET = os.environ.get('ALLOW_DEVICE_KEY_RESET', 'true').lower() in ('1', 'true', 'yes')
+DEVICE_KEY_CACHE_SIZE = int(os.environ.get('DEVICE_KEY_CACHE_SIZE', 4096))
+# 心跳批量落库间隔 (秒)，0 表示每次心跳立即写库
+HEARTBEAT_FLUSH_SECONDS = float(os.environ.get('HEARTBEAT_FLUSH_SECONDS', 5))
+# 后台清理掉线设备的间隔 (秒)，0 表示不清理
+STALE_DEVICE_SWEEP_SECONDS = float(os.environ.get('STALE_DEVICE_SWEEP_SECONDS', 60))
+# 审计日志批量写库间隔 (秒，0 表示同步写入) 与明细保留天数 (之前的明细压缩为按小时汇总)
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 2))
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 30))
+DASHBOARD_PAGE_SIZE = 50
+ADMIN_API_PAGE_SIZE = 100
+ADMIN_API_MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
 
 if not app.secret_key:
     raise ValueError("严重错误：未设置 SECRET_KEY 环境变量。请设置该环境变量以配置会话密钥。")
@@ -112,17 +139,16 @@ class License(db.Model):
     revoked = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
     remark = db.Column(db.String(255))
+    __table_args__ = (
+        db.Index('idx_license_created_at', 'created_at'),
+    )
     # 关联设备
     devices = db.relationship('Device', backref='license', lazy=True)
 
     @property
     def active_devices_count(self):
         # 统计有效心跳设备 (10分钟内)
-        threshold = datetime.now() - timedelta(minutes=10)
-        return Device.query.filter(
-            Device.license_code == self.code,
-            Device.last_heartbeat >= threshold
-        ).count()
+        return count_online_devices(self.code)
 
 
 class KeyStore(db.Model):
@@ -144,7 +170,11 @@ class Device(db.Model):
     ip_address = db.Column(db.String(64))
     public_key = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.now)
-    __table_args__ = (db.UniqueConstraint('license_code', 'machine_id', name='uniq_license_machine'),)
+    __table_args__ = (
+        db.UniqueConstraint('license_code', 'machine_id', name='uniq_license_machine'),
+        db.Index('idx_device_license_heartbeat', 'license_code', 'last_heartbeat'),
+        db.Index('idx_device_last_heartbeat', 'last_heartbeat'),
+    )
 
 
 class ApiAudit(db.Model):
@@ -156,6 +186,18 @@ class ApiAudit(db.Model):
     machine_id = db.Column(db.String(128))
     ok = db.Column(db.Boolean, default=False)
     reason = db.Column(db.String(255))
+    __table_args__ = (db.Index('idx_api_audit_created_at', 'created_at'),)
+
+
+class ApiAuditHourly(db.Model):
+    # 超过保留期的审计明细按小时汇总 (license_code 为空的请求记为 '')
+    id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, nullable=False)
+    endpoint = db.Column(db.String(64), nullable=False)
+    license_code = db.Column(db.String(64), nullable=False, default='')
+    ok = db.Column(db.Boolean, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.UniqueConstraint('hour', 'endpoint', 'license_code', 'ok', name='uniq_api_audit_hourly'),)
 
 
 class ConfigToken(db.Model):
@@ -179,8 +221,8 @@ def login_required(f):
     return decorated_function
 
 
-rate_limit_store: DefaultDict[Tuple[str, str], Deque[float]] = defaultdict(deque)
-nonce_store: Dict[str, int] = {}
+# 限流计数与请求 nonce；多 worker 部署时设置 LIMIT_STORE_URL 指向共享存储
+limit_store = create_limit_store(os.environ.get('LIMIT_STORE_URL'))
 config_token_store: Dict[Tuple[str, str], Tuple[str, int]] = {}
 _license_private_key = None
 _license_public_key = None
@@ -194,14 +236,7 @@ def get_client_ip():
 
 
 def is_rate_limited(ip, bucket, limit, window_seconds):
-    dq = rate_limit_store[(ip, bucket)]
-    now = time.time()
-    while dq and now - dq[0] > window_seconds:
-        dq.popleft()
-    if len(dq) >= limit:
-        return True
-    dq.append(now)
-    return False
+    return limit_store.hit(f"{ip}|{bucket}", limit, window_seconds)
 
 
 def ensure_csrf_token():
@@ -326,6 +361,53 @@ def sign_config_payload(payload):
     return base64.b64encode(signature).decode()
 
 
+class PublicKeyCache:
+    """已解析的设备公钥 LRU 缓存，按 PEM 的 SHA-256 索引 (每个 worker 进程各一份)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(public_key_pem):
+        return hashlib.sha256(public_key_pem.encode()).digest()
+
+    def get(self, public_key_pem):
+        digest = self._digest(public_key_pem)
+        with self._lock:
+            public_key = self._keys.get(digest)
+            if public_key is not None:
+                self._keys.move_to_end(digest)
+                self.hits += 1
+                return public_key
+            self.misses += 1
+        # 解析失败直接抛出，不缓存无效公钥
+        public_key = serialization.load_pem_public_key(public_key_pem.encode())
+        if self.maxsize > 0:
+            with self._lock:
+                self._keys[digest] = public_key
+                self._keys.move_to_end(digest)
+                while len(self._keys) > self.maxsize:
+                    self._keys.popitem(last=False)
+        return public_key
+
+    def discard(self, public_key_pem):
+        if not public_key_pem:
+            return
+        with self._lock:
+            self._keys.pop(self._digest(public_key_pem), None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+device_key_cache = PublicKeyCache(DEVICE_KEY_CACHE_SIZE)
+
+
 def verify_device_signature(public_key_pem):
     signature_b64 = request.headers.get('X-Device-Signature')
     if not signature_b64:
@@ -338,7 +420,7 @@ def verify_device_signature(public_key_pem):
         return False, "invalid"
     body = request.get_data() or b""
     try:
-        public_key = serialization.load_pem_public_key(public_key_pem.encode())
+        public_key = device_key_cache.get(public_key_pem)
     except Exception as e:
         app.logger.warning(f"Signature verification failed: Invalid public key format. Error: {e}")
         return False, "invalid"
@@ -362,29 +444,120 @@ def verify_request_nonce(data):
     now = int(time.time())
     if abs(now - ts) > 300:
         return False, "expired"
-    for key, value in list(nonce_store.items()):
-        if now - value > 600:
-            del nonce_store[key]
-    if nonce in nonce_store:
+    if not limit_store.add_nonce(str(nonce), 600):
         return False, "replay"
-    nonce_store[nonce] = now
     return True, ""
 
 
-def cleanup_stale_devices(license_code):
-    """清理指定授权码下超过 10 分钟未心跳的设备"""
+def _write_heartbeats(batch):
+    """批量写入心跳时间，只前移不回退"""
+    statement = Device.__table__.update().where(
+        Device.id == bindparam('device_id'),
+        or_(Device.last_heartbeat.is_(None), Device.last_heartbeat < bindparam('heartbeat_at'))
+    ).values(last_heartbeat=bindparam('heartbeat_at'))
+    with app.app_context():
+        try:
+            db.session.execute(statement, [{'device_id': device_id, 'heartbeat_at': ts} for device_id, ts in batch])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+heartbeat_recorder = HeartbeatRecorder(_write_heartbeats, HEARTBEAT_FLUSH_SECONDS)
+
+
+def record_heartbeat(device):
+    heartbeat_recorder.record(device.id, device.license_code)
+
+
+def device_last_heartbeat(device):
+    """优先取内存中尚未落库的心跳时间"""
+    return heartbeat_recorder.last_seen(device.id) or device.last_heartbeat
+
+
+def count_online_devices(license_code=None):
+    if license_code is not None:
+        return online_device_counts([license_code]).get(license_code, 0)
     threshold = datetime.now() - timedelta(minutes=10)
-    # 查找该授权码下所有超时的设备
-    stale_devices = Device.query.filter(
-        Device.license_code == license_code,
-        Device.last_heartbeat < threshold
-    ).all()
+    count = Device.query.filter(Device.last_heartbeat >= threshold).count()
+    # 内存中已有新心跳、数据库里仍显示离线的设备
+    pending = [device_id for device_id, ts in heartbeat_recorder.pending().items() if ts >= threshold]
+    if pending:
+        count += Device.query.filter(
+            Device.id.in_(pending),
+            or_(Device.last_heartbeat.is_(None), Device.last_heartbeat < threshold)
+        ).count()
+    return count
 
-    for device in stale_devices:
-        db.session.delete(device)
 
-    if stale_devices:
-        db.session.commit()
+def online_device_counts(license_codes):
+    """一次分组查询得到多个授权码的在线设备数 {license_code: count}"""
+    codes = list(license_codes)
+    if not codes:
+        return {}
+    threshold = datetime.now() - timedelta(minutes=10)
+    rows = db.session.query(Device.license_code, func.count(Device.id)).filter(
+        Device.license_code.in_(codes),
+        Device.last_heartbeat >= threshold
+    ).group_by(Device.license_code).all()
+    counts = {code: count for code, count in rows}
+    code_set = set(codes)
+    pending = [device_id for device_id, ts in heartbeat_recorder.pending().items() if ts >= threshold]
+    if pending:
+        rows = db.session.query(Device.license_code, func.count(Device.id)).filter(
+            Device.id.in_(pending),
+            or_(Device.last_heartbeat.is_(None), Device.last_heartbeat < threshold)
+        ).group_by(Device.license_code).all()
+        for code, count in rows:
+            if code in code_set:
+                counts[code] = counts.get(code, 0) + count
+    return counts
+
+
+def sweep_stale_devices(batch_size=1000):
+    """批量删除超过 10 分钟未心跳的设备，返回删除数量 (后台周期执行)
+
+    其他 worker 缓冲中的心跳最多晚两个刷新周期 (一个周期加一次写入) 落库，因此只删除
+    超出在线窗口再加这段宽限期的设备，避免刚在其他 worker 心跳过的设备被误删。
+    """
+    threshold = datetime.now() - timedelta(minutes=10, seconds=HEARTBEAT_FLUSH_SECONDS * 2)
+    table = Device.__table__
+    # 本进程内存中有尚未落库的新心跳的设备仍然在线 (包括刷新失败待重试的)
+    fresh = [device_id for device_id, ts in heartbeat_recorder.pending().items() if ts >= threshold]
+    total = 0
+    with app.app_context():
+        while True:
+            ids = select(table.c.id).where(table.c.last_heartbeat < threshold)
+            if fresh:
+                ids = ids.where(table.c.id.notin_(fresh))
+            # 分批删除，每个写事务都很短，不长时间占用 SQLite 写锁；
+            # 删除条件中再次判断心跳时间，选出后被其他 worker 更新的行不会被删除
+            statement = table.delete().where(
+                table.c.id.in_(ids.limit(batch_size).scalar_subquery()),
+                table.c.last_heartbeat < threshold
+            )
+            try:
+                deleted = db.session.execute(statement).rowcount
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            total += deleted
+            if deleted < batch_size:
+                break
+    if total:
+        logger.info(f"Swept {total} stale devices")
+    return total
+
+
+stale_device_sweeper = PeriodicTask('stale-device-sweeper', sweep_stale_devices, STALE_DEVICE_SWEEP_SECONDS)
+
+
+@app.before_request
+def _start_background_tasks():
+    # gunicorn worker 在收到第一个请求时启动本进程的清理线程
+    stale_device_sweeper.ensure_started()
 
 
 def ensure_device_unique_index():
@@ -395,6 +568,51 @@ def ensure_device_unique_index():
         conn.execute(text(sql))
 
 
+def ensure_api_audit_index():
+    table_name = ApiAudit.__table__.name
+    sql = f'CREATE INDEX IF NOT EXISTS idx_api_audit_created_at ON {table_name} (created_at)'
+    with db.engine.begin() as conn:
+        conn.execute(text(sql))
+
+
+def ensure_dashboard_indexes():
+    # 旧数据库的表已存在，create_all 不会补建索引 (需在补齐 remark 列之后执行)
+    statements = [
+        f'CREATE INDEX IF NOT EXISTS idx_license_created_at ON {License.__table__.name} (created_at)',
+        # 搜索改为子串匹配后备注索引不再被使用，只增加写入开销
+        'DROP INDEX IF EXISTS idx_license_remark',
+        f'CREATE INDEX IF NOT EXISTS idx_device_license_heartbeat ON {Device.__table__.name} (license_code, last_heartbeat)',
+        # 掉线清理与全平台在线数只按心跳时间过滤，走范围扫描而不是扫描整个索引
+        f'CREATE INDEX IF NOT EXISTS idx_device_last_heartbeat ON {Device.__table__.name} (last_heartbeat)',
+    ]
+    with db.engine.begin() as conn:
+        for sql in statements:
+            conn.execute(text(sql))
+    ensure_license_search_indexes()
+
+
+def ensure_license_search_indexes():
+    """备注/授权码子串搜索 (ILIKE '%...%') 的索引
+
+    PostgreSQL 用 pg_trgm 三元组 GIN 索引支撑子串匹配；SQLite 没有可用于前缀通配
+    LIKE 的索引，子串搜索只能扫描整表。
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    table_name = License.__table__.name
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for column in ('remark', 'code'):
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS idx_license_{column}_trgm '
+                    f'ON {table_name} USING gin ({column} gin_trgm_ops)'
+                ))
+    except Exception as e:
+        # 数据库账号无权安装扩展时搜索仍可用，只是退化为全表扫描
+        logger.warning(f"Failed to create license search indexes: {e}")
+
+
 def ensure_device_public_key_column():
     dialect = db.engine.dialect.name
     table_name = Device.__table__.name
@@ -532,6 +750,7 @@ def _sync_device_public_key(device, device_public_key):
     if device.public_key and device.public_key != device_public_key:
         if not ALLOW_DEVICE_KEY_RESET:
             return False
+        device_key_cache.discard(device.public_key)
         device.public_key = device_public_key
     if not device.public_key:
         device.public_key = device_public_key
@@ -558,18 +777,84 @@ def _config_error(message, status_code):
 
 def _audit_request(endpoint, code, machine_id, ok, reason):
     try:
-        record = ApiAudit(
-            ip_address=get_client_ip(),
-            endpoint=endpoint,
-            license_code=code,
-            machine_id=machine_id,
-            ok=ok,
-            reason=reason
-        )
-        db.session.add(record)
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
+        audit_writer.submit({
+            'created_at': datetime.now(),
+            'ip_address': get_client_ip(),
+            'endpoint': endpoint,
+            'license_code': code,
+            'machine_id': machine_id,
+            'ok': ok,
+            'reason': reason
+        })
+    except Exception as e:
+        app.logger.warning(f"Audit record failed: {e}")
+
+
+def _write_audit_events(batch):
+    with app.app_context():
+        try:
+            db.session.execute(ApiAudit.__table__.insert(), batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _audit_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_audit_rollup(hour, endpoint, code, ok, count):
+    table = ApiAuditHourly.__table__
+    result = db.session.execute(table.update().where(
+        table.c.hour == hour,
+        table.c.endpoint == endpoint,
+        table.c.license_code == code,
+        table.c.ok == ok
+    ).values(count=table.c.count + count))
+    if not result.rowcount:
+        db.session.execute(table.insert().values(hour=hour, endpoint=endpoint, license_code=code, ok=ok, count=count))
+
+
+def compact_audit_logs(retention_days=None, batch_size=5000):
+    """把保留期之前的审计明细压缩为按小时汇总并删除明细，返回压缩的明细条数
+
+    每批用 DELETE ... RETURNING 取走明细，删除与累加汇总在同一事务内，
+    多个 worker 同时执行也不会重复计数。
+    """
+    days = AUDIT_RETENTION_DAYS if retention_days is None else retention_days
+    # 截止时间对齐到整点，同一小时的明细一次压缩完
+    cutoff = _audit_hour(datetime.now() - timedelta(days=days))
+    table = ApiAudit.__table__
+    total = 0
+    conflicts = 0
+    with app.app_context():
+        while True:
+            ids = select(table.c.id).where(table.c.created_at < cutoff).order_by(table.c.id).limit(batch_size)
+            statement = table.delete().where(table.c.id.in_(ids.scalar_subquery())).returning(
+                table.c.created_at, table.c.endpoint, table.c.license_code, table.c.ok
+            )
+            try:
+                rows = db.session.execute(statement).all()
+                if not rows:
+                    db.session.rollback()
+                    return total
+                counts = defaultdict(int)
+                for created_at, endpoint, code, ok in rows:
+                    counts[(_audit_hour(created_at), endpoint or '', code or '', bool(ok))] += 1
+                for (hour, endpoint, code, ok), count in counts.items():
+                    _add_audit_rollup(hour, endpoint, code, ok, count)
+                db.session.commit()
+                total += len(rows)
+            except IntegrityError:
+                # 其他 worker 同时新建了同一汇总行：回滚本批 (明细恢复) 后重试
+                db.session.rollback()
+                conflicts += 1
+                if conflicts > 3:
+                    raise
+
+
+audit_writer = AuditWriter(_write_audit_events, AUDIT_FLUSH_SECONDS, compactor=compact_audit_logs)
 
 
 def _issue_config_token(code, machine_id):
@@ -727,7 +1012,8 @@ def _get_or_create_device(code, machine_id, device_public_key, max_devices):
     if device:
         error = _activate_device(device, device_public_key)
         return (device, None) if not error else (None, error)
-    current_count = Device.query.filter_by(license_code=code).count()
+    # 掉线设备由后台定期清理，这里只按 (license_code, last_heartbeat) 索引统计在线设备
+    current_count = count_online_devices(code)
     if current_count >= max_devices:
         message = f"设备数量已达上限 ({current_count}/{max_devices})，请在其他设备退出后重试"
         return None, _activation_error(message, 403)
@@ -835,19 +1121,35 @@ def _load_help_content():
     return store.value
 
 
+def _license_search_query(keyword):
+    """按备注或授权码搜索：不区分大小写的子串匹配 (% 与 _ 按字面匹配)
+
+    PostgreSQL 下由 ensure_license_search_indexes 建立的三元组索引支撑。
+    """
+    query = License.query
+    if not keyword:
+        return query
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f'%{escaped}%'
+    return query.filter(or_(License.remark.ilike(pattern, escape='\\'), License.code.ilike(pattern, escape='\\')))
+
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     remark_filter = (request.args.get('remark') or '').strip()
-    query = License.query
-    if remark_filter:
-        query = query.filter(License.remark.ilike(f'%{remark_filter}%'))
-    licenses = query.order_by(License.created_at.desc()).all()
-    total_licenses = len(licenses)
+    query = _license_search_query(remark_filter)
+    # 直接 COUNT 主键，不再包一层 SELECT * 子查询
+    total_licenses = query.with_entities(func.count(License.code)).scalar() or 0
+    per_page = min(max(parse_int(request.args.get('per_page'), DASHBOARD_PAGE_SIZE), 1), 500)
+    pages = max(1, (total_licenses + per_page - 1) // per_page)
+    page = min(max(parse_int(request.args.get('page'), 1), 1), pages)
+    licenses = query.order_by(License.created_at.desc(), License.code).offset((page - 1) * per_page).limit(per_page).all()
+    # 当前页各授权码的在线设备数 (一次分组查询，不再逐个 COUNT)
+    online_counts = online_device_counts(lic.code for lic in licenses)
 
     # 计算全平台在线设备总数
-    threshold = datetime.now() - timedelta(minutes=10)
-    total_devices = Device.query.filter(Device.last_heartbeat >= threshold).count()
+    total_devices = count_online_devices()
 
     # 加载通用配置 (用于前端显示)
     common_config = _load_common_config()
@@ -859,6 +1161,10 @@ def dashboard():
     return render_template(
         'dashboard.html',
         licenses=licenses,
+        online_counts=online_counts,
+        page=page,
+        pages=pages,
+        per_page=per_page,
         total_licenses=total_licenses,
         total_devices=total_devices,
         now=datetime.now(),
@@ -1030,20 +1336,8 @@ def delete_license(code):
 @app.route('/dashboard/export', methods=['GET'])
 @login_required
 def export_licenses():
-    licenses = License.query.order_by(License.created_at.desc()).all()
-    payload = []
-    for item in licenses:
-        payload.append({
-            "code": item.code,
-            "max_devices": item.max_devices,
-            "expire_date": item.expire_date.isoformat(),
-            "created_at": item.created_at.isoformat(),
-            "remark": item.remark or "",
-            "revoked": bool(item.revoked)
-        })
-    response = jsonify(payload)
-    response.headers['Content-Disposition'] = 'attachment; filename=licenses.json'
-    return response
+    # 与导入格式一致的 JSON 数组，分批查询、边查边输出
+    return _stream_license_export('json', {})
 
 
 @app.route('/dashboard/import', methods=['POST'])
@@ -1088,11 +1382,12 @@ def get_license_devices(code):
     threshold = datetime.now() - timedelta(minutes=10)
 
     for d in devices:
-        is_online = d.last_heartbeat >= threshold
+        last_heartbeat = device_last_heartbeat(d)
+        is_online = last_heartbeat >= threshold
         device_list.append({
             'machine_id': d.machine_id,
             'ip_address': d.ip_address or '未知',
-            'last_heartbeat': d.last_heartbeat.strftime('%Y-%m-%d %H:%M:%S'),
+            'last_heartbeat': last_heartbeat.strftime('%Y-%m-%d %H:%M:%S'),
             'created_at': d.created_at.strftime('%Y-%m-%d %H:%M:%S') if d.created_at else '未知',
             'is_online': is_online
         })
@@ -1134,9 +1429,6 @@ def activate():
     license_obj, error = _get_valid_license(code)
     if error:
         return error
-    # 清理僵尸设备
-    cleanup_stale_devices(code)
-
     device, error = _get_or_create_device(
         code,
         machine_id,
@@ -1190,8 +1482,7 @@ def heartbeat():
         app.logger.warning(f"Heartbeat failed: License '{code}' expired.")
         return jsonify({"status": "error", "message": "授权已过期"}), 403
 
-    device.last_heartbeat = datetime.now()
-    db.session.commit()
+    record_heartbeat(device)
 
     return jsonify({"status": "success"})
 
@@ -1210,8 +1501,7 @@ def fetch_config():
         _audit_request('config_fetch', data.get('code'), data.get('machine_id'), False, message)
         return _config_error(message, status_code)
     code, device = validated
-    device.last_heartbeat = datetime.now()
-    db.session.commit()
+    record_heartbeat(device)
     common_config = _load_common_config()
     user_config = _load_license_config(code)
     help_content = _load_help_content()
@@ -1260,8 +1550,7 @@ def save_config():
     if not config_token or not _verify_config_token(code, device.machine_id, config_token):
         _audit_request('config_save', code, device.machine_id, False, "令牌无效")
         return _config_error("令牌无效", 401)
-    device.last_heartbeat = datetime.now()
-    db.session.commit()
+    record_heartbeat(device)
     _save_license_config(code, config)
     token, token_expire = _issue_config_token(code, device.machine_id)
     _audit_request('config_save', code, device.machine_id, True, "")
@@ -1270,7 +1559,11 @@ def save_config():
 
 @app.route('/api/public-key', methods=['GET'])
 def public_key():
-    return jsonify({"public_key": get_license_public_key_pem()})
+    pem = get_license_public_key_pem()
+    response = jsonify({"public_key": pem})
+    # 客户端携带 If-None-Match 重新校验，公钥未变时返回 304
+    response.set_etag(hashlib.sha256(pem.encode()).hexdigest())
+    return response.make_conditional(request)
 
 # 保留 API 方式生成授权码（方便脚本调用）
 
@@ -1313,15 +1606,216 @@ def generate_license_api():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+# --- 管理接口 (JSON / 导出) ---
+
+LICENSE_EXPORT_FIELDS = ["code", "max_devices", "expire_date", "created_at", "remark", "revoked"]
+
+
+def license_to_dict(item):
+    return {
+        "code": item.code,
+        "max_devices": item.max_devices,
+        "expire_date": item.expire_date.isoformat(),
+        "created_at": item.created_at.isoformat() if item.created_at else "",
+        "remark": item.remark or "",
+        "revoked": bool(item.revoked)
+    }
+
+
+def license_status(item, now=None):
+    if item.revoked:
+        return "revoked"
+    return "expired" if item.expire_date < (now or datetime.now()) else "active"
+
+
+def parse_license_filters(args):
+    """解析筛选参数 status / remark / expiring_before，返回 (filters, error)"""
+    filters = {}
+    status = (args.get('status') or '').strip()
+    if status:
+        if status not in ('active', 'expired', 'revoked'):
+            return None, "status 只能是 active / expired / revoked"
+        filters['status'] = status
+    remark = (args.get('remark') or '').strip()
+    if remark:
+        filters['remark'] = remark
+    expiring_before = (args.get('expiring_before') or '').strip()
+    if expiring_before:
+        try:
+            filters['expiring_before'] = datetime.fromisoformat(expiring_before)
+        except ValueError:
+            return None, "expiring_before 格式应为 YYYY-MM-DD"
+    return filters, None
+
+
+def _filtered_license_query(filters):
+    query = _license_search_query(filters.get('remark'))
+    status = filters.get('status')
+    now = datetime.now()
+    not_revoked = or_(License.revoked.is_(False), License.revoked.is_(None))
+    if status == 'revoked':
+        query = query.filter(License.revoked.is_(True))
+    elif status == 'active':
+        query = query.filter(not_revoked, License.expire_date >= now)
+    elif status == 'expired':
+        query = query.filter(not_revoked, License.expire_date < now)
+    if filters.get('expiring_before'):
+        query = query.filter(License.expire_date < filters['expiring_before'])
+    return query
+
+
+def license_page(filters, after=None, limit=ADMIN_API_PAGE_SIZE):
+    """按授权码排序的键集分页：返回 code > after 的前 limit 条"""
+    query = _filtered_license_query(filters)
+    if after:
+        query = query.filter(License.code > after)
+    return query.order_by(License.code).limit(limit).all()
+
+
+def iter_licenses(filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """逐批遍历授权码 (键集分页)，内存占用与总数无关"""
+    after = None
+    while True:
+        batch = license_page(filters or {}, after, batch_size)
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        after = batch[-1].code
+
+
+def _encode_cursor(code):
+    return base64.urlsafe_b64encode(code.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """解析分页游标，格式不合法或解出空值时抛出 ValueError"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    code = base64.b64decode(padded.encode(), altchars=b'-_', validate=True).decode()
+    if not code:
+        raise ValueError('empty cursor')
+    return code
+
+
+def iter_license_export(fmt, filters=None):
+    """逐行生成导出内容: ndjson / csv / json (数组)"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(LICENSE_EXPORT_FIELDS)
+        for item in iter_licenses(filters):
+            row = license_to_dict(item)
+            writer.writerow([row[field] for field in LICENSE_EXPORT_FIELDS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for item in iter_licenses(filters):
+            yield json.dumps(license_to_dict(item), ensure_ascii=False) + "\n"
+    else:
+        yield "["
+        separator = ""
+        for item in iter_licenses(filters):
+            yield separator + json.dumps(license_to_dict(item), ensure_ascii=False)
+            separator = ","
+        yield "]"
+
+
+EXPORT_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _chunked(lines, size=EXPORT_BATCH_SIZE):
+    # 按批合并成较大的块输出，避免每行一个 HTTP chunk
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def _stream_license_export(fmt, filters):
+    response = Response(stream_with_context(_chunked(iter_license_export(fmt, filters))),
+                        mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=licenses.{fmt}'
+    return response
+
+
+def admin_api_required(f):
+    """管理接口：X-Admin-Api-Key 或已登录的后台会话"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if is_rate_limited(get_client_ip(), 'admin_api', 600, 300):
+            return jsonify({"status": "error", "message": "Too Many Requests"}), 429
+        api_key = request.headers.get('X-Admin-Api-Key') or ''
+        if not session.get('logged_in') and not (ADMIN_API_KEY and hmac.compare_digest(api_key, ADMIN_API_KEY)):
+            return jsonify({"status": "error", "message": "Unauthorized"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@app.route('/admin/api/licenses', methods=['GET'])
+@admin_api_required
+def list_licenses_api():
+    filters, error = parse_license_filters(request.args)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    limit = min(max(parse_int(request.args.get('limit'), ADMIN_API_PAGE_SIZE), 1), ADMIN_API_MAX_PAGE_SIZE)
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"status": "error", "message": "cursor 无效"}), 400
+    # 多取一条判断是否还有下一页
+    licenses = license_page(filters, after, limit + 1)
+    has_more = len(licenses) > limit
+    licenses = licenses[:limit]
+    online_counts = online_device_counts(item.code for item in licenses)
+    now = datetime.now()
+    items = []
+    for item in licenses:
+        row = license_to_dict(item)
+        row["status"] = license_status(item, now)
+        row["online_devices"] = online_counts.get(item.code, 0)
+        items.append(row)
+    return jsonify({
+        "status": "success",
+        "items": items,
+        "next_cursor": _encode_cursor(licenses[-1].code) if has_more else None
+    })
+
+
+@app.route('/admin/api/licenses/export', methods=['GET'])
+@admin_api_required
+def export_licenses_api():
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"status": "error", "message": "format 只能是 ndjson / csv / json"}), 400
+    filters, error = parse_license_filters(request.args)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    return _stream_license_export(fmt, filters)
+
+
 # 初始化数据库
 with app.app_context():
     try:
         db.create_all()
         ensure_device_unique_index()
+        ensure_api_audit_index()
         ensure_device_public_key_column()
         ensure_device_created_at_column()
         ensure_license_remark_column()
         ensure_license_revoked_column()
+        ensure_dashboard_indexes()
 
         # 检查是否有授权数据
         license_count = License.query.count()
@@ -0,0 +1,92 @@
+"""接口审计日志的异步批量写入
+
+请求线程只把审计事件放入内存队列，后台线程按批次一次性插入数据库，请求不再等待
+审计提交。队列满时丢弃新事件并计数 (审计不能拖垮接口)。
+
+同一后台线程按 compact_interval 周期调用 compactor，把超过保留期的明细压缩为
+按小时、接口、授权码汇总的统计行。
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from background import PeriodicTask
+except ImportError:
+    from server.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], None], interval: float = 2.0,
+                 batch_size: int = 500, max_queue: int = 10000,
+                 compactor: Optional[Callable[[], Any]] = None, compact_interval: float = 3600) -> None:
+        """writer 接收一批审计事件 (dict)，负责一次性批量插入"""
+        self.writer = writer
+        self.interval = interval
+        self.batch_size = batch_size
+        self.compactor = compactor
+        self.compact_interval = compact_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task = PeriodicTask("audit-writer", self._tick, interval)
+        self._next_compact = time.time() + min(60.0, compact_interval)
+        atexit.register(self.stop)
+
+    def submit(self, event: Dict[str, Any]) -> None:
+        if self.interval <= 0:
+            self.writer([event])
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped % 1000 == 1:
+                logger.warning(f"Audit queue full, {dropped} events dropped so far")
+            return
+        self._task.ensure_started()
+
+    def flush(self) -> int:
+        """写出队列中当前全部事件，返回写入条数"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch: List[Dict[str, Any]] = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    self.writer(batch)
+                    written += len(batch)
+                except Exception as e:
+                    # 审计写入失败只记录日志，不重试，避免数据库故障时队列无限堆积
+                    logger.error(f"Audit flush failed, {len(batch)} events lost: {e}")
+
+    def _maybe_compact(self) -> None:
+        if self.compactor is None or time.time() < self._next_compact:
+            return
+        self._next_compact = time.time() + self.compact_interval
+        try:
+            self.compactor()
+        except Exception as e:
+            logger.error(f"Audit compaction failed: {e}")
+
+    def _tick(self) -> None:
+        self.flush()
+        self._maybe_compact()
+
+    def stop(self) -> None:
+        self._task.stop()
+        self.flush()
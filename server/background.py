@@ -0,0 +1,48 @@
+"""按进程启动的后台周期任务
+
+心跳合并写入、审计批量写入、掉线设备清理共用同一套线程管理：首次使用时在当前进程
+启动守护线程，每隔 interval 秒执行一次。fork 出的子进程不继承父进程的线程，
+因此按 PID 判断本进程的线程是否已启动。
+"""
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(self, name: str, func: Callable[[], object], interval: float) -> None:
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def ensure_started(self) -> None:
+        """interval <= 0 表示不启动后台线程 (由调用方同步执行)"""
+        if self.interval <= 0 or self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"Periodic task {self.name} failed: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,200 @@
+"""接口限流计数与请求 nonce 的存储
+
+两种后端，接口相同:
+  MemoryLimitStore  进程内 (单进程部署/开发环境)
+  SqliteLimitStore  同机多进程共享 (gunicorn 多 worker)，限流与防重放跨 worker 生效
+
+过期采用时间分桶：每条记录按过期时间挂到一个时间桶上，只在跨过桶边界时整桶清理，
+每条记录只被清理一次，单次请求的均摊开销为 O(1)，不再每次遍历全部 nonce。
+
+通过环境变量 LIMIT_STORE_URL 选择后端:
+  (未设置) / memory://          进程内
+  sqlite:////data/limits.db     SQLite 文件 (所有 worker 必须指向同一文件)
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, DefaultDict, Dict, Iterable, List, Tuple
+
+# 过期时间桶的宽度 (秒)
+EXPIRY_BUCKET_SECONDS = 10
+# 限流窗口划分的子桶数：窗口内计数为最近 RATE_BUCKETS 个子桶之和
+RATE_BUCKETS = 10
+
+
+def _rate_slots(window_seconds: int, now: float) -> Tuple[int, int, int]:
+    """返回 (子桶宽度, 当前子桶, 窗口内最早的子桶)"""
+    width = max(1, int(window_seconds) // RATE_BUCKETS)
+    slot = int(now) // width
+    return width, slot, slot - (int(window_seconds) + width - 1) // width + 1
+
+
+class MemoryLimitStore:
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, int, int], int] = {}
+        self._nonces: Dict[str, float] = {}
+        # 过期桶编号 -> 到期后要删除的计数器 / nonce
+        self._counter_expiry: DefaultDict[int, List[Tuple[str, int, int]]] = defaultdict(list)
+        self._nonce_expiry: DefaultDict[int, List[str]] = defaultdict(list)
+        self._swept_bucket = int(clock()) // EXPIRY_BUCKET_SECONDS
+
+    @staticmethod
+    def _bucket(expire_at: float) -> int:
+        return int(expire_at) // EXPIRY_BUCKET_SECONDS + 1
+
+    def _sweep(self, now: float) -> None:
+        current = int(now) // EXPIRY_BUCKET_SECONDS
+        if current <= self._swept_bucket:
+            return
+        due: Iterable[int]
+        if current - self._swept_bucket > len(self._counter_expiry) + len(self._nonce_expiry):
+            # 长时间空闲后只处理实际存在的桶
+            due = [bucket for bucket in set(self._counter_expiry) | set(self._nonce_expiry) if bucket <= current]
+        else:
+            due = range(self._swept_bucket + 1, current + 1)
+        for bucket in due:
+            for counter_key in self._counter_expiry.pop(bucket, ()):
+                self._counters.pop(counter_key, None)
+            for nonce in self._nonce_expiry.pop(bucket, ()):
+                expire_at = self._nonces.get(nonce)
+                if expire_at is not None and expire_at <= now:
+                    del self._nonces[nonce]
+        self._swept_bucket = current
+
+    def hit(self, key: str, limit: int, window_seconds: int) -> bool:
+        """记录一次请求；窗口内已达 limit 次时返回 True (被限流，不计数)"""
+        now = self._clock()
+        width, slot, first = _rate_slots(window_seconds, now)
+        with self._lock:
+            self._sweep(now)
+            total = sum(self._counters.get((key, width, s), 0) for s in range(first, slot + 1))
+            if total >= limit:
+                return True
+            counter_key = (key, width, slot)
+            if counter_key not in self._counters:
+                self._counters[counter_key] = 0
+                self._counter_expiry[self._bucket((slot + 1) * width + window_seconds)].append(counter_key)
+            self._counters[counter_key] += 1
+            return False
+
+    def add_nonce(self, nonce: str, ttl_seconds: int) -> bool:
+        """登记 nonce；ttl 内已出现过 (重放) 时返回 False"""
+        now = self._clock()
+        with self._lock:
+            self._sweep(now)
+            expire_at = self._nonces.get(nonce)
+            if expire_at is not None and expire_at > now:
+                return False
+            expire_at = now + ttl_seconds
+            self._nonces[nonce] = expire_at
+            self._nonce_expiry[self._bucket(expire_at)].append(nonce)
+            return True
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            return {"counters": len(self._counters), "nonces": len(self._nonces)}
+
+
+class SqliteLimitStore:
+    """多个 worker 进程共享同一个 SQLite 文件 (WAL)；每个线程独立连接"""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_counter ("
+            "key TEXT NOT NULL, width INTEGER NOT NULL, slot INTEGER NOT NULL, "
+            "count INTEGER NOT NULL, expire_at INTEGER NOT NULL, PRIMARY KEY (key, width, slot))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_counter_expire ON rate_counter (expire_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS request_nonce (nonce TEXT PRIMARY KEY, expire_at INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_request_nonce_expire ON request_nonce (expire_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: 手动 BEGIN IMMEDIATE，读计数与写入在同一写事务内，跨进程不会超发
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        # 每个进程每个时间桶最多清理一次，按 expire_at 索引删除，每行只删一次
+        if now < self._next_sweep:
+            return
+        self._next_sweep = (int(now) // EXPIRY_BUCKET_SECONDS + 1) * EXPIRY_BUCKET_SECONDS
+        conn.execute("DELETE FROM rate_counter WHERE expire_at <= ?", (int(now),))
+        conn.execute("DELETE FROM request_nonce WHERE expire_at <= ?", (int(now),))
+
+    def hit(self, key: str, limit: int, window_seconds: int) -> bool:
+        now = self._clock()
+        width, slot, first = _rate_slots(window_seconds, now)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._sweep(conn, now)
+            total = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM rate_counter WHERE key = ? AND width = ? AND slot BETWEEN ? AND ?",
+                (key, width, first, slot)
+            ).fetchone()[0]
+            if total >= limit:
+                conn.execute("COMMIT")
+                return True
+            conn.execute(
+                "INSERT INTO rate_counter (key, width, slot, count, expire_at) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (key, width, slot) DO UPDATE SET count = count + 1",
+                (key, width, slot, (slot + 1) * width + int(window_seconds))
+            )
+            conn.execute("COMMIT")
+            return False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_nonce(self, nonce: str, ttl_seconds: int) -> bool:
+        now = self._clock()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._sweep(conn, now)
+            # 已过期但尚未清理的记录视为不存在
+            cursor = conn.execute(
+                "INSERT INTO request_nonce (nonce, expire_at) VALUES (?, ?) "
+                "ON CONFLICT (nonce) DO UPDATE SET expire_at = excluded.expire_at WHERE request_nonce.expire_at <= ?",
+                (nonce, int(now + ttl_seconds), int(now))
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount == 1
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def size(self) -> Dict[str, int]:
+        conn = self._conn()
+        return {
+            "counters": conn.execute("SELECT COUNT(*) FROM rate_counter").fetchone()[0],
+            "nonces": conn.execute("SELECT COUNT(*) FROM request_nonce").fetchone()[0],
+        }
+
+
+def create_limit_store(url=None):
+    url = (url or "").strip()
+    if not url or url.startswith("memory://"):
+        return MemoryLimitStore()
+    if url.startswith("sqlite:///"):
+        return SqliteLimitStore(url[len("sqlite:///"):])
+    raise ValueError(f"不支持的 LIMIT_STORE_URL: {url}")
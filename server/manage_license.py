@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from app import app, db, License
+    from app import app, db, License, compact_audit_logs, iter_licenses, iter_license_export
 except Exception as e:
     print(f"Error importing app: {e}")
     print("Please run this script from the server directory or ensure dependencies are installed.")
@@ -26,17 +26,18 @@ def list_licenses():
     print("Loading licenses...")
     with app.app_context():
         try:
-            licenses = License.query.all()
-            if not licenses:
+            total = License.query.count()
+            if not total:
                 print("No licenses found in the database.")
                 return
 
-            print(f"\nFound {len(licenses)} licenses:")
+            print(f"\nFound {total} licenses:")
             print("-" * 80)
             print(f"{'Code':<20} | {'Expire Date':<20} | {'Devices':<8} | {'Status':<10} | {'Remark'}")
             print("-" * 80)
 
-            for lic in licenses:
+            # 分批读取，授权码很多时也不会一次载入全部
+            for lic in iter_licenses():
                 status = "Valid"
                 if lic.revoked:
                     status = "Revoked"
@@ -91,12 +92,38 @@ def delete_license(code):
             print(f"Error deleting license: {e}")
 
 
+def export_licenses(fmt="ndjson", path=None):
+    if fmt not in ("ndjson", "csv", "json"):
+        print(f"Error: Unknown format '{fmt}' (ndjson / csv / json).")
+        return
+    with app.app_context():
+        out = open(path, "w", encoding="utf-8", newline="") if path else sys.stdout
+        try:
+            for chunk in iter_license_export(fmt):
+                out.write(chunk)
+        finally:
+            if path:
+                out.close()
+    if path:
+        print(f"Success! Exported licenses to {path}")
+
+
+def compact_audit(days=None):
+    try:
+        count = compact_audit_logs(days)
+        print(f"Success! Compacted {count} audit records into hourly rollups.")
+    except Exception as e:
+        print(f"Error compacting audit logs: {e}")
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("\nUsage:")
         print("  python manage_license.py list")
         print("  python manage_license.py add <code> [days=365] [max_devices=1] [remark]")
         print("  python manage_license.py delete <code>")
+        print("  python manage_license.py export [ndjson|csv|json] [file]")
+        print("  python manage_license.py compact-audit [retention_days]")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -120,5 +147,11 @@ if __name__ == "__main__":
         else:
             code = sys.argv[2]
             delete_license(code)
+    elif command == "export":
+        fmt = sys.argv[2] if len(sys.argv) > 2 else "ndjson"
+        path = sys.argv[3] if len(sys.argv) > 3 else None
+        export_licenses(fmt, path)
+    elif command == "compact-audit":
+        compact_audit(int(sys.argv[2]) if len(sys.argv) > 2 else None)
     else:
         print(f"Unknown command: {command}")
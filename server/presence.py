@@ -0,0 +1,88 @@
+"""设备在线状态 (心跳) 的合并写入
+
+心跳、配置拉取/保存只把最新心跳时间记到内存，由后台线程每隔几秒批量 UPDATE
+到数据库，避免每个请求一个小写事务锁住 SQLite。心跳在写入提交成功前一直保存在
+pending 中，在线状态查询以内存为准、数据库为辅。
+
+每个 worker 进程各自缓冲本进程收到的心跳，未落库部分最多延迟一个刷新周期，
+远小于 10 分钟的在线判定窗口。
+"""
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from background import PeriodicTask
+except ImportError:
+    from server.background import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatRecorder:
+    def __init__(self, writer: Callable[[List[Tuple[int, datetime]]], None], interval: float = 5.0) -> None:
+        """writer 接收 [(device_id, 心跳时间)]，负责一次性批量写入数据库"""
+        self.writer = writer
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # device_id -> (license_code, 最新心跳时间)
+        self._pending: Dict[int, Tuple[str, datetime]] = {}
+        self._task = PeriodicTask("heartbeat-flush", self.flush, interval)
+        atexit.register(self.stop)
+
+    def record(self, device_id: int, license_code: str, ts: Optional[datetime] = None) -> None:
+        ts = ts or datetime.now()
+        with self._lock:
+            current = self._pending.get(device_id)
+            if current is None or current[1] < ts:
+                self._pending[device_id] = (license_code, ts)
+        if self.interval <= 0:
+            self.flush()
+        else:
+            self._task.ensure_started()
+
+    def last_seen(self, device_id: int) -> Optional[datetime]:
+        """尚未落库的最新心跳时间；已落库或没有心跳时返回 None"""
+        with self._lock:
+            item = self._pending.get(device_id)
+        return item[1] if item else None
+
+    def pending(self, license_code: Optional[str] = None) -> Dict[int, datetime]:
+        with self._lock:
+            return {device_id: ts for device_id, (code, ts) in self._pending.items()
+                    if license_code is None or code == license_code}
+
+    def discard(self, device_ids) -> None:
+        """设备已删除时丢弃其未落库的心跳"""
+        with self._lock:
+            for device_id in device_ids:
+                self._pending.pop(device_id, None)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            # 提交成功前条目一直留在 pending 中，写入期间的在线查询与清理仍能看到这些心跳
+            with self._lock:
+                batch = dict(self._pending)
+            if not batch:
+                return 0
+            try:
+                self.writer([(device_id, ts) for device_id, (_, ts) in batch.items()])
+            except Exception as e:
+                # 写入失败时条目仍在缓冲区中，下个周期重试
+                logger.error(f"Heartbeat flush failed ({len(batch)} devices): {e}")
+                return 0
+            with self._lock:
+                # 只移除已落库的条目；写入期间收到更新心跳的设备留待下个周期
+                for device_id, (_, ts) in batch.items():
+                    current = self._pending.get(device_id)
+                    if current is not None and current[1] == ts:
+                        del self._pending[device_id]
+            return len(batch)
+
+    def stop(self) -> None:
+        self._task.stop()
+        self.flush()
+
@@ -1,6 +1,7 @@
 import queue
 import threading
-from typing import Any, Optional, Dict
+import time
+from typing import Any, Optional, Dict, Tuple
 
 # 线程安全的指令队列
 # 格式: {'type': 'click'|'type'|'refresh', 'x': int, 'y': int, 'text': str}
@@ -10,10 +11,15 @@ command_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
 # 格式: 'show' | 'hide'
 window_control_queue: "queue.Queue[str]" = queue.Queue()
 
-# 最新截图数据 (bytes)
-# 使用 Lock 保护并发读写
+# 最新截图数据 (bytes)，单帧缓冲区：只保留最新一帧
+# 使用 Lock 保护并发读写，Condition 用于唤醒等待新帧的推流线程
 screenshot_lock = threading.Lock()
+screenshot_cond = threading.Condition(screenshot_lock)
 latest_screenshot: Optional[bytes] = None
+# 帧序号，每写入一帧加 1，推流线程据此判断是否有新帧
+screenshot_seq: int = 0
+# 最新帧的元数据 (CDP screencastFrame metadata: deviceWidth/deviceHeight/offsetTop 等)
+latest_screenshot_meta: Dict[str, Any] = {}
 
 # 当前正在交互的站点名称
 current_site_name: Optional[str] = None
@@ -21,16 +27,50 @@ current_site_name: Optional[str] = None
 # 标记是否处于交互模式
 is_interactive_mode: bool = False
 
+# 最近一次远程操作 (点击/输入等) 的时间戳，推流据此提高帧率
+last_remote_activity_ts: float = 0.0
+
 # 全局 BrowserManager 实例引用，用于远程控制窗口位置
 browser_manager: Optional[Any] = None
 
 
-def set_screenshot(data: bytes) -> None:
-    global latest_screenshot
-    with screenshot_lock:
+def set_screenshot(data: Optional[bytes], meta: Optional[Dict[str, Any]] = None) -> None:
+    global latest_screenshot, latest_screenshot_meta, screenshot_seq
+    with screenshot_cond:
         latest_screenshot = data
+        latest_screenshot_meta = dict(meta or {})
+        screenshot_seq += 1
+        screenshot_cond.notify_all()
 
 
 def get_screenshot() -> Optional[bytes]:
     with screenshot_lock:
         return latest_screenshot
+
+
+def get_screenshot_meta() -> Dict[str, Any]:
+    with screenshot_lock:
+        return dict(latest_screenshot_meta)
+
+
+def wait_for_screenshot(last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+    """阻塞等待比 last_seq 更新的帧，超时返回当前序号与最新帧 (可能未变化)"""
+    with screenshot_cond:
+        screenshot_cond.wait_for(lambda: screenshot_seq != last_seq, timeout=timeout)
+        return screenshot_seq, latest_screenshot
+
+
+def get_screenshot_with_seq() -> Tuple[int, Optional[bytes]]:
+    with screenshot_lock:
+        return screenshot_seq, latest_screenshot
+
+
+def notify_screenshot_waiters() -> None:
+    """唤醒所有等待新帧的推流线程 (例如交互模式结束时)"""
+    with screenshot_cond:
+        screenshot_cond.notify_all()
+
+
+def mark_remote_activity() -> None:
+    global last_remote_activity_ts
+    last_remote_activity_ts = time.time()
@@ -0,0 +1,201 @@
+"""Playwright 调用的 span 追踪 (默认关闭)
+
+开启后给 Playwright 同步 API 的常用方法打补丁，每次调用记录一条 span：
+站点名 (取自当前线程绑定的站点)、操作名、选择器/地址、耗时和异常。
+每轮抓取写入一个 JSONL 文件 (traces/round-YYYYmmdd-HHMMSS.jsonl)，只保留最近 max_files 个。
+用 analyze_traces.py 查看最慢的调用和各站点调用次数。
+
+开启方式: config.json 中 "trace_playwright": true，或环境变量 MONITOR_TRACE=1。
+"""
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TextIO
+
+ENV_TRACE = "MONITOR_TRACE"
+DEFAULT_MAX_FILES = 50
+# evaluate 的脚本等长参数只保留前若干字符
+MAX_TARGET_CHARS = 120
+# 缓冲多少条 span 后写一次文件
+FLUSH_EVERY = 200
+
+TRACED_PAGE_METHODS = (
+    "goto", "reload", "is_visible", "inner_text", "evaluate", "wait_for_selector", "click",
+    "fill", "wait_for_load_state", "wait_for_timeout", "query_selector_all", "bring_to_front",
+)
+TRACED_LOCATOR_METHODS = (
+    "is_visible", "inner_text", "evaluate", "click", "fill", "wait_for", "all", "count", "text_content",
+)
+
+_local = threading.local()
+
+
+def bind_site(site_name: Optional[str]) -> None:
+    """站点任务线程开始时调用，之后该线程内的 span 都归属此站点"""
+    _local.site = site_name
+
+
+def current_site() -> str:
+    return getattr(_local, "site", None) or "-"
+
+
+def trace_enabled(config=None) -> bool:
+    if os.environ.get(ENV_TRACE, "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(isinstance(config, dict) and config.get("trace_playwright"))
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._file: Optional[TextIO] = None
+        self.trace_dir: Optional[str] = None
+        self.max_files = DEFAULT_MAX_FILES
+        self.round_id: Optional[str] = None
+        self.path: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def configure(self, trace_dir: str, max_files: int = DEFAULT_MAX_FILES) -> None:
+        self.trace_dir = trace_dir
+        self.max_files = max(1, int(max_files))
+
+    def start_round(self) -> Optional[str]:
+        """打开本轮的 trace 文件并删除超出数量的旧文件，返回文件路径"""
+        trace_dir = self.trace_dir
+        if not trace_dir:
+            return None
+        self.end_round()
+        try:
+            os.makedirs(trace_dir, exist_ok=True)
+            round_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(trace_dir, f"round-{round_id}.jsonl")
+            handle = open(path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"创建 trace 文件失败: {e}")
+            return None
+        with self._lock:
+            self.round_id = round_id
+            self.path = path
+            self._file = handle
+        self._rotate(trace_dir)
+        return path
+
+    def _rotate(self, trace_dir: str) -> None:
+        files = sorted(glob.glob(os.path.join(trace_dir, "round-*.jsonl")))
+        for old in files[:-self.max_files]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def record(self, op: str, target: Optional[str], started: float, duration: float,
+               error: Optional[str] = None) -> None:
+        span = {
+            "ts": round(started, 3),
+            "round": self.round_id,
+            "site": current_site(),
+            "op": op,
+            "target": target,
+            "ms": round(duration * 1000, 2),
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            span["error"] = error[:200]
+        with self._lock:
+            if self._file is None:
+                return
+            self._buffer.append(span)
+            if len(self._buffer) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer or self._file is None:
+            return
+        try:
+            self._file.write("".join(json.dumps(s, ensure_ascii=False) + "\n" for s in self._buffer))
+            self._file.flush()
+        except OSError:
+            pass
+        self._buffer = []
+
+    def end_round(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            handle, self._file = self._file, None
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError:
+                pass
+
+
+tracer = Tracer()
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _describe(obj: Any, args: tuple, kwargs: Dict[str, Any]) -> Optional[str]:
+    """span 的目标：Locator 取其选择器，Page 方法取第一个参数 (选择器/地址/脚本)"""
+    impl = getattr(obj, "_impl_obj", None)
+    target = getattr(impl, "_selector", None)
+    if target is None:
+        if args:
+            target = args[0]
+        else:
+            target = kwargs.get("selector") or kwargs.get("url") or kwargs.get("expression")
+    if target is None:
+        return None
+    target = str(target)
+    return target if len(target) <= MAX_TARGET_CHARS else target[:MAX_TARGET_CHARS] + "..."
+
+
+def _wrap(kind: str, name: str, method):
+    op = f"{kind}.{name}"
+
+    @functools.wraps(method)
+    def traced(self, *args, **kwargs):
+        if tracer._file is None:
+            return method(self, *args, **kwargs)
+        started = time.time()
+        begin = time.perf_counter()
+        error = None
+        try:
+            return method(self, *args, **kwargs)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            tracer.record(op, _describe(self, args, kwargs), started, time.perf_counter() - begin, error)
+
+    setattr(traced, "__traced__", True)
+    return traced
+
+
+def install() -> bool:
+    """给 Playwright 同步 API 打补丁 (只执行一次)；未开启追踪时不要调用，避免任何额外开销"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return True
+        try:
+            from playwright.sync_api import CDPSession, Locator, Page
+        except ImportError:
+            return False
+        targets = [("page", Page, TRACED_PAGE_METHODS), ("locator", Locator, TRACED_LOCATOR_METHODS),
+                   ("cdp", CDPSession, ("send",))]
+        for kind, cls, names in targets:
+            for name in names:
+                method = getattr(cls, name, None)
+                if method is None or getattr(method, "__traced__", False):
+                    continue
+                setattr(cls, name, _wrap(kind, name, method))
+        _installed = True
+        return True
@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BootTask:
+    def __init__(self, name: str, func: Callable[[], Any], deps: Optional[List[str]] = None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps or [])
+        self.done = threading.Event()
+        self.launched = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.start_ts: Optional[float] = None
+        self.end_ts: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.done.is_set() and self.error is None
+
+
+class BootGraph:
+    """并发启动图：各启动步骤在独立线程并行执行，按依赖关系等待，并记录每一步耗时
+
+    需要在主线程执行的步骤 (如 Playwright 同步 API) 使用 run_inline，
+    其余步骤通过 add 注册后由 start 在后台线程中启动。
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.tasks: Dict[str, BootTask] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, func: Callable[[], Any], deps: Optional[List[str]] = None) -> BootTask:
+        task = BootTask(name, func, deps)
+        with self._lock:
+            self.tasks[name] = task
+        return task
+
+    def _run(self, task: BootTask) -> None:
+        for dep in task.deps:
+            dep_task = self.tasks.get(dep)
+            if dep_task:
+                dep_task.done.wait()
+        task.start_ts = time.perf_counter()
+        try:
+            task.result = task.func()
+        except BaseException as e:
+            task.error = e
+        finally:
+            task.end_ts = time.perf_counter()
+            task.done.set()
+
+    def start(self) -> None:
+        """在后台线程启动所有已注册的步骤"""
+        for task in list(self.tasks.values()):
+            if not task.launched:
+                task.launched = True
+                threading.Thread(target=self._run, args=(task,), name=f"boot-{task.name}", daemon=True).start()
+
+    def run_inline(self, name: str, func: Callable[[], Any], deps: Optional[List[str]] = None) -> BootTask:
+        """在当前线程执行一个步骤 (阻塞)，异常记录在 task.error 中而不抛出"""
+        task = self.add(name, func, deps)
+        task.launched = True
+        self._run(task)
+        return task
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> BootTask:
+        task = self.tasks[name]
+        task.done.wait(timeout)
+        return task
+
+    def mark(self, name: str) -> None:
+        """记录一个瞬时里程碑 (如首轮任务开始)"""
+        now = time.perf_counter()
+        task = BootTask(name, lambda: None)
+        task.launched = True
+        task.start_ts = now
+        task.end_ts = now
+        task.done.set()
+        with self._lock:
+            self.tasks[name] = task
+
+    def timings(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for task in self.tasks.values():
+            if task.start_ts is None:
+                continue
+            end = task.end_ts if task.end_ts is not None else time.perf_counter()
+            rows.append({
+                "name": task.name,
+                "start": round(task.start_ts - self.origin, 3),
+                "end": round(end - self.origin, 3),
+                "duration": round(end - task.start_ts, 3),
+                "ok": task.error is None,
+                "finished": task.done.is_set()
+            })
+        rows.sort(key=lambda r: r["start"])
+        return rows
+
+    def report(self) -> str:
+        lines = ["=== 启动耗时报告 ===", f"{'步骤':<16}{'开始(s)':>10}{'结束(s)':>10}{'耗时(s)':>10}  状态"]
+        for row in self.timings():
+            if not row["finished"]:
+                status = "进行中"
+            else:
+                status = "成功" if row["ok"] else "失败"
+            lines.append(f"{row['name']:<16}{row['start']:>10.3f}{row['end']:>10.3f}{row['duration']:>10.3f}  {status}")
+        lines.append(f"总耗时: {time.perf_counter() - self.origin:.3f}s")
+        return "\n".join(lines)
@@ -0,0 +1,121 @@
+import time
+from typing import Any, Dict, Optional
+
+import shared
+
+DEFAULT_ACTIVE_FPS = 12
+DEFAULT_IDLE_FPS = 1
+DEFAULT_MAX_KBPS = 256
+# 远程操作或页面明显变化后保持高帧率的时长 (秒)
+BOOST_SECONDS = 3.0
+# 单帧脏区块占比超过该值视为页面内容变化 (跳转/弹窗)，光标闪烁等小区域变化不计
+PAGE_CHANGE_RATIO = 0.05
+
+MAX_QUALITY = 70
+MIN_QUALITY = 30
+QUALITY_STEP_DOWN = 10
+QUALITY_STEP_UP = 5
+# 发送积压时降低画质的最短间隔，避免一次积压连续降级到底
+DEGRADE_INTERVAL = 1.0
+# 连续多少次及时确认后恢复一级画质
+RECOVER_AFTER_ACKS = 10
+FAST_ACK_SECONDS = 0.3
+
+
+def governor_settings(config) -> Dict[str, int]:
+    """从配置读取推流帧率与带宽上限，手机流量下可调低 remote_max_kbps"""
+    config = config if isinstance(config, dict) else {}
+
+    def _int(key, default, low, high):
+        try:
+            value = int(config.get(key, default))
+        except (TypeError, ValueError):
+            value = default
+        return max(low, min(high, value))
+
+    return {
+        "active_fps": _int('remote_active_fps', DEFAULT_ACTIVE_FPS, 1, 30),
+        "idle_fps": _int('remote_idle_fps', DEFAULT_IDLE_FPS, 1, 30),
+        "max_kbps": _int('remote_max_kbps', DEFAULT_MAX_KBPS, 16, 10240),
+    }
+
+
+class FrameGovernor:
+    """单个查看端的推流节奏控制
+
+    - 帧率: 有远程操作或页面明显变化后的 BOOST_SECONDS 内使用 active_fps，其余时间 idle_fps
+    - 带宽: 令牌桶限制每秒字节数，允许 1 秒突发，大关键帧可以透支，之后等待补足
+    - 画质: 发送积压时逐级降低 JPEG 质量，确认恢复及时后逐级回升
+    """
+
+    def __init__(self, active_fps: int = DEFAULT_ACTIVE_FPS, idle_fps: int = DEFAULT_IDLE_FPS,
+                 max_kbps: int = DEFAULT_MAX_KBPS) -> None:
+        self.active_fps = max(active_fps, idle_fps)
+        self.idle_fps = idle_fps
+        self.rate = max_kbps * 1024
+        self.tokens = float(self.rate)
+        self._refill_ts = time.time()
+        self._last_send_ts = 0.0
+        self._boost_until = 0.0
+        self._last_degrade_ts = 0.0
+        self._fast_acks = 0
+        self.quality = MAX_QUALITY
+        self.degrade_count = 0
+
+    def note_change(self, dirty_ratio: float, now: Optional[float] = None) -> None:
+        if dirty_ratio >= PAGE_CHANGE_RATIO:
+            now = time.time() if now is None else now
+            self._boost_until = now + BOOST_SECONDS
+
+    def is_active(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now < self._boost_until or now - shared.last_remote_activity_ts < BOOST_SECONDS
+
+    def current_fps(self, now: Optional[float] = None) -> int:
+        return self.active_fps if self.is_active(now) else self.idle_fps
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._refill_ts)
+        self._refill_ts = now
+        self.tokens = min(float(self.rate), self.tokens + elapsed * self.rate)
+
+    def send_delay(self, now: Optional[float] = None) -> float:
+        """距离允许发送下一帧还需等待的秒数 (0 表示可立即发送)"""
+        now = time.time() if now is None else now
+        self._refill(now)
+        frame_wait = self._last_send_ts + 1.0 / self.current_fps(now) - now
+        bandwidth_wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(0.0, frame_wait, bandwidth_wait)
+
+    def on_sent(self, nbytes: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._refill(now)
+        self.tokens -= nbytes
+        self._last_send_ts = now
+
+    def on_backlog(self, now: Optional[float] = None) -> None:
+        """发送队列积压 (客户端确认跟不上) 时降低画质"""
+        now = time.time() if now is None else now
+        self._fast_acks = 0
+        if self.quality <= MIN_QUALITY or now - self._last_degrade_ts < DEGRADE_INTERVAL:
+            return
+        self.quality = max(MIN_QUALITY, self.quality - QUALITY_STEP_DOWN)
+        self._last_degrade_ts = now
+        self.degrade_count += 1
+
+    def on_ack(self, rtt: float) -> None:
+        if rtt > FAST_ACK_SECONDS:
+            self._fast_acks = 0
+            return
+        self._fast_acks += 1
+        if self._fast_acks >= RECOVER_AFTER_ACKS and self.quality < MAX_QUALITY:
+            self.quality = min(MAX_QUALITY, self.quality + QUALITY_STEP_UP)
+            self._fast_acks = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fps": self.current_fps(),
+            "quality": self.quality,
+            "degrade_count": self.degrade_count,
+            "max_kbps": self.rate // 1024,
+        }
@@ -0,0 +1,130 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import shared
+
+try:
+    import gevent  # type: ignore
+    import gevent.event  # type: ignore
+    import gevent.selectors  # type: ignore
+except ImportError:  # pragma: no cover - 未安装 gevent 时只能使用线程模式
+    gevent = None
+
+# Web 服务正在关闭：所有推流循环据此退出
+stopping = threading.Event()
+
+
+class ThreadRuntime:
+    """线程模式 (Werkzeug threaded)：每个连接一个系统线程"""
+
+    name = "threaded"
+
+    def spawn(self, target: Callable[[], Any], name: Optional[str] = None):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def event(self):
+        return threading.Event()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def wait_for_screenshot(self, last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        return shared.wait_for_screenshot(last_seq, timeout)
+
+    def socket_options(self) -> Dict[str, Any]:
+        return {}
+
+
+class _GreenThread:
+    """simple_websocket 需要的线程接口 (name/start/join)，内部用 greenlet 实现"""
+
+    def __init__(self, target: Callable[[], Any]) -> None:
+        self.target = target
+        self.name = "greenlet(_thread)"
+        self._greenlet = None
+
+    def start(self) -> None:
+        self._greenlet = gevent.spawn(self.target)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._greenlet is not None:
+            self._greenlet.join(timeout)
+
+
+class GeventRuntime:
+    """事件驱动模式 (gevent WSGIServer)：所有连接是同一系统线程中的 greenlet
+
+    不做 monkey patch (同进程的 Playwright 依赖真实线程)，因此请求处理中
+    不能直接阻塞在 threading 原语上：新帧通知由一个桥接线程等待 shared 的
+    条件变量，再经 hub 的 async watcher 唤醒等待中的 greenlet。
+    必须在运行 WSGIServer 的线程中创建。
+    """
+
+    name = "gevent"
+
+    def __init__(self) -> None:
+        self.hub = gevent.get_hub()
+        self._frame_event = gevent.event.Event()
+        self._frame_watcher = self.hub.loop.async_()
+        self._frame_watcher.start(self._on_frame)
+        self._call_watcher = self.hub.loop.async_()
+        self._call_watcher.start(self._run_calls)
+        self._calls: List[Callable[[], Any]] = []
+        self._calls_lock = threading.Lock()
+        threading.Thread(target=self._frame_bridge, name="gevent-frame-bridge", daemon=True).start()
+
+    def _frame_bridge(self) -> None:
+        last_seq = -1
+        while not stopping.is_set():
+            seq, _ = shared.wait_for_screenshot(last_seq, timeout=1.0)
+            if seq != last_seq:
+                last_seq = seq
+                self._frame_watcher.send()
+
+    def _on_frame(self) -> None:
+        event, self._frame_event = self._frame_event, gevent.event.Event()
+        event.set()
+
+    def _run_calls(self) -> None:
+        with self._calls_lock:
+            calls, self._calls = self._calls, []
+        for func in calls:
+            gevent.spawn(func)
+
+    def call_soon_threadsafe(self, func: Callable[[], Any]) -> None:
+        """从其他系统线程投递一个在 hub 线程中执行的调用"""
+        with self._calls_lock:
+            self._calls.append(func)
+        self._call_watcher.send()
+
+    def spawn(self, target: Callable[[], Any], name: Optional[str] = None):
+        return gevent.spawn(target)
+
+    def event(self):
+        return gevent.event.Event()
+
+    def sleep(self, seconds: float) -> None:
+        gevent.sleep(seconds)
+
+    def wait_for_screenshot(self, last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        if shared.screenshot_seq == last_seq:
+            self._frame_event.wait(timeout)
+        return shared.get_screenshot_with_seq()
+
+    def socket_options(self) -> Dict[str, Any]:
+        return {
+            "thread_class": _GreenThread,
+            "event_class": gevent.event.Event,
+            "selector_class": gevent.selectors.GeventSelector,
+        }
+
+
+# 当前 Web 服务使用的运行时，由 web_server.run_server 设置
+current = ThreadRuntime()
+
+
+def gevent_available() -> bool:
+    return gevent is not None
@@ -1,10 +1,33 @@
 import json
 import os
 import secrets
+import threading
+import time
+from typing import Set
 from flask import Flask, render_template_string, request, Response, jsonify
+from werkzeug.serving import make_server
 import shared
+import web_runtime
+from remote_channel import ViewerChannel
+from remote_input import enqueue_action, latency_stats
+from round_metrics import round_metrics
+from stream_governor import FrameGovernor, governor_settings
+
+try:
+    from flask_sock import Sock  # type: ignore
+except ImportError:  # pragma: no cover - 未安装时远程控制页回退到 MJPEG + HTTP POST
+    Sock = None
 
 app = Flask(__name__)
+sock = Sock(app) if Sock is not None else None
+# 当前连接中的 WebSocket 查看端，用于统计
+viewer_channels: Set[ViewerChannel] = set()
+viewer_channels_lock = threading.Lock()
+
+# 关闭时等待连接结束的最长时间 (秒)
+SHUTDOWN_GRACE_SECONDS = 3
+_server_stop = None
+_server_stopped = threading.Event()
 ACCESS_TOKEN = os.environ.get("WEB_SERVER_TOKEN") or secrets.token_urlsafe(24)
 
 
@@ -56,8 +79,9 @@ REMOTE_CONTROL_HTML = """
             cursor: crosshair;
             touch-action: none; /* 禁止浏览器默认的滚动/缩放行为，由JS接管 */
         }
-        #screen {
+        #screen, #canvas {
             max-width: 100%;
+            height: auto;
             display: block;
             pointer-events: none; /* 让事件穿透到 container */
         }
@@ -98,7 +122,8 @@ REMOTE_CONTROL_HTML = """
     </div>
 
     <div id="screen-container">
-        <img id="screen" src="/screenshot_stream?token={{ token }}">
+        <canvas id="canvas" width="1280" height="800"></canvas>
+        <img id="screen" style="display:none">
     </div>
 
     <div class="controls">
@@ -112,7 +137,103 @@ REMOTE_CONTROL_HTML = """
     <script>
         const container = document.getElementById('screen-container');
         const img = document.getElementById('screen');
+        const canvas = document.getElementById('canvas');
+        const ctx = canvas.getContext('2d');
         const accessToken = "{{ token }}";
+        const wsEnabled = {{ 'true' if ws_enabled else 'false' }};
+        // 当前显示画面的元素：WebSocket 模式为 canvas，回退模式为 MJPEG img
+        let screenEl = canvas;
+
+        // === 画面与操作通道 ===
+        // 优先使用 WebSocket：画面帧与操作共用一条连接；连接失败时回退到 MJPEG + HTTP POST
+        let ws = null;
+        let wsReady = false;
+        let sessionEnded = false;
+        // 帧按到达顺序依次解码绘制，保证增量区块总是叠加在其基准关键帧之上
+        let renderChain = Promise.resolve();
+
+        function useMjpeg() {
+            canvas.style.display = 'none';
+            img.style.display = 'block';
+            img.src = '/screenshot_stream?token=' + encodeURIComponent(accessToken);
+            screenEl = img;
+        }
+
+        function drawJpeg(bytes, x, y, resize) {
+            return createImageBitmap(new Blob([bytes], {type: 'image/jpeg'})).then(bitmap => {
+                if (resize && (canvas.width !== bitmap.width || canvas.height !== bitmap.height)) {
+                    canvas.width = bitmap.width;
+                    canvas.height = bitmap.height;
+                }
+                ctx.drawImage(bitmap, x, y);
+                bitmap.close();
+            });
+        }
+
+        // 帧格式: [类型 1B][序号 4B] + 负载
+        //   类型 1 关键帧: 完整 JPEG
+        //   类型 2 增量帧: [区块数 2B] + N * ([x 2B][y 2B][长度 4B] + JPEG)
+        function renderFrame(buffer) {
+            const view = new DataView(buffer);
+            const kind = view.getUint8(0);
+            if (kind === 1) {
+                return drawJpeg(new Uint8Array(buffer, 5), 0, 0, true);
+            }
+            const count = view.getUint16(5);
+            const tiles = [];
+            let offset = 7;
+            for (let i = 0; i < count; i++) {
+                const x = view.getUint16(offset);
+                const y = view.getUint16(offset + 2);
+                const length = view.getUint32(offset + 4);
+                tiles.push(drawJpeg(new Uint8Array(buffer, offset + 8, length), x, y, false));
+                offset += 8 + length;
+            }
+            return Promise.all(tiles);
+        }
+
+        function handleFrame(buffer) {
+            const seq = new DataView(buffer).getUint32(1);
+            renderChain = renderChain.then(() => renderFrame(buffer)).catch(() => {}).then(() => {
+                if (wsReady) ws.send(JSON.stringify({type: 'ack', seq: seq}));
+            });
+        }
+
+        function showEnded() {
+            sessionEnded = true;
+            document.querySelector('.status').innerHTML = '远程操作已结束（脚本已退出交互模式），可关闭本页面。';
+        }
+
+        function connectSocket() {
+            if (!wsEnabled || !window.WebSocket || !window.createImageBitmap) {
+                useMjpeg();
+                return;
+            }
+            const proto = location.protocol === 'https:' ? 'wss:' : 'ws:';
+            ws = new WebSocket(proto + '//' + location.host + '/ws/control?token=' + encodeURIComponent(accessToken));
+            ws.binaryType = 'arraybuffer';
+            let opened = false;
+            ws.onopen = () => { opened = true; wsReady = true; };
+            ws.onmessage = (event) => {
+                if (typeof event.data === 'string') {
+                    const msg = JSON.parse(event.data);
+                    if (msg.type === 'end') showEnded();
+                    return;
+                }
+                handleFrame(event.data);
+            };
+            ws.onclose = (event) => {
+                wsReady = false;
+                if (event.reason === 'Not interactive mode') {
+                    showEnded();
+                } else if (!opened) {
+                    useMjpeg();
+                } else if (!sessionEnded) {
+                    setTimeout(connectSocket, 1000);
+                }
+            };
+        }
+        connectSocket();
 
         let startX = 0, startY = 0;
         let isDragging = false;
@@ -120,7 +241,7 @@ REMOTE_CONTROL_HTML = """
 
         // 统一处理坐标计算
         function getCoords(event) {
-            const rect = img.getBoundingClientRect();
+            const rect = screenEl.getBoundingClientRect();
             let clientX, clientY;
 
             if (event.touches && event.touches.length > 0) {
@@ -213,6 +334,10 @@ REMOTE_CONTROL_HTML = """
         }
 
         function sendAction(data) {
+            if (wsReady) {
+                ws.send(JSON.stringify(data));
+                return Promise.resolve();
+            }
             return fetch('/action', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json', 'X-Access-Token': accessToken},
@@ -282,13 +407,6 @@ REMOTE_CONTROL_HTML = """
                 sendRefresh();
             }
         });
-
-        // 简单的防抖刷新，防止图片卡死
-        setInterval(() => {
-            const img = document.getElementById('screen');
-            // img.src = "/screenshot_stream?" + new Date().getTime();
-            // 还是用流式传输比较好，不需要前端轮询
-        }, 5000);
     </script>
 </body>
 </html>
@@ -313,7 +431,8 @@ def control_page(site_name):
     if shared.current_site_name != site_name:
         return f"脚本当前正在处理 [{shared.current_site_name}]，请稍后或检查链接是否过期。", 403
 
-    return render_template_string(REMOTE_CONTROL_HTML, site_name=site_name, token=ACCESS_TOKEN)
+    return render_template_string(REMOTE_CONTROL_HTML, site_name=site_name, token=ACCESS_TOKEN,
+                                  ws_enabled=sock is not None)
 
 
 @app.route('/screenshot_stream')
@@ -321,21 +440,49 @@ def screenshot_stream():
     if not _is_authorized():
         return "Unauthorized", 401
     """返回 MJPEG 视频流"""
+    governor = FrameGovernor(**governor_settings(get_config()))
+    runtime = web_runtime.current
+
     def generate():
-        while shared.is_interactive_mode:
-            frame = shared.get_screenshot()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # 如果没有截图，发个空帧防止断开
-                pass
-            import time
-            time.sleep(0.5)  # 限制帧率，每秒2帧，节省带宽
+        last_seq = -1
+        while shared.is_interactive_mode and not web_runtime.stopping.is_set():
+            # 按活跃度与带宽上限控制节奏，等待期间的中间帧直接跳过
+            delay = governor.send_delay()
+            if delay > 0:
+                runtime.sleep(min(delay, 0.1))
+                continue
+            # 由截屏线程写入新帧时通过条件变量唤醒，不再轮询
+            seq, frame = runtime.wait_for_screenshot(last_seq, timeout=1.0)
+            if seq == last_seq or not frame:
+                continue
+            last_seq = seq
+            governor.on_sent(len(frame))
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
+if sock is not None:
+    @sock.route('/ws/control')
+    def control_socket(ws):
+        """远程控制 WebSocket：下行二进制画面帧，上行操作事件，每个查看端一条连接"""
+        if not _is_authorized():
+            ws.close(reason=1008, message="Unauthorized")
+            return
+        if not shared.is_interactive_mode:
+            ws.close(reason=1000, message="Not interactive mode")
+            return
+        channel = ViewerChannel(ws, shared.current_site_name, governor_settings(get_config()))
+        with viewer_channels_lock:
+            viewer_channels.add(channel)
+        try:
+            channel.run()
+        finally:
+            with viewer_channels_lock:
+                viewer_channels.discard(channel)
+
+
 @app.route('/action', methods=['POST'])
 def handle_action():
     if not _is_authorized():
@@ -343,11 +490,32 @@ def handle_action():
     if not shared.is_interactive_mode:
         return jsonify({"error": "Not interactive mode"}), 400
 
-    data = request.json
-    shared.command_queue.put(data)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get("type"):
+        return jsonify({"error": "Invalid action"}), 400
+    enqueue_action(data)
     return jsonify({"status": "ok"})
 
 
+@app.route('/action/stats')
+def action_stats():
+    """远程操作从入队到在浏览器中执行完成的延迟统计 (毫秒)"""
+    if not _is_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    with viewer_channels_lock:
+        viewers = [channel.stats() for channel in viewer_channels]
+    return jsonify({"pending": shared.command_queue.qsize(), "latency": latency_stats.snapshot(),
+                    "viewers": viewers})
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus 文本格式的抓取耗时指标 (本机访问无需令牌，远程抓取需带 token 参数)"""
+    if not _is_authorized() and request.remote_addr not in ("127.0.0.1", "::1"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(round_metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.route('/api/browser/show', methods=['POST'])
 def browser_show():
     if not _is_authorized():
@@ -369,15 +537,72 @@ def index():
     return "多后台监控脚本 - 远程控制服务运行中"
 
 
-def run_server():
-    # 生产环境部署建议用 gevent 或其他 WSGI，这里开发用默认
-    # threaded=True 允许并发请求（视频流会占用连接）
-    host = os.environ.get('WEB_SERVER_HOST', '127.0.0.1')
-    port = int(os.environ.get('WEB_SERVER_PORT', 5000))
+def _server_address(host=None, port=None):
+    host = host or os.environ.get('WEB_SERVER_HOST', '127.0.0.1')
+    port = int(port or os.environ.get('WEB_SERVER_PORT', 5000))
+    return host, port
+
+
+def _serve_threaded(host, port):
+    global _server_stop
+    server = make_server(host, port, app, threaded=True)
+    _server_stop = server.shutdown
+    server.serve_forever()
+
+
+def _serve_gevent(host, port):
+    global _server_stop
+    from gevent.pywsgi import WSGIServer  # type: ignore
+
+    runtime = web_runtime.GeventRuntime()
+    web_runtime.current = runtime
+    app.config['SOCK_SERVER_OPTIONS'] = runtime.socket_options()
+    server = WSGIServer((host, port), app, log=None)
+    # stop 须在 hub 线程中执行：给推流 greenlet 留出以 1001 关闭连接的时间
+    _server_stop = lambda: runtime.call_soon_threadsafe(lambda: server.stop(timeout=SHUTDOWN_GRACE_SECONDS))
+    server.serve_forever()
+
+
+def run_server(host=None, port=None, mode=None):
+    """启动 Web 服务 (阻塞)，WEB_SERVER_MODE 选择服务模式:
+
+    threaded  Werkzeug 多线程，每个查看端/推流占用一个系统线程 (默认)
+    gevent    gevent 事件驱动，所有连接为 greenlet，适合大量并发查看端 (需安装 gevent)
+    """
+    host, port = _server_address(host, port)
+    mode = (mode or os.environ.get('WEB_SERVER_MODE', 'threaded')).lower()
+    if mode == 'gevent' and not web_runtime.gevent_available():
+        print("未安装 gevent，Web 服务回退到 threaded 模式")
+        mode = 'threaded'
     show_token = os.environ.get("WEB_SERVER_SHOW_TOKEN", "").lower() in ("1", "true", "yes")
     if show_token:
         print(f"远程控制访问令牌: {ACCESS_TOKEN}")
-    app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+    web_runtime.stopping.clear()
+    _server_stopped.clear()
+    try:
+        if mode == 'gevent':
+            _serve_gevent(host, port)
+        else:
+            _serve_threaded(host, port)
+    finally:
+        _server_stopped.set()
+
+
+def stop_server(timeout=SHUTDOWN_GRACE_SECONDS + 2):
+    """优雅关闭：通知推流结束 (WebSocket 以 1001 关闭)，再停止监听，最多等待 timeout 秒"""
+    web_runtime.stopping.set()
+    shared.notify_screenshot_waiters()
+    if _server_stop is None:
+        return True
+    # 等待推流循环退出 (最长一个等待周期)，再停止监听
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with viewer_channels_lock:
+            if not viewer_channels:
+                break
+        time.sleep(0.05)
+    _server_stop()
+    return _server_stopped.wait(max(0.1, deadline - time.time()))
 
 
 if __name__ == '__main__':